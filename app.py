@@ -1,7 +1,25 @@
+import uuid
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO 
+
+from cache_resultados import CacheResultados
+from auditoria import (
+    CODIGO_ALERTA_OK, CODIGOS_DESVIO, ETIQUETAS_ALERTA, MAX_PRECIO_DESVIACION, REGLAS_AUDITORIA,
+    COLUMNAS_REPORTE_ALERTAS, COLUMNAS_REPORTE_COMPLETO,
+    combinar_mascaras, hojas_reporte,
+)
+from exploracion import DIMENSIONES_EXPLORACION, ORDENES_RANKING, SIGUIENTE_DIMENSION, IndiceExploracion
+from exportacion import FORMATOS_EXPORTACION, exportar
+from grilla import mostrar_grilla
+from historial_precios import RUTA_HISTORIAL_PRECIOS, HistorialPrecios
+from historico import DIMENSION_TOTAL, RUTA_HISTORICO, HistoricoAuditoria
+from ingesta import EXTENSIONES_ENTRADA, calcular_huella, huella_archivos, leer_cache_libro
+from instrumentacion import RegistroRendimiento
+from reglas import contar_por_regla
+from simulacion import UMBRALES_SIMULABLES, SimuladorUmbrales
+from trabajos import ETAPAS_TRABAJO, GestorTrabajos, auditar_con_mascaras, procesar_archivos
 
 # Definición de colores institucionales
 COLOR_INSTITUCIONAL = "#36B7BA"   # Turquesa (Principal para títulos, acentos, gráficos)
@@ -10,154 +28,303 @@ COLOR_TEXTO_PRINCIPAL = "#000000" # Negro forzado para legibilidad
 COLOR_CHECKBOX_GRIS = "#666666"  # Gris oscuro para los textos de filtros
 COLOR_CHECKBOX_BORDE_INACTIVO = "#BFBFBF" # Gris muy claro para el símbolo vacío (la nueva solicitud)
 
-# Inicializar st.session_state para almacenar el archivo después de presionar "Procesar"
-if 'file_data' not in st.session_state:
-    st.session_state['file_data'] = None
-
-# --- 1. CONFIGURACIÓN DE PÁGINA Y PARÁMETROS (Sin cambios en la lógica) ---
-codigos_controlados = [
-    '3000113', '3000114', '3000080', '3000082', '3000083', '3000084', '3000085',
-    '3000098', '3001265', '3001266', '3001267', '3001894', '3001896', '3002906',
-    '3003648', '3004041', '3003870', '3004072', '5000002', '3004071', '3003953',
-    '3003955', '3003952', '3004074', '3004073', '3003773', '3003775', '3004756'
-]
-
-DESC_MAX_CONTROLADOS = 5.0
-DESC_MAX_EMPLEADOS = 0.0
-DESC_MAX_NUTRICIA_BEBELAC = 6.0
-DESC_MAX_GENERAL = 7.0
-MAX_PRECIO_DESVIACION = 2.0 
-DESC_INTERCOMPANY_200046 = 11.0 
-DESC_INTERCOMPANY_200173 = 10.0 
-CLIENTE_200046 = '200046'
-CLIENTE_200173 = '200173'
-ALMACEN_EMPLEADOS_PERMITIDO = 1041
-ALMACEN_OFERTAS = 1012
-marcas_6_porciento = ['NUTRICIA', 'BEBELAC']
-ZONAS_FUNCIONARIOS = ['EMPLEADOS LQF', 'MEDICOS PARTICULARES'] 
-
-# Etiquetas exactas de las alertas generadas en la función ejecutar_auditoria
-ETIQUETAS_ALERTA = [
-    '❌ Ilegal (Empleado/Médico)', 
-    f'⛔ Precio Facturado bajo (>{MAX_PRECIO_DESVIACION}%)',
-    '⚠️ Controlado (>5%) Excedido',
-    '⚠️ Intercompany 200046 (>11%) Excedido', 
-    '⚠️ Intercompany 200173 (>10%) Excedido', 
-    '⚠️ Marca Nutricion (>6%) Excedido', 
-    '⚠️ General (>7%) Excedido',
-    '✅ OK'
-]
-
-
-# --- 2. FUNCIÓN PRINCIPAL DE AUDITORÍA (Sin cambios) ---
-@st.cache_data
-def ejecutar_auditoria(df_ventas, df_precios):
-    # Lógica de auditoría...
-    df_ventas.columns = df_ventas.columns.str.strip()
-    column_mapping = {
-        'Fecha factura': 'Fecha factura', 'Almacen': 'Almacen', 'Tipo Venta': 'Tipo Venta',
-        'Zona de Venta': 'Zona de Venta', 'Solicitante': 'Solicitante', 'Nombre 1': 'Nombre 1',
-        'Codigo': 'Codigo', 'Material': 'Material', 'Jerarquia': 'Jerarquia',
-        '% Desc': '% Desc', 'Valor neto': 'Valor neto', 'Cant': 'Cant',
-        'Descuento %': '% Desc', 'codigo': 'Codigo', 'jerarquia': 'Jerarquia', 
-        'Valor Neto': 'Valor neto', 'VALOR NETO': 'Valor neto'
-    }
-    df_audit = df_ventas.rename(columns=column_mapping)
-    
-    # 2. Limpieza y Normalización de Datos de Venta
-    df_audit['% Desc'] = pd.to_numeric(df_audit['% Desc'], errors='coerce')
-    df_audit['Almacen'] = pd.to_numeric(df_audit['Almacen'], errors='coerce', downcast='integer')
-    df_audit['Solicitante'] = df_audit['Solicitante'].astype(str)
-    df_audit['Codigo'] = df_audit['Codigo'].astype(str)
-    
-    
-    # 3. Auditoría por Precio de Lista (Listado de Precios)
-    df_precios.columns = df_precios.columns.str.strip()
-    price_column_mapping = {
-        'Codigo': 'Codigo', 
-        'IVA': 'IVA_Lista', 
-        'Precio de Factura con Descuento': 'Precio_Farmacia_Target', 
-        'Precio Intercompany': 'Precio_Intercompany_Target'
-    }
-    df_precios = df_precios.rename(columns=price_column_mapping)
-    
-    cols_a_unir = ['Codigo', 'IVA_Lista', 'Precio_Farmacia_Target', 'Precio_Intercompany_Target'] 
-    df_precios = df_precios[cols_a_unir]
-    df_precios['Codigo'] = df_precios['Codigo'].astype(str)
-    df_precios['IVA_Lista'] = pd.to_numeric(df_precios['IVA_Lista'], errors='coerce').fillna(0) 
-    
-    df_audit = pd.merge(df_audit, df_precios, on='Codigo', how='left')
-    
-    # --- AJUSTE CRÍTICO: QUITAR EL IVA DEL PRECIO OBJETIVO (PARA COMPARAR CON NETO) ---
-    df_audit['Factor_IVA'] = 1 + df_audit['IVA_Lista']
-    df_audit['Factor_IVA'] = np.where(df_audit['Factor_IVA'] <= 1, np.nan, df_audit['Factor_IVA']) 
-
-    df_audit['Precio_Farmacia_Target'] = pd.to_numeric(df_audit['Precio_Farmacia_Target'], errors='coerce').fillna(0)
-    df_audit['Precio_Intercompany_Target'] = pd.to_numeric(df_audit['Precio_Intercompany_Target'], errors='coerce').fillna(0)
-    
-    df_audit['Precio_Farmacia_Target_SIN_IVA'] = np.where(
-        df_audit['Factor_IVA'].notna(), 
-        df_audit['Precio_Farmacia_Target'] / df_audit['Factor_IVA'],
-        df_audit['Precio_Farmacia_Target'] 
-    )
-    
-    df_audit['Precio_Intercompany_Target_SIN_IVA'] = np.where(
-        df_audit['Factor_IVA'].notna(), 
-        df_audit['Precio_Intercompany_Target'] / df_audit['Factor_IVA'],
-        df_audit['Precio_Intercompany_Target']
-    )
-    
-    df_audit['Precio_Farmacia_Target_SIN_IVA'] = df_audit['Precio_Farmacia_Target_SIN_IVA'].fillna(0)
-    df_audit['Precio_Intercompany_Target_SIN_IVA'] = df_audit['Precio_Intercompany_Target_SIN_IVA'].fillna(0)
-    
-    df_audit['Precio_Objetivo'] = np.where(
-        (df_audit['Solicitante'] == CLIENTE_200046) | (df_audit['Solicitante'] == CLIENTE_200173),
-        df_audit['Precio_Intercompany_Target_SIN_IVA'],
-        df_audit['Precio_Farmacia_Target_SIN_IVA']
-    )
-    
-    df_audit['Precio_Unitario_Neto_Factura'] = pd.to_numeric(df_audit['Valor neto'], errors='coerce') / pd.to_numeric(df_audit['Cant'], errors='coerce')
-    
-    df_audit['Desvío_Precio_Lista'] = np.where(
-        (df_audit['Precio_Objetivo'] > 0) & (df_audit['Precio_Unitario_Neto_Factura'].notna()), 
-        ((df_audit['Precio_Unitario_Neto_Factura'] / df_audit['Precio_Objetivo']) - 1) * 100, 
-        np.nan 
-    )
-
-    # 4. Lógica de Prioridad de Descuentos (np.select)
-    condiciones = [
-        ((df_audit['Zona de Venta'].isin(ZONAS_FUNCIONARIOS)) & (df_audit['Almacen'] != ALMACEN_EMPLEADOS_PERMITIDO) & (df_audit['% Desc'] > DESC_MAX_EMPLEADOS)) | \
-        ((df_audit['Zona de Venta'].isin(ZONAS_FUNCIONARIOS)) & (df_audit['% Desc'] > DESC_MAX_EMPLEADOS)),
-        (df_audit['Desvío_Precio_Lista'] < -MAX_PRECIO_DESVIACION) & (df_audit['Desvío_Precio_Lista'].notna()),
-        (df_audit['Codigo'].isin(codigos_controlados)) & (df_audit['% Desc'] > DESC_MAX_CONTROLADOS),
-        (df_audit['Solicitante'] == CLIENTE_200046) & (df_audit['% Desc'] > DESC_INTERCOMPANY_200046),
-        (df_audit['Solicitante'] == CLIENTE_200173) & (df_audit['% Desc'] > DESC_INTERCOMPANY_200173), 
-        (df_audit['Jerarquia'].isin(marcas_6_porciento)) & (df_audit['% Desc'] > DESC_MAX_NUTRICIA_BEBELAC), 
-        (df_audit['% Desc'] > DESC_MAX_GENERAL)
-    ]
-    etiquetas_alerta = [
-        ETIQUETAS_ALERTA[0], # '❌ Ilegal (Empleado/Médico)'
-        ETIQUETAS_ALERTA[1], # '⛔ Precio Facturado bajo (>2.0%)'
-        ETIQUETAS_ALERTA[2], # '⚠️ Controlado (>5%) Excedido'
-        ETIQUETAS_ALERTA[3], # '⚠️ Intercompany 200046 (>11%) Excedido'
-        ETIQUETAS_ALERTA[4], # '⚠️ Intercompany 200173 (>10%) Excedido' 
-        ETIQUETAS_ALERTA[5], # '⚠️ Marca Nutricion (>6%) Excedido' 
-        ETIQUETAS_ALERTA[6]  # '⚠️ General (>7%) Excedido'
-    ]
-
-    df_audit['Alerta_Descuento'] = np.select(condiciones, etiquetas_alerta, default='✅ OK')
-    desvios_encontrados = df_audit[df_audit['Alerta_Descuento'] != '✅ OK']
-    
-    return desvios_encontrados, df_audit
-
-
-# --- FUNCIÓN DE EXPORTACIÓN A EXCEL (XLSX) (Sin cambios) ---
-def to_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Reporte Auditoria')
-    output.seek(0)
-    return output.read() 
+# Inicializar st.session_state después de presionar "Procesar". La sesión guarda solo la huella
+# del archivo: el contenido leído vive una sola vez en la caché compartida (ver CacheResultados).
+if 'huella_archivo' not in st.session_state:
+    st.session_state['huella_archivo'] = None
+if 'huella_libro' not in st.session_state:
+    st.session_state['huella_libro'] = None
+if 'nombre_archivo' not in st.session_state:
+    st.session_state['nombre_archivo'] = None
+if 'id_trabajo' not in st.session_state:
+    st.session_state['id_trabajo'] = None
+if 'error_carga' not in st.session_state:
+    st.session_state['error_carga'] = None
+if 'id_sesion' not in st.session_state:
+    st.session_state['id_sesion'] = uuid.uuid4().hex[:12]
+st.session_state['ejecuciones'] = st.session_state.get('ejecuciones', 0) + 1
+
+# Mediciones de este rerun (tiempo, filas y memoria por etapa; aciertos de caché)
+registro = RegistroRendimiento(st.session_state['id_sesion'], st.session_state['ejecuciones'])
+
+# --- LECTURA Y AUDITORÍA CACHEADAS (UNA SOLA VEZ POR CONTENIDO, COMPARTIDAS ENTRE SESIONES) ---
+# Una única CacheResultados por servidor, con presupuesto en bytes, LRU, TTL y desborde a disco.
+# La clave es la huella del archivo: si varias sesiones suben el mismo archivo se lee y audita una
+# vez. Los resultados se comparten sin copiarlos: se tratan como solo lectura.
+@st.cache_resource
+def obtener_cache_resultados():
+    return CacheResultados()
+
+
+def consultar_cache(nombre, clave, calcular):
+    valor, origen = obtener_cache_resultados().obtener(clave, calcular)
+    registro.cache(nombre, acierto=origen != 'calculado')
+    return valor
+
+
+def cargar_libro(huella, huella_libro=None):
+    # Normalmente ya lo leyó el trabajo en segundo plano. Si la caché compartida lo desalojó, queda
+    # la caché Parquet de la ingesta (la sesión solo guarda la huella, no el contenido). Con vigencia
+    # de precios, huella combina el archivo con el historial y la caché Parquet está bajo la huella
+    # del archivo (huella_libro); el listado sale del historial, donde el del archivo ya quedó registrado.
+    con_historial = huella_libro is not None and huella_libro != huella
+
+    def leer():
+        with st.spinner("Leyendo el archivo..."):
+            tablas = leer_cache_libro(huella_libro or huella)
+        if tablas is None:
+            raise FileNotFoundError("El archivo ya no está disponible en la caché del servidor.")
+        if con_historial:
+            tablas = (tablas[0], obtener_historial_precios().listado())
+        return tablas
+    return consultar_cache('lectura', ('libro', huella), leer)
+
+
+def auditar_libro(huella, df_ventas, df_precios):
+    def auditar():
+        with st.spinner("Auditando todas las transacciones..."):
+            # Archivos grandes: fragmentos auditados en varios procesos (ver paralelo.UMBRAL_PARALELO)
+            return auditar_con_mascaras(df_ventas, df_precios, registro)
+    return consultar_cache('auditoria', ('auditoria', huella), auditar)
+
+
+# --- PROCESAMIENTO EN SEGUNDO PLANO ---
+# La lectura y la auditoría de un archivo recién subido corren en el pool de trabajos del servidor
+# (ver trabajos.py); la pantalla de avance se refresca sola y el tablero se abre apenas termina
+# la auditoría, mientras las exportaciones previas siguen en segundo plano.
+INTERVALO_AVANCE = 1.0  # Segundos entre refrescos de la pantalla de avance
+
+
+@st.cache_resource
+def obtener_gestor_trabajos():
+    return GestorTrabajos()
+
+
+def mostrar_barras_avance(estado, etapas):
+    for etapa in etapas:
+        avance = estado['etapas'][etapa]
+        total = avance['total']
+        if avance['terminada']:
+            fraccion = 1.0
+        else:
+            fraccion = min(avance['hechas'] / total, 1.0) if total else 0.0
+        texto = f"{ETAPAS_TRABAJO[etapa]}: {avance['hechas']:,}" + (f" de {total:,}" if total else "")
+        st.progress(fraccion, text=texto)
+
+
+@st.fragment(run_every=INTERVALO_AVANCE)
+def mostrar_avance_trabajo(id_trabajo):
+    trabajo = obtener_gestor_trabajos().obtener(id_trabajo)
+    estado = trabajo.instantanea() if trabajo is not None else None
+    if estado is None or estado['estado'] == 'error':
+        # El error se muestra en la pantalla de carga, junto al formulario
+        st.session_state['error_carga'] = estado['error'] if estado else RuntimeError("El procesamiento se interrumpió.")
+        st.session_state['huella_archivo'] = None
+        st.session_state['id_trabajo'] = None
+        st.rerun()
+    if estado['etapas']['auditoria']['terminada']:
+        st.rerun()
+
+    st.subheader(f"Procesando {estado['nombre']}")
+    st.caption(f"Tiempo transcurrido: {estado['segundos']:,.0f} s")
+    mostrar_barras_avance(estado, ETAPAS_TRABAJO)
+
+    kpis = estado['kpis']
+    if kpis:
+        st.markdown("---")
+        st.caption("**KPIs parciales (sobre las líneas ya auditadas)**")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("**Transacciones Auditadas**", f"{kpis['Transacciones Auditadas']:,}")
+        col2.metric("**Transacciones con Desvío**", f"{kpis['Transacciones con Desvío']:,}")
+        col3.metric("**Nivel de Cumplimiento**", f"{kpis['Nivel de Cumplimiento (%)']:.2f}%")
+        col4.metric("**Valor Neto de Desvíos (Gs.)**", f"Gs. {kpis['Valor Neto de Desvíos (Gs.)']:,.0f}")
+
+
+@st.fragment(run_every=INTERVALO_AVANCE)
+def mostrar_avance_exportaciones(id_trabajo):
+    trabajo = obtener_gestor_trabajos().obtener(id_trabajo)
+    if trabajo is None or trabajo.etapa_terminada('exportaciones'):
+        return
+    mostrar_barras_avance(trabajo.instantanea(), ['exportaciones'])
+
+
+# Formato numérico de las grillas (column_config: se aplica en el navegador, sin Styler)
+FORMATO_COLUMNAS = {
+    '% Desc': st.column_config.NumberColumn(format="%.2f%%"),
+    'Valor neto': st.column_config.NumberColumn(format="Gs. %,.0f"),
+    'Precio_Objetivo': st.column_config.NumberColumn(format="Gs. %,.2f"),
+    'Desvío_Precio_Lista': st.column_config.NumberColumn(format="%.2f%%"),
+    'Precio_Unitario_Neto_Factura': st.column_config.NumberColumn(format="Gs. %,.2f"),
+    'Puntaje_Atipico': st.column_config.NumberColumn(format="%.1f"),
+}
+
+
+# Histórico incremental compartido por todas las sesiones del servidor
+@st.cache_resource
+def obtener_historico():
+    return HistoricoAuditoria(RUTA_HISTORICO)
+
+
+# Historial de precios con vigencias, compartido por todas las sesiones del servidor
+@st.cache_resource
+def obtener_historial_precios():
+    return HistorialPrecios(RUTA_HISTORIAL_PRECIOS)
+
+
+# Dimensiones de la pestaña de tendencias (etiqueta en pantalla -> dimensión del cubo)
+DIMENSIONES_TENDENCIA = {
+    'Total': DIMENSION_TOTAL,
+    'Cliente': 'Solicitante',
+    'Producto': 'Codigo',
+    'Marca': 'Jerarquia',
+    'Almacén': 'Almacen',
+}
+MESES_TENDENCIA = 24
+
+
+# --- EXPORTACIÓN BAJO DEMANDA ---
+# Los reportes solo se generan al pulsar el botón de descarga y quedan en la caché compartida
+# con clave (huella del archivo, estado de filtros, tipo de reporte, formato).
+def descarga_diferida(huella, clave_filtros, tipo_reporte, formato, construir_hojas, id_sesion=None):
+    # st.download_button ejecuta este callable recién cuando el usuario hace clic, fuera del
+    # rerun: la medición de la exportación va solo al log, con un registro propio.
+    cache = obtener_cache_resultados()
+
+    def generar():
+        registro_descarga = RegistroRendimiento(id_sesion)
+        with registro_descarga.etapa(f'exportacion_{tipo_reporte}_{formato}'):
+            datos, origen = cache.obtener(
+                ('exportacion', huella, clave_filtros, tipo_reporte, formato),
+                lambda: exportar(construir_hojas(), formato)
+            )
+        registro_descarga.cache(f'exportacion_{tipo_reporte}', acierto=origen != 'calculado')
+        return datos
+    return generar
+
+
+# --- EXPLORADOR DE DESVÍOS (DRILL-DOWN) ---
+# Rankings top-N por dimensión y navegación cliente -> producto -> líneas sobre un índice por
+# grupo que se arma una vez por archivo (ver exploracion.IndiceExploracion).
+def mostrar_explorador(huella, df_audit, seleccion, desvio):
+    with registro.etapa('explorador_indice', len(df_audit)):
+        indice = consultar_cache('exploracion', ('exploracion', huella), lambda: IndiceExploracion(df_audit))
+    etiquetas_dimension = {columna: etiqueta for etiqueta, columna in DIMENSIONES_EXPLORACION.items()}
+
+    col_dimension, col_orden, col_limite = st.columns([2, 2, 1])
+    etiqueta_dimension = col_dimension.radio("Agrupar por", list(DIMENSIONES_EXPLORACION), horizontal=True, key='explorador_dimension')
+    orden_por = col_orden.radio("Ordenar por", list(ORDENES_RANKING), horizontal=True, key='explorador_orden')
+    limite = col_limite.number_input("Top", min_value=5, max_value=200, value=20, step=5, key='explorador_limite')
+
+    # Dos niveles de ranking (p. ej. clientes y, dentro del elegido, sus productos) y luego las líneas
+    dimension = DIMENSIONES_EXPLORACION[etiqueta_dimension]
+    ruta, migas, filas, clave = [], [], None, 'explorador'
+    for nivel in (1, 2):
+        with registro.etapa(f'explorador_ranking_{nivel}') as medicion:
+            ranking = indice.ranking(dimension, seleccion, desvio, limite, ORDENES_RANKING[orden_por], filas)
+            medicion['Filas'] = len(filas) if filas is not None else len(df_audit)
+        etiqueta = etiquetas_dimension[dimension]
+        st.caption(f"**{etiqueta}: top {limite} por {orden_por.lower()}**")
+        if ranking.empty:
+            st.info("No hay desvíos para mostrar en este nivel.")
+            return
+        st.dataframe(
+            ranking.drop(columns='Grupo').rename(columns={'Valor': etiqueta}),
+            hide_index=True,
+            width='stretch',
+            column_config={
+                '% con Desvío': st.column_config.NumberColumn(format="%.2f%%"),
+                'Valor Neto de Desvíos (Gs.)': st.column_config.NumberColumn(format="Gs. %,.0f"),
+            }
+        )
+        # Opciones por nombre (únicos dentro de la dimensión) -> código de grupo del índice
+        nombres = ranking['Valor']
+        if 'Descripción' in ranking.columns:
+            nombres = nombres + ' · ' + ranking['Descripción']
+        grupos = dict(zip(nombres, ranking['Grupo'].tolist()))
+        clave = f'{clave}_{dimension}'
+        nombre = st.selectbox(
+            f"Ver detalle de {etiqueta.lower()}", list(grupos), index=None, placeholder="Elegir...", key=clave
+        )
+        if nombre is None:
+            return
+        ruta.append((dimension, grupos[nombre]))
+        migas.append(nombre)
+        clave = f'{clave}_{grupos[nombre]}'
+        filas = indice.lineas(ruta, seleccion)
+        dimension = SIGUIENTE_DIMENSION[dimension]
+
+    with registro.etapa('explorador_lineas') as medicion:
+        posiciones = indice.lineas(ruta, seleccion, desvio)
+        medicion['Filas'] = len(posiciones)
+    st.caption(f"**Líneas con desvío: {' → '.join(migas)}**")
+    st.dataframe(df_audit.iloc[posiciones][COLUMNAS_REPORTE_ALERTAS], column_config=FORMATO_COLUMNAS, width='stretch')
+
+
+# --- SIMULADOR DE UMBRALES (WHAT-IF) ---
+# Fragmento: mover un umbral vuelve a ejecutar solo esta sección, no el tablero completo. Las
+# alertas se recalculan sobre el resultado ya auditado (ver simulacion.SimuladorUmbrales).
+def restablecer_umbrales():
+    # Sin estado guardado, cada slider vuelve a su valor inicial (el umbral vigente)
+    for clave in UMBRALES_SIMULABLES:
+        st.session_state.pop(f'umbral_{clave}', None)
+
+
+@st.fragment
+def mostrar_simulador(huella, df_audit, seleccion):
+    with registro.etapa('simulador_preparacion', len(df_audit)):
+        simulador = consultar_cache('simulacion', ('simulacion', huella), lambda: SimuladorUmbrales(df_audit))
+
+    umbrales = {}
+    columnas = st.columns(3)
+    for i, (clave, (etiqueta, _, valor_vigente, _)) in enumerate(UMBRALES_SIMULABLES.items()):
+        umbrales[clave] = columnas[i % 3].slider(
+            etiqueta, min_value=0.0, max_value=30.0, value=float(valor_vigente), step=0.5, key=f'umbral_{clave}'
+        )
+    st.button("↩️ Restablecer umbrales vigentes", on_click=restablecer_umbrales, key="restablecer_umbrales")
+
+    with registro.etapa('simulador_evaluacion', int(seleccion.sum())):
+        vigente, reglas_vigente = simulador.simular({}, seleccion)
+        simulado, reglas_simulado = simulador.simular(umbrales, seleccion)
+
+    col1, col2, col3 = st.columns(3)
+    diferencia = simulado['Transacciones con Desvío'] - vigente['Transacciones con Desvío']
+    col1.metric("**Transacciones con Desvío**", f"{simulado['Transacciones con Desvío']:,}", delta=f"{diferencia:+,}", delta_color="inverse")
+    diferencia = simulado['Nivel de Cumplimiento (%)'] - vigente['Nivel de Cumplimiento (%)']
+    col2.metric("**Nivel de Cumplimiento**", f"{simulado['Nivel de Cumplimiento (%)']:.2f}%", delta=f"{diferencia:+.2f}%")
+    diferencia = simulado['Valor Neto de Desvíos (Gs.)'] - vigente['Valor Neto de Desvíos (Gs.)']
+    col3.metric("**Valor Neto de Desvíos (Gs.)**", f"Gs. {simulado['Valor Neto de Desvíos (Gs.)']:,.0f}", delta=f"Gs. {diferencia:+,.0f}", delta_color="inverse")
+
+    # Alerta prioritaria de cada línea y líneas que incumplen cada regla (una línea puede incumplir varias)
+    etiquetas = [ETIQUETAS_ALERTA[codigo] for codigo in CODIGOS_DESVIO]
+    comparacion = pd.DataFrame({
+        'Tipo de Alerta': etiquetas,
+        'Líneas (vigente)': [vigente[e] for e in etiquetas],
+        'Líneas (simulado)': [simulado[e] for e in etiquetas],
+        'Incumplen la regla (vigente)': reglas_vigente,
+        'Incumplen la regla (simulado)': reglas_simulado,
+    })
+    comparacion.insert(3, 'Diferencia', comparacion['Líneas (simulado)'] - comparacion['Líneas (vigente)'])
+    st.dataframe(comparacion, hide_index=True, width='stretch')
+
+
+def mostrar_diagnostico():
+    with st.expander("🩺 Diagnóstico de rendimiento (esta ejecución)"):
+        st.caption(
+            "Tiempo, filas y variación de memoria del proceso por etapa. Las mismas mediciones se "
+            "registran como líneas JSON en el log 'tablero.rendimiento'."
+        )
+        metricas_cache = obtener_cache_resultados().metricas()
+        st.caption(
+            f"Caché compartida: {metricas_cache['entradas']} entradas, {metricas_cache['mb_en_memoria']:,} de "
+            f"{metricas_cache['mb_presupuesto']:,} MB en memoria, {metricas_cache['mb_en_disco']:,} MB en disco · "
+            f"aciertos {metricas_cache['aciertos']} (+{metricas_cache['aciertos_disco']} desde disco), "
+            f"fallos {metricas_cache['fallos']}, desalojos {metricas_cache['desalojos']}, vencidos {metricas_cache['vencidos']}"
+        )
+        if registro.caches:
+            st.write(" · ".join(
+                f"Caché {nombre}: {'acierto' if acierto else 'fallo'}" for nombre, acierto in registro.caches.items()
+            ))
+        st.dataframe(registro.tabla(), hide_index=True, width='stretch')
 
 
 # --- INTERFAZ STREAMLIT (EL DASHBOARD) ---
@@ -269,7 +436,9 @@ div[data-testid="stHorizontalBlock"] > div:nth-child(2) > div:last-child {{
 st.title("Tablero de control de facturación")
 
 # --- LÓGICA DE PANTALLA CONDICIONAL ---
-if st.session_state['file_data'] is None:
+trabajo_en_curso = obtener_gestor_trabajos().obtener(st.session_state['id_trabajo']) if st.session_state['id_trabajo'] else None
+
+if st.session_state['huella_archivo'] is None:
     # ----------------------------------------------------
     # ESTADO 1: PANTALLA DE CARGA MINIMALISTA
     # ----------------------------------------------------
@@ -281,40 +450,92 @@ if st.session_state['file_data'] is None:
     with col_c:
         with st.form("upload_form", clear_on_submit=False):
             # Título de carga con color turquesa institucional
-            st.markdown(f"**<p style='color: {COLOR_INSTITUCIONAL};'>SUBIR ARCHIVO ÚNICO DE AUDITORÍA (.XLSX)</p>**", unsafe_allow_html=True)
+            st.markdown(f"**<p style='color: {COLOR_INSTITUCIONAL};'>SUBIR ARCHIVO DE AUDITORÍA (.XLSX, .CSV, .PARQUET O .ZIP)</p>**", unsafe_allow_html=True)
             uploaded_file_temp = st.file_uploader(
                 "", 
-                type=['xlsx'], 
+                type=[extension.lstrip('.') for extension in EXTENSIONES_ENTRADA], 
+                accept_multiple_files=True,
                 key="auditoria_file_temp",
-                help="El archivo Excel debe contener dos hojas llamadas exactamente: 'Facturacion' y 'Listado de Precios'."
+                help="Un libro Excel con dos hojas llamadas exactamente 'Facturacion' y 'Listado de Precios', "
+                     "o las dos tablas como archivos CSV/Parquet (sueltos o en un .zip) cuyo nombre indique "
+                     "la tabla: p. ej. 'facturacion.csv' y 'listado_precios.csv'."
+            )
+            vigencia_precios = st.date_input(
+                "Vigencia del listado de precios (opcional)",
+                value=None,
+                format="DD/MM/YYYY",
+                key="vigencia_precios",
+                help="Con una fecha, el listado se registra en el historial de precios con esa vigencia y cada "
+                     "línea se compara con el precio vigente en su fecha de factura. Sin fecha se usa solo el "
+                     "listado del archivo (con sus propias vigencias, si trae la columna 'Vigente_Desde')."
             )
             submitted = st.form_submit_button("➡️ PROCESAR DATOS Y ABRIR TABLERO")
 
         if submitted:
-            if uploaded_file_temp is not None:
-                st.session_state['file_data'] = uploaded_file_temp
+            if uploaded_file_temp:
+                # Se lee una sola vez al procesar; la sesión conserva solo la huella y el id del trabajo
+                archivos = [(archivo.name, archivo.getvalue()) for archivo in uploaded_file_temp]
+                huella = huella_libro = huella_archivos(archivos)
+                historial = None
+                if vigencia_precios is not None:
+                    # La auditoría depende también de la vigencia y del historial registrado hasta ahora
+                    historial = obtener_historial_precios()
+                    huella = calcular_huella(f'{huella}|{vigencia_precios.isoformat()}|{historial.version()}'.encode())
+                nombre_archivo = ', '.join(nombre for nombre, _ in archivos)
+                cache = obtener_cache_resultados()
+                id_sesion = st.session_state['id_sesion']
+                trabajo = obtener_gestor_trabajos().enviar(
+                    huella, nombre_archivo,
+                    lambda trabajo: procesar_archivos(trabajo, archivos, cache, id_sesion, historial, vigencia_precios)
+                )
+                st.session_state['huella_archivo'] = huella
+                st.session_state['huella_libro'] = huella_libro
+                st.session_state['nombre_archivo'] = nombre_archivo
+                st.session_state['id_trabajo'] = trabajo.id
+                st.session_state['error_carga'] = None
                 st.rerun() 
             else:
                 st.error("Por favor, suba un archivo antes de presionar 'Procesar'.")
 
+        # Error del último procesamiento en segundo plano
+        error_carga = st.session_state['error_carga']
+        if isinstance(error_carga, ValueError):
+            st.error("Error al leer el archivo. Asegúrese de que el archivo Excel contenga dos hojas llamadas exactamente **'Facturacion'** y **'Listado de Precios'**, "
+                     "o de subir las dos tablas en CSV/Parquet con 'facturacion' y 'precios' en el nombre de cada archivo.")
+        elif error_carga is not None:
+            st.error(f"Ocurrió un error inesperado al procesar el archivo: {error_carga}")
+            st.warning("Verifique la estructura de las columnas en sus hojas de cálculo.")
+
+elif trabajo_en_curso is not None and not trabajo_en_curso.etapa_terminada('auditoria'):
+    # ----------------------------------------------------
+    # ESTADO 1B: ARCHIVO EN PROCESO (LECTURA Y AUDITORÍA EN SEGUNDO PLANO)
+    # ----------------------------------------------------
+    st.markdown("---")
+    mostrar_avance_trabajo(trabajo_en_curso.id)
+
 else:
     # ----------------------------------------------------
-    # ESTADO 2: DASHBOARD ACTIVO (ARCHIVO GUARDADO EN SESSION STATE)
+    # ESTADO 2: DASHBOARD ACTIVO (HUELLA DEL ARCHIVO GUARDADA EN SESSION STATE)
     # ----------------------------------------------------
-    uploaded_file = st.session_state['file_data']
+    huella_archivo = st.session_state['huella_archivo']
+
+    # Reportes que el trabajo en segundo plano todavía está generando
+    if trabajo_en_curso is not None:
+        mostrar_avance_exportaciones(trabajo_en_curso.id)
     
-    # 1. INTENTO DE LECTURA DE HOJAS
+    # 1. LECTURA DE HOJAS (desde la caché compartida; el archivo ya se leyó al procesarlo)
     try:
-        df_ventas = pd.read_excel(uploaded_file, sheet_name='Facturacion')
-        df_precios = pd.read_excel(uploaded_file, sheet_name='Listado de Precios')
-    except ValueError as e:
-        st.error(f"Error al leer el archivo. Asegúrese de que el archivo Excel contenga dos hojas llamadas exactamente **'Facturacion'** y **'Listado de Precios'**.")
-        st.session_state['file_data'] = None
+        with registro.etapa('lectura') as medicion:
+            df_ventas, df_precios = cargar_libro(huella_archivo, st.session_state['huella_libro'])
+            medicion['Filas'] = len(df_ventas)
+    except FileNotFoundError:
+        st.warning("El archivo procesado ya no está disponible en el servidor (se liberó por inactividad). Vuelva a subirlo.")
+        st.session_state['huella_archivo'] = None
         st.stop()
     except Exception as e:
         st.error(f"Ocurrió un error inesperado al procesar el archivo: {e}")
         st.warning("Verifique la estructura de las columnas en sus hojas de cálculo.")
-        st.session_state['file_data'] = None
+        st.session_state['huella_archivo'] = None
         st.stop()
         
     
@@ -416,50 +637,47 @@ else:
     
     # 3. APLICACIÓN DE FILTROS Y EJECUCIÓN DE AUDITORÍA
     try:
-        df_filtrado = df_ventas.copy()
-        
-        # Normalización de columnas para el filtrado
-        df_filtrado['Almacen'] = pd.to_numeric(df_filtrado['Almacen'], errors='coerce', downcast='integer')
-        df_filtrado['Zona de Venta'] = df_filtrado['Zona de Venta'].astype(str)
-        df_filtrado['Codigo'] = df_filtrado['Codigo'].astype(str) 
-
-        
-        # --- Lógica de Filtros Aplicados ---
+        # La auditoría corre una sola vez sobre todas las filas; los filtros solo combinan máscaras
+        with registro.etapa('auditoria', len(df_ventas)):
+            df_audit, mascaras, valor_neto = auditar_libro(huella_archivo, df_ventas, df_precios)
+
+        filtros = {
+            'controlados': 'excluir' if excluir_controlados else ('solo' if ver_solo_controlados else None),
+            'ofertas': 'excluir' if excluir_1012 else ('solo' if ver_solo_1012 else None),
+            'funcionarios': 'excluir' if excluir_funcionarios else ('solo' if ver_solo_funcionarios else None),
+        }
+        with registro.etapa('filtros', len(df_audit)):
+            seleccion = combinar_mascaras(mascaras, filtros)
         
-        # 1. Medicamentos Controlados
-        if excluir_controlados:
-            df_filtrado = df_filtrado[~df_filtrado['Codigo'].astype(str).isin(codigos_controlados)]
-        elif ver_solo_controlados:
-            df_filtrado = df_filtrado[df_filtrado['Codigo'].astype(str).isin(codigos_controlados)]
-
-        # 2. Almacén de Ofertas (1012)
-        if excluir_1012:
-            df_filtrado = df_filtrado[df_filtrado['Almacen'] != ALMACEN_OFERTAS]
-        elif ver_solo_1012:
-            df_filtrado = df_filtrado[df_filtrado['Almacen'] == ALMACEN_OFERTAS]
-
-        # 3. Facturación a Funcionarios
-        if excluir_funcionarios:
-            df_filtrado = df_filtrado[~df_filtrado['Zona de Venta'].isin(ZONAS_FUNCIONARIOS)]
-        elif ver_solo_funcionarios:
-            df_filtrado = df_filtrado[df_filtrado['Zona de Venta'].isin(ZONAS_FUNCIONARIOS)]
-
-        
-        if df_filtrado.empty:
+        if not seleccion.any():
             st.warning("El archivo cargado no contiene transacciones después de aplicar los filtros seleccionados.")
             st.stop()
-            
-        # Ejecutar auditoría sobre el DataFrame filtrado
-        desvios, df_completo = ejecutar_auditoria(df_filtrado, df_precios)
+
+        with registro.etapa('seleccion_y_kpis', int(seleccion.sum())):
+            seleccion_desvios = seleccion & mascaras['desvio']
+            df_completo = df_audit[seleccion]
+            desvios = df_audit[seleccion_desvios]
+        
+            # CÁLCULO DE KPIs (Métricas)
+            total_transacciones = int(seleccion.sum())
+            transacciones_desviadas = int(seleccion_desvios.sum())
+            porcentaje_cumplimiento = (1 - (transacciones_desviadas / total_transacciones)) * 100 if total_transacciones > 0 else 0
+            valor_neto_desviado = np.nansum(valor_neto[seleccion_desvios])
         
-        # CÁLCULO DE KPIs (Métricas)
-        total_transacciones = len(df_completo)
-        transacciones_desviadas = len(desvios)
-        porcentaje_cumplimiento = (1 - (transacciones_desviadas / total_transacciones)) * 100 if total_transacciones > 0 else 0
-        valor_neto_desviado = pd.to_numeric(desvios['Valor neto'], errors='coerce').sum()
+        # Columnas de cada reporte (pantalla y descarga)
+        columnas_auditoria = COLUMNAS_REPORTE_ALERTAS
+        columnas_completas = COLUMNAS_REPORTE_COMPLETO
+
+        # Constructores de hojas: se evalúan solo al descargar
+        clave_filtros = tuple(sorted(filtros.items()))
+        firma_datos = (huella_archivo, clave_filtros)
+        hojas_alertas = lambda: hojas_reporte('alertas', desvios, df_completo)
+        hojas_completo = lambda: hojas_reporte('completo', desvios, df_completo)
+        hojas_comparativo = lambda: hojas_reporte('comparativo', desvios, df_completo)
+        hojas_consolidado = lambda: hojas_reporte('consolidado', desvios, df_completo)
         
         # --- Implementación de 4 Pestañas (Tabs) ---
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 Resumen Ejecutivo", "⚠️ Análisis Detallado de Riesgo", "📝 Listado Completo", "💲 Comparativo de Precios"])
+        tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["📊 Resumen Ejecutivo", "⚠️ Análisis Detallado de Riesgo", "📝 Listado Completo", "💲 Comparativo de Precios", "🗄️ Histórico", "📈 Tendencias", "🎚️ Simulador de Umbrales"])
 
         with tab1:
             st.header(f"Métricas Clave de Cumplimiento")
@@ -483,41 +701,41 @@ else:
             if not desvios.empty:
                 st.subheader("Gráfico de Riesgo: Distribución de Alertas por Tipo")
                 
-                alerta_counts = desvios['Alerta_Descuento'].value_counts().reset_index()
-                alerta_counts.columns = ['Tipo de Alerta', 'Cantidad de Desvíos']
-                alerta_counts = alerta_counts.set_index('Tipo de Alerta')
-                st.bar_chart(alerta_counts, use_container_width=True, color=COLOR_INSTITUCIONAL) # Turquesa en el gráfico
+                with registro.etapa('graficos', len(desvios)):
+                    # value_counts sobre los códigos categóricos; se omiten los tipos sin desvíos
+                    alerta_counts = desvios['Alerta_Descuento'].value_counts()
+                    alerta_counts = alerta_counts[alerta_counts > 0].reset_index()
+                    alerta_counts.columns = ['Tipo de Alerta', 'Cantidad de Desvíos']
+                    alerta_counts = alerta_counts.set_index('Tipo de Alerta')
+                    st.bar_chart(alerta_counts, width='stretch', color=COLOR_INSTITUCIONAL) # Turquesa en el gráfico
+
+                    # Una línea puede incumplir varias reglas: el gráfico anterior muestra solo la prioritaria
+                    st.subheader("Incumplimientos por Regla (todas las reglas de cada línea)")
+                    conteo_reglas = pd.DataFrame({
+                        'Regla': [regla['etiqueta'] for regla in REGLAS_AUDITORIA],
+                        'Líneas que la incumplen': contar_por_regla(desvios['Reglas_Incumplidas'].to_numpy(), len(REGLAS_AUDITORIA)),
+                    }).set_index('Regla')
+                    st.bar_chart(conteo_reglas[conteo_reglas['Líneas que la incumplen'] > 0], width='stretch', color=COLOR_INSTITUCIONAL)
                 
                 st.markdown("---")
                 
                 st.subheader("Tabla Detallada de las Desviaciones")
                 
-                columnas_auditoria = ['Fecha factura', 'Almacen', 'Nombre 1', 'Codigo', 'Material', 'Jerarquia', '% Desc', 'Valor neto', 'Alerta_Descuento']
-                columnas_auditoria.insert(8, 'Precio_Objetivo') 
-                columnas_auditoria.insert(9, 'Desvío_Precio_Lista') 
-                columnas_auditoria.insert(10, 'Precio_Unitario_Neto_Factura') 
-                     
-                st.dataframe(
-                    desvios[columnas_auditoria].style.format({
-                        '% Desc': '{:.2f}%',
-                        'Valor neto': 'Gs. {:,.0f}',
-                        'Precio_Objetivo': 'Gs. {:,.2f}',
-                        'Desvío_Precio_Lista': '{:.2f}%',
-                        'Precio_Unitario_Neto_Factura': 'Gs. {:,.2f}'
-                    }), 
-                    use_container_width=True
-                )
-                
-                df_export_desvios = desvios[columnas_auditoria]
-                xlsx_data_desvios = to_excel(df_export_desvios)
+                with registro.etapa('grilla_desvios', len(desvios)):
+                    mostrar_grilla(desvios[columnas_auditoria], 'grilla_desvios', firma_datos, FORMATO_COLUMNAS)
                 
                 st.download_button(
                     label="Descargar Alertas en XLSX (Excel)", 
-                    data=xlsx_data_desvios, 
+                    data=descarga_diferida(huella_archivo, clave_filtros, 'alertas', 'xlsx', hojas_alertas, registro.sesion), 
                     file_name='Reporte_Desviaciones_LQF.xlsx', 
-                    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                    mime=FORMATOS_EXPORTACION['xlsx'][1],
                     key="descarga_alertas" 
                 )
+
+                st.markdown("---")
+
+                st.subheader("Explorador de Desvíos: Ranking y Detalle por Cliente y Producto")
+                mostrar_explorador(huella_archivo, df_audit, seleccion, mascaras['desvio'])
                 
             else:
                 st.info("No hay desvíos que analizar en este reporte.")
@@ -526,90 +744,183 @@ else:
             st.subheader("Listado de Todas las Transacciones Verificadas")
             st.info("Esta tabla muestra todas las líneas del archivo cargado con el resultado de la auditoría (OK o Alerta), luego de aplicar los filtros.")
 
-            columnas_completas = ['Fecha factura', 'Almacen', 'Nombre 1', 'Codigo', 'Material', 'Jerarquia', 'Cant', '% Desc', 'Valor neto', 'Alerta_Descuento']
-            columnas_completas.insert(9, 'Precio_Objetivo')
-            columnas_completas.insert(10, 'Desvío_Precio_Lista')
-            columnas_completas.insert(11, 'Precio_Unitario_Neto_Factura')
-            
-            st.dataframe(
-                 df_completo[columnas_completas].style.format({
-                    '% Desc': '{:.2f}%',
-                    'Valor neto': 'Gs. {:,.0f}',
-                    'Precio_Objetivo': 'Gs. {:,.2f}',
-                    'Desvío_Precio_Lista': '{:.2f}%',
-                    'Precio_Unitario_Neto_Factura': 'Gs. {:,.2f}'
-                }),
-                use_container_width=True
-            )
-
-            df_export_completo = df_completo[columnas_completas]
-            xlsx_data_completo = to_excel(df_export_completo)
+            with registro.etapa('grilla_completa', len(df_completo)):
+                mostrar_grilla(df_completo[columnas_completas], 'grilla_completa', firma_datos, FORMATO_COLUMNAS)
 
             st.download_button(
                 label="Descargar Listado Completo Auditado en XLSX (Excel)", 
-                data=xlsx_data_completo, 
+                data=descarga_diferida(huella_archivo, clave_filtros, 'completo', 'xlsx', hojas_completo, registro.sesion), 
                 file_name='Reporte_Completo_Auditado_LQF.xlsx', 
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                mime=FORMATOS_EXPORTACION['xlsx'][1],
                 key="descarga_completa" 
             )
+
+            # Descarga consolidada: los tres reportes en un solo libro, o en un ZIP para salidas muy grandes
+            st.markdown("---")
+            st.caption("**Descarga Consolidada (Alertas, Listado Completo y Comparativo)**")
+            formato_consolidado = st.radio(
+                "Formato de descarga",
+                options=list(FORMATOS_EXPORTACION),
+                format_func={'xlsx': 'Libro XLSX único (3 hojas)', 'csv': 'ZIP con CSV', 'parquet': 'ZIP con Parquet'}.get,
+                horizontal=True,
+                key='formato_consolidado'
+            )
+            extension_consolidado, mime_consolidado = FORMATOS_EXPORTACION[formato_consolidado]
+            st.download_button(
+                label="Descargar Reporte Consolidado", 
+                data=descarga_diferida(huella_archivo, clave_filtros, 'consolidado', formato_consolidado, hojas_consolidado, registro.sesion), 
+                file_name=f'Reporte_Consolidado_LQF.{extension_consolidado}', 
+                mime=mime_consolidado,
+                key="descarga_consolidada" 
+            )
             
         with tab4:
             st.header("Análisis de Desviación de Precios vs. Objetivo")
             st.info(f"Se auditaron **{total_transacciones:,}** líneas contra el Precio Objetivo de la Lista SIN IVA. La tolerancia de desvío es de {MAX_PRECIO_DESVIACION}%.")
 
-            df_comparativo = df_completo[df_completo['Desvío_Precio_Lista'].notna()].copy()
-                
-            df_comparativo['Precio Objetivo SIN IVA (Gs.)'] = df_comparativo['Precio_Objetivo'].apply(lambda x: f"Gs. {x:,.0f}")
-            df_comparativo['Precio Facturado Neto (Gs.)'] = df_comparativo['Precio_Unitario_Neto_Factura'].apply(lambda x: f"Gs. {x:,.0f}")
-            df_comparativo['Desvío (%)'] = df_comparativo['Desvío_Precio_Lista'] 
-                
+            # Sin columnas de texto formateadas fila por fila: las etiquetas y el formato van por column_config
             columnas_visual_comparativo = [
                 'Codigo', 
                 'Nombre 1', 
-                'Precio Objetivo SIN IVA (Gs.)', 
-                'Precio Facturado Neto (Gs.)', 
-                'Desvío (%)', 
+                'Precio_Objetivo', 
+                'Precio_Unitario_Neto_Factura', 
+                'Desvío_Precio_Lista', 
                 'Alerta_Descuento'
             ]
+            df_comparativo = df_completo.loc[df_completo['Desvío_Precio_Lista'].notna(), columnas_visual_comparativo]
                 
             if not df_comparativo.empty:
                 st.subheader("Visualización de Desviaciones de Precio")
-                st.dataframe(
-                    df_comparativo[columnas_visual_comparativo], 
-                    use_container_width=True,
-                    column_config={
-                        "Desvío (%)": st.column_config.ProgressColumn(
-                            "Desvío (%)",
-                            help="Porcentaje de diferencia respecto al Precio Objetivo. Los negativos indican que se facturó a un precio inferior.",
-                            format="%.2f%%",
-                            min_value=-20, 
-                            max_value=10, 
-                            width="medium"
-                        )
-                    }
-                )
+                with registro.etapa('grilla_comparativo', len(df_comparativo)):
+                    mostrar_grilla(
+                        df_comparativo, 
+                        'grilla_comparativo',
+                        firma_datos,
+                        column_config={
+                            'Precio_Objetivo': st.column_config.NumberColumn("Precio Objetivo SIN IVA (Gs.)", format="Gs. %,.0f"),
+                            'Precio_Unitario_Neto_Factura': st.column_config.NumberColumn("Precio Facturado Neto (Gs.)", format="Gs. %,.0f"),
+                            'Desvío_Precio_Lista': st.column_config.ProgressColumn(
+                                "Desvío (%)",
+                                help="Porcentaje de diferencia respecto al Precio Objetivo. Los negativos indican que se facturó a un precio inferior.",
+                                format="%.2f%%",
+                                min_value=-20, 
+                                max_value=10, 
+                                width="medium"
+                            )
+                        }
+                    )
             else:
                  st.info("No hay datos para el comparativo después de aplicar filtros.")
 
-            columnas_csv_comparativo = [
-                'Fecha factura', 'Nombre 1', 'Solicitante', 'Codigo', 'Material', 
-                'Jerarquia', 'Cant', '% Desc', 'Valor neto', 
-                'Precio_Objetivo', 'Precio_Unitario_Neto_Factura', 'Desvío_Precio_Lista', 
-                'Alerta_Descuento'
-            ]
-                
-            df_export_comparativo = df_completo[df_completo['Desvío_Precio_Lista'].notna()][columnas_csv_comparativo]
-            xlsx_data_comparativo = to_excel(df_export_comparativo)
-
             st.download_button(
                 label="Descargar Reporte de Comparativo de Precios en XLSX (Detallado)", 
-                data=xlsx_data_comparativo, 
+                data=descarga_diferida(huella_archivo, clave_filtros, 'comparativo', 'xlsx', hojas_comparativo, registro.sesion), 
                 file_name='Reporte_Comparativo_Precios_LQF_Detallado.xlsx', 
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                mime=FORMATOS_EXPORTACION['xlsx'][1],
                 key="descarga_comparativo" 
             )
 
+        with tab5:
+            st.header("Histórico Acumulado de Auditoría")
+            st.info("El histórico guarda cada línea auditada una sola vez. Al incorporar un archivo solo se auditan las líneas que todavía no están registradas (se ignoran los filtros del tablero).")
+
+            historico = obtener_historico()
+            if st.button("➕ Incorporar este archivo al histórico", key="incorporar_historico"):
+                with st.spinner("Incorporando líneas nuevas al histórico..."), registro.etapa('historico_ingesta', len(df_ventas)):
+                    resultado_ingesta = historico.ingerir(df_ventas, df_precios)
+                st.success(
+                    f"{resultado_ingesta['Líneas nuevas']:,} líneas nuevas auditadas e incorporadas; "
+                    f"{resultado_ingesta['Líneas ya registradas']:,} ya estaban en el histórico."
+                )
+
+            fecha_min, fecha_max = historico.rango_fechas()
+            if fecha_min is None:
+                st.warning("El histórico todavía no tiene líneas registradas.")
+            else:
+                rango = st.date_input(
+                    "Período de facturación",
+                    value=(fecha_min.date(), fecha_max.date()),
+                    min_value=fecha_min.date(),
+                    max_value=fecha_max.date(),
+                    key="rango_historico"
+                )
+                desde, hasta = (rango[0], rango[-1]) if rango else (None, None)
+                with registro.etapa('historico_kpis') as medicion:
+                    kpis_historico = historico.kpis(desde, hasta)
+                    medicion['Filas'] = kpis_historico['Transacciones Auditadas']
+
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("**Transacciones en el Histórico**", f"{kpis_historico['Transacciones Auditadas']:,}")
+                col2.metric("**Transacciones con Desvío**", f"{kpis_historico['Transacciones con Desvío']:,}")
+                col3.metric("**Nivel de Cumplimiento**", f"{kpis_historico['Nivel de Cumplimiento (%)']:.2f}%")
+                col4.metric("**Valor Neto de Desvíos (Gs.)**", f"Gs. {kpis_historico['Valor Neto de Desvíos (Gs.)']:,.0f}")
+
+        with tab6:
+            st.header("Tendencias de Cumplimiento por Mes")
+            st.info("Las tendencias salen de los agregados mensuales que se calculan al incorporar archivos al histórico (pestaña 'Histórico'); no se vuelven a leer las líneas.")
+
+            historico = obtener_historico()
+            meses = historico.meses()
+            if not meses:
+                st.warning("El histórico todavía no tiene meses registrados.")
+            else:
+                if len(meses) > 1:
+                    desde_mes, hasta_mes = st.select_slider(
+                        "Período",
+                        options=meses,
+                        value=(meses[max(0, len(meses) - MESES_TENDENCIA)], meses[-1]),
+                        key="rango_tendencias"
+                    )
+                else:
+                    desde_mes = hasta_mes = meses[0]
+
+                etiqueta_dimension = st.radio("Ver por", list(DIMENSIONES_TENDENCIA), horizontal=True, key="dimension_tendencias")
+                dimension = DIMENSIONES_TENDENCIA[etiqueta_dimension]
+                valor_dimension = ''
+                if dimension != DIMENSION_TOTAL:
+                    with registro.etapa('tendencias_ranking'):
+                        ranking = historico.ranking(dimension, desde_mes, hasta_mes)
+                    st.subheader(f"{etiqueta_dimension}: mayores desvíos del período")
+                    st.dataframe(
+                        ranking.rename(columns={'Valor': etiqueta_dimension}),
+                        hide_index=True,
+                        width='stretch',
+                        column_config={
+                            'Nivel de Cumplimiento (%)': st.column_config.NumberColumn(format="%.2f%%"),
+                            'Valor Neto de Desvíos (Gs.)': st.column_config.NumberColumn(format="Gs. %,.0f"),
+                        }
+                    )
+                    valor_dimension = st.selectbox(f"Evolución de {etiqueta_dimension}", ranking['Valor'], key="valor_tendencias")
+
+                if valor_dimension is not None:
+                    with registro.etapa('tendencias_serie') as medicion:
+                        mensual = historico.tendencia(dimension, valor_dimension, desde_mes, hasta_mes)
+                        medicion['Filas'] = len(mensual)
+
+                    st.subheader("Nivel de Cumplimiento (%)")
+                    st.line_chart(mensual['Nivel de Cumplimiento (%)'], width='stretch', color=COLOR_INSTITUCIONAL)
+
+                    st.subheader("Desvíos por Tipo de Alerta")
+                    columnas_alertas = [e for i, e in enumerate(ETIQUETAS_ALERTA) if i != CODIGO_ALERTA_OK and mensual[e].any()]
+                    if columnas_alertas:
+                        st.bar_chart(mensual[columnas_alertas], width='stretch')
+
+                    st.dataframe(mensual.iloc[:, :4], width='stretch', column_config={
+                        'Nivel de Cumplimiento (%)': st.column_config.NumberColumn(format="%.2f%%"),
+                        'Valor Neto de Desvíos (Gs.)': st.column_config.NumberColumn(format="Gs. %,.0f"),
+                    })
+
+        with tab7:
+            st.header("Simulación de Umbrales de Auditoría")
+            st.info("Ajuste los límites para ver cuántas alertas habría con otros umbrales (sobre las líneas filtradas). "
+                    "La simulación no modifica la auditoría ni los reportes, que siguen usando los umbrales vigentes.")
+            mostrar_simulador(huella_archivo, df_audit, seleccion)
+
     except Exception as e:
         st.error(f"Ocurrió un error al procesar los datos después de cargarlos. Error: {e}")
         st.warning("Verifique la estructura de las columnas en sus hojas de cálculo.")
-        st.session_state['file_data'] = None
+        st.session_state['huella_archivo'] = None
+
+    mostrar_diagnostico()
+
+registro.cerrar(cache_resultados=obtener_cache_resultados().metricas())
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+# --- PRECIOS ATÍPICOS POR PRODUCTO Y POR CLIENTE (MEDIANA / MAD) ---
+# Complementa el control contra la lista de precios: detecta precios unitarios netos anormalmente
+# bajos respecto de lo que se factura ese producto en el mismo archivo, incluso si el producto no
+# está en la lista. Para cada grupo se calcula la mediana y la desviación absoluta mediana (MAD)
+# con agregaciones agrupadas sobre códigos de grupo enteros (sin groupby.apply ni bucles por grupo):
+#
+#   - por (producto, canal): puntaje de la línea = (precio - mediana) / escala
+#   - por (producto, cliente): la mediana del cliente contra la del producto, con la misma escala
+#     (un cliente al que siempre se le factura más barato, aunque ninguna línea sola llame la atención)
+#
+# escala = max(1,4826 * MAD, ESCALA_MINIMA_RELATIVA * mediana): 1,4826 * MAD equivale al desvío
+# estándar en datos normales; el mínimo relativo evita puntajes enormes en productos que casi
+# siempre se facturan al mismo precio (MAD = 0). El puntaje de la línea es el menor de los dos.
+#
+# Las estadísticas (EstadisticasAtipicos) también se calculan aparte de las líneas a puntuar:
+# sobre todo el archivo en una primera pasada del streaming, o sobre el histórico en el servicio.
+
+MIN_LINEAS_PRODUCTO = 8
+MIN_LINEAS_CLIENTE = 3
+ESCALA_MINIMA_RELATIVA = 0.01
+FACTOR_MAD_NORMAL = 1.4826
+
+
+def mediana_por_grupo(grupos, valores, cantidad_grupos):
+    # Mediana y cantidad de valores por grupo (grupos: enteros densos 0..cantidad_grupos-1). El
+    # groupby de pandas sobre códigos enteros resuelve todas las medianas en una pasada compilada.
+    medianas = pd.Series(valores).groupby(grupos).median().reindex(range(cantidad_grupos)).to_numpy(copy=True)
+    return medianas, np.bincount(grupos, minlength=cantidad_grupos)
+
+
+def _factorizar(clave):
+    # (código entero por fila, valores distintos como texto); -1 = vacío. Las categóricas ya traen sus códigos
+    if isinstance(getattr(clave, 'dtype', None), pd.CategoricalDtype):
+        return clave.cat.codes.to_numpy(), np.asarray(clave.cat.categories.astype(str), dtype=object)
+    valores, unicos = pd.factorize(clave)
+    return valores, np.asarray(pd.Index(unicos).astype(str), dtype=object)
+
+
+def _precio_unitario(valor_neto, cantidad):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(valor_neto, dtype=float) / np.asarray(cantidad, dtype=float)
+
+
+def _grupos_lineas(codigos, clientes, canal):
+    # Grupo (producto, canal, cliente) de cada línea: id denso por fila (-1 si falta el código o el
+    # cliente) y las claves de texto de cada grupo (código, canal, cliente), para ubicar líneas de otros lotes
+    valores_codigo, unicos_codigo = _factorizar(codigos)
+    valores_cliente, unicos_cliente = _factorizar(clientes)
+    canal = np.asarray(canal, dtype=np.int64)
+    grupos = np.full(len(valores_codigo), -1, dtype=np.int64)
+    validas = (valores_codigo >= 0) & (valores_cliente >= 0)
+    combinado = (valores_codigo[validas] * 2 + canal[validas]) * max(len(unicos_cliente), 1) + valores_cliente[validas]
+    densos, unicos = pd.factorize(combinado)
+    grupos[validas] = densos
+    unicos = np.asarray(unicos, dtype=np.int64)
+    producto, cliente = np.divmod(unicos, max(len(unicos_cliente), 1))
+    claves = (unicos_codigo[producto // 2], (producto % 2).astype(np.int8), unicos_cliente[cliente])
+    return grupos, claves
+
+
+class EstadisticasAtipicos:
+    # Mediana y escala por (producto, canal) y mediana por (producto, canal, cliente), calculadas
+    # una vez. Se puntúan con ellas las líneas del mismo archivo o de otros lotes (segunda pasada
+    # del streaming, lotes del servicio). Claves: tres arreglos (código, canal, cliente) por grupo.
+
+    def __init__(self, claves, grupos, precios):
+        # grupos/precios: id de grupo (índice en claves) y precio unitario de las líneas con precio válido
+        codigo, canal, cliente = claves
+        self.claves = (np.asarray(codigo, dtype=object), np.asarray(canal, dtype=np.int8), np.asarray(cliente, dtype=object))
+        codigo_grupo, _ = pd.factorize(self.claves[0])
+        self.producto_de_cliente, productos = pd.factorize(codigo_grupo * 2 + self.claves[1])
+        cantidad_productos = len(productos)
+        # Índices por clave de texto: se arman recién al puntuar líneas de otro lote
+        self.indice_producto = None
+        self.indice_cliente = None
+
+        producto = self.producto_de_cliente[grupos]
+        self.mediana, lineas = mediana_por_grupo(producto, precios, cantidad_productos)
+        mad, _ = mediana_por_grupo(producto, np.abs(precios - self.mediana[producto]), cantidad_productos)
+        self.escala = np.maximum(FACTOR_MAD_NORMAL * mad, ESCALA_MINIMA_RELATIVA * self.mediana)
+        self.escala[lineas < MIN_LINEAS_PRODUCTO] = np.nan
+        self.mediana_cliente, lineas_cliente = mediana_por_grupo(grupos, precios, len(self.claves[0]))
+        self.mediana_cliente[lineas_cliente < MIN_LINEAS_CLIENTE] = np.nan
+
+    def __len__(self):
+        return len(self.mediana)
+
+    def puntuar(self, producto, cliente, precio):
+        # producto/cliente: ids de grupo de estas estadísticas por línea (-1 = sin referencia)
+        puntaje = np.full(len(precio), np.nan)
+        filas = np.flatnonzero((producto >= 0) & np.isfinite(precio) & (precio > 0))
+        producto, cliente, precio = producto[filas], cliente[filas], precio[filas]
+        mediana, escala = self.mediana[producto], self.escala[producto]
+        mediana_cliente = np.append(self.mediana_cliente, np.nan)[cliente]
+        puntaje[filas] = np.fmin((precio - mediana) / escala, (mediana_cliente - mediana) / escala)
+        return puntaje
+
+    def puntaje(self, codigos, clientes, valor_neto, cantidad, canal):
+        # Puntaje de líneas nuevas: sus grupos se ubican por clave (solo los grupos distintos del lote)
+        grupos, claves = _grupos_lineas(codigos, clientes, canal)
+        if self.indice_cliente is None:
+            self._indexar()
+        producto = np.fromiter(
+            (self.indice_producto.get(clave[:2], -1) for clave in zip(*claves)), dtype=np.int64, count=len(claves[0])
+        )
+        cliente = np.fromiter(
+            (self.indice_cliente.get(clave, -1) for clave in zip(*claves)), dtype=np.int64, count=len(claves[0])
+        )
+        producto = np.append(producto, -1)[grupos]
+        cliente = np.append(cliente, -1)[grupos]
+        return self.puntuar(producto, cliente, _precio_unitario(valor_neto, cantidad))
+
+    def _indexar(self):
+        # {(código, canal): id de producto} y {(código, canal, cliente): id de grupo}
+        claves = list(zip(self.claves[0], self.claves[1].tolist(), self.claves[2]))
+        self.indice_producto = {clave[:2]: producto for clave, producto in zip(claves, self.producto_de_cliente.tolist())}
+        self.indice_cliente = {clave: grupo for grupo, clave in enumerate(claves)}
+
+
+class AcumuladorAtipicos:
+    # Primera pasada del streaming: de cada línea solo se conserva el id de grupo y el precio
+    # unitario (12 bytes), para calcular las medianas exactas de todo el archivo al final
+
+    def __init__(self):
+        self._indice = {}
+        self._grupos = []
+        self._precios = []
+
+    def agregar(self, codigos, clientes, valor_neto, cantidad, canal):
+        grupos, claves = _grupos_lineas(codigos, clientes, canal)
+        globales = np.fromiter(
+            (self._indice.setdefault(clave, len(self._indice)) for clave in zip(*claves)), dtype=np.int64, count=len(claves[0])
+        )
+        precio = _precio_unitario(valor_neto, cantidad)
+        validas = (grupos >= 0) & np.isfinite(precio) & (precio > 0)
+        self._grupos.append(globales[grupos[validas]].astype(np.int32))
+        self._precios.append(precio[validas])
+
+    def estadisticas(self):
+        claves = list(zip(*self._indice)) or [[], [], []]
+        grupos = np.concatenate(self._grupos) if self._grupos else np.zeros(0, dtype=np.int32)
+        precios = np.concatenate(self._precios) if self._precios else np.zeros(0)
+        return EstadisticasAtipicos(claves, grupos, precios)
+
+
+def puntaje_precio_atipico(codigos, clientes, valor_neto, cantidad, canal):
+    # Puntaje robusto por línea contra las demás líneas del mismo DataFrame (negativo = más barato
+    # que lo habitual; NaN si no hay con qué comparar). canal separa a los clientes intercompany,
+    # que tienen su propio precio de lista.
+    grupos, claves = _grupos_lineas(codigos, clientes, canal)
+    precio = _precio_unitario(valor_neto, cantidad)
+    validas = (grupos >= 0) & np.isfinite(precio) & (precio > 0)
+    estadisticas = EstadisticasAtipicos(claves, grupos[validas], precio[validas])
+    producto = np.append(estadisticas.producto_de_cliente, -1)[grupos]
+    return estadisticas.puntuar(producto, grupos, precio)
@@ -0,0 +1,144 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from auditoria import COLUMNAS_REPORTE_ALERTAS, auditar_por_lotes, estadisticas_atipicos, resumir_auditoria
+from exportacion import FORMATOS_EXPORTACION, exportar
+from historial_precios import RUTA_HISTORIAL_PRECIOS, HistorialPrecios
+from ingesta import iterar_facturacion, leer_archivos, leer_precios
+from paralelo import auditar_en_paralelo
+
+# --- AUDITORÍA POR LOTES (LÍNEA DE COMANDOS) ---
+# Audita todos los libros de una carpeta en paralelo y genera un reporte de alertas
+# por archivo más un resumen consolidado.
+#
+#   python auditar_lote.py CARPETA_ENTRADA --salida CARPETA_SALIDA [--procesos N] [--formato xlsx|csv|parquet]
+#                          [--filas-por-lote N] [--historial-precios [RUTA]]
+#
+# Con --filas-por-lote la hoja 'Facturacion' se lee en streaming y se audita lote a lote
+# (para libros de varios cientos de MB que no entran completos en memoria). La hoja se recorre dos
+# veces: la primera junta el precio unitario de cada línea (12 bytes por línea) para que el puntaje
+# de precio atípico use las medianas de todo el archivo, como la auditoría sin streaming. Los .zip con las dos
+# tablas en CSV/Parquet se leen siempre completos: la lectura columnar no necesita el streaming.
+#
+# Con --historial-precios, cada línea se audita con el precio vigente en su fecha según el
+# historial de precios registrado (ver historial_precios.py), en lugar del listado de cada libro.
+
+EXTENSIONES_ENTRADA = ('.xlsx', '.zip')
+NOMBRE_RESUMEN = 'Resumen_Consolidado_Auditoria'
+
+
+def listar_libros(carpeta):
+    return sorted(
+        os.path.join(carpeta, nombre)
+        for nombre in os.listdir(carpeta)
+        if nombre.lower().endswith(EXTENSIONES_ENTRADA) and not nombre.startswith('~$')
+    )
+
+
+def auditar_archivo(ruta, carpeta_salida, formato, filas_por_lote=None, procesos=1, catalogo=None):
+    # Se ejecuta dentro de un proceso del pool: lee, audita y escribe el reporte de alertas.
+    # Solo el resumen (un dict pequeño) vuelve al proceso principal. Con procesos > 1 (un solo
+    # archivo en la carpeta) la auditoría del archivo se reparte en fragmentos. Con catalogo
+    # (historial de precios) se ignora el listado del libro.
+    inicio = time.perf_counter()
+    nombre = os.path.basename(ruta)
+    try:
+        if filas_por_lote and ruta.lower().endswith('.xlsx'):
+            precios = catalogo if catalogo is not None else leer_precios(ruta)
+            # Dos pasadas: la primera solo junta precios por producto y cliente para el puntaje de
+            # precio atípico de todo el archivo; la segunda audita lote a lote contra esas medianas
+            estadisticas = estadisticas_atipicos(iterar_facturacion(ruta, filas_por_lote))
+            acumulador = auditar_por_lotes(iterar_facturacion(ruta, filas_por_lote), precios, estadisticas=estadisticas)
+            desvios, resumen_kpis = acumulador.tabla_alertas(), acumulador.resumen()
+        else:
+            with open(ruta, 'rb') as archivo:
+                df_ventas, df_precios = leer_archivos([(nombre, archivo.read())])
+            precios = catalogo if catalogo is not None else df_precios
+            desvios, df_audit = auditar_en_paralelo(df_ventas, precios, procesos)
+            resumen_kpis = resumir_auditoria(df_audit)
+
+        extension, _ = FORMATOS_EXPORTACION[formato]
+        ruta_reporte = os.path.join(carpeta_salida, f"{os.path.splitext(nombre)[0]}_Alertas.{extension}")
+        with open(ruta_reporte, 'wb') as destino:
+            destino.write(exportar({'Alertas': desvios[COLUMNAS_REPORTE_ALERTAS]}, formato))
+
+        resumen = {'Archivo': nombre, **resumen_kpis, 'Reporte': os.path.basename(ruta_reporte), 'Error': ''}
+    except Exception as e:
+        resumen = {'Archivo': nombre, 'Error': f"{type(e).__name__}: {e}"}
+    resumen['Segundos'] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+def auditar_carpeta(carpeta_entrada, carpeta_salida, procesos=None, formato='xlsx', filas_por_lote=None, catalogo=None):
+    rutas = listar_libros(carpeta_entrada)
+    if not rutas:
+        raise FileNotFoundError(f"No se encontraron libros {EXTENSIONES_ENTRADA} en '{carpeta_entrada}'.")
+    os.makedirs(carpeta_salida, exist_ok=True)
+
+    resumenes = []
+
+    def informar(resumen):
+        estado = resumen['Error'] or f"{resumen['Transacciones con Desvío']:,} desvíos"
+        print(f"[{len(resumenes) + 1}/{len(rutas)}] {resumen['Archivo']}: {estado} ({resumen['Segundos']} s)")
+        resumenes.append(resumen)
+
+    if len(rutas) == 1:
+        # Un solo archivo (p. ej. el de cierre de año): los procesos se usan dentro de su auditoría
+        informar(auditar_archivo(rutas[0], carpeta_salida, formato, filas_por_lote, procesos or os.cpu_count(), catalogo))
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {
+                pool.submit(auditar_archivo, ruta, carpeta_salida, formato, filas_por_lote, 1, catalogo): ruta
+                for ruta in rutas
+            }
+            for futuro in as_completed(futuros):
+                informar(futuro.result())
+
+    df_resumen = pd.DataFrame(resumenes).sort_values('Archivo', ignore_index=True)
+    extension, _ = FORMATOS_EXPORTACION[formato]
+    ruta_resumen = os.path.join(carpeta_salida, f"{NOMBRE_RESUMEN}.{extension}")
+    with open(ruta_resumen, 'wb') as destino:
+        destino.write(exportar({'Resumen': df_resumen}, formato))
+    return df_resumen, ruta_resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoría de precios por lotes sobre una carpeta de libros de facturación.")
+    parser.add_argument('entrada', help="Carpeta con los libros .xlsx (hojas 'Facturacion' y 'Listado de Precios') o .zip con ambas tablas en CSV/Parquet.")
+    parser.add_argument('--salida', required=True, help="Carpeta donde se escriben los reportes y el resumen consolidado.")
+    parser.add_argument('--procesos', type=int, default=None, help="Cantidad de procesos en paralelo (por defecto, uno por núcleo).")
+    parser.add_argument('--formato', choices=list(FORMATOS_EXPORTACION), default='xlsx', help="Formato de los reportes generados.")
+    parser.add_argument('--filas-por-lote', type=int, default=None, help="Lee y audita la facturación en lotes de N filas (modo streaming).")
+    parser.add_argument('--historial-precios', nargs='?', const=RUTA_HISTORIAL_PRECIOS, default=None, metavar='RUTA',
+                        help="Audita con el precio vigente en la fecha de cada línea según el historial de precios registrado.")
+    args = parser.parse_args(argv)
+
+    catalogo = None
+    if args.historial_precios:
+        # El catálogo del historial se arma una vez y se entrega a cada proceso
+        catalogo = HistorialPrecios(args.historial_precios).catalogo()
+        if len(catalogo) == 0:
+            print(f"El historial de precios '{args.historial_precios}' no tiene versiones registradas.", file=sys.stderr)
+            return 1
+
+    inicio = time.perf_counter()
+    try:
+        df_resumen, ruta_resumen = auditar_carpeta(
+            args.entrada, args.salida, args.procesos, args.formato, args.filas_por_lote, catalogo
+        )
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    con_error = int((df_resumen['Error'] != '').sum())
+    print(f"{len(df_resumen)} archivos auditados en {time.perf_counter() - inicio:.1f} s ({con_error} con error). Resumen: {ruta_resumen}")
+    return 1 if con_error else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
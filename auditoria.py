@@ -0,0 +1,351 @@
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from atipicos import AcumuladorAtipicos, puntaje_precio_atipico
+from catalogo import CatalogoPrecios, obtener_catalogo
+from esquema import ESQUEMA_FACTURACION, aplicar_esquema
+from reglas import evaluar_reglas, pertenencia
+
+# --- MOTOR DE AUDITORÍA DE PRECIOS Y DESCUENTOS ---
+# Módulo sin dependencias de Streamlit: lo usan el tablero (app.py) y el proceso por lotes (auditar_lote.py).
+
+# --- 1. PARÁMETROS DE AUDITORÍA ---
+codigos_controlados = [
+    '3000113', '3000114', '3000080', '3000082', '3000083', '3000084', '3000085',
+    '3000098', '3001265', '3001266', '3001267', '3001894', '3001896', '3002906',
+    '3003648', '3004041', '3003870', '3004072', '5000002', '3004071', '3003953',
+    '3003955', '3003952', '3004074', '3004073', '3003773', '3003775', '3004756'
+]
+
+DESC_MAX_CONTROLADOS = 5.0
+DESC_MAX_EMPLEADOS = 0.0
+DESC_MAX_NUTRICIA_BEBELAC = 6.0
+DESC_MAX_GENERAL = 7.0
+MAX_PRECIO_DESVIACION = 2.0 
+DESC_INTERCOMPANY_200046 = 11.0 
+DESC_INTERCOMPANY_200173 = 10.0 
+CLIENTE_200046 = '200046'
+CLIENTE_200173 = '200173'
+ALMACEN_EMPLEADOS_PERMITIDO = 1041
+ALMACEN_OFERTAS = 1012
+marcas_6_porciento = ['NUTRICIA', 'BEBELAC']
+ZONAS_FUNCIONARIOS = ['EMPLEADOS LQF', 'MEDICOS PARTICULARES'] 
+# Precio atípico: puntaje robusto (en desvíos MAD escalados, ver atipicos.py) por debajo de -UMBRAL
+UMBRAL_PRECIO_ATIPICO = 3.5
+
+# Etiquetas exactas de las alertas generadas en la función ejecutar_auditoria
+ETIQUETAS_ALERTA = [
+    '❌ Ilegal (Empleado/Médico)', 
+    f'⛔ Precio Facturado bajo (>{MAX_PRECIO_DESVIACION}%)',
+    '⚠️ Controlado (>5%) Excedido',
+    '⚠️ Intercompany 200046 (>11%) Excedido', 
+    '⚠️ Intercompany 200173 (>10%) Excedido', 
+    '⚠️ Marca Nutricion (>6%) Excedido', 
+    '⚠️ General (>7%) Excedido',
+    '✅ OK',
+    f'📉 Precio Atípico (<-{UMBRAL_PRECIO_ATIPICO} MAD)',
+]
+# Los códigos son estables (el histórico los guarda): las alertas nuevas se agregan después del OK
+CODIGO_ALERTA_OK = 7
+CODIGO_ALERTA_ATIPICO = 8
+
+# Reglas de auditoría en orden de prioridad (la regla i produce ETIQUETAS_ALERTA[i], salvo que
+# indique su propio 'codigo').
+# Cada condición es (columna, operador, valor); todas deben cumplirse para que la regla se incumpla.
+# Nota: la regla de funcionarios era (zona & almacén != 1041 & desc > 0) | (zona & desc > 0),
+# cuyo primer término está contenido en el segundo; ALMACEN_EMPLEADOS_PERMITIDO no altera el resultado.
+REGLAS_AUDITORIA = [
+    {'etiqueta': ETIQUETAS_ALERTA[0], 'condiciones': [
+        ('Zona de Venta', 'en', ZONAS_FUNCIONARIOS), ('% Desc', '>', DESC_MAX_EMPLEADOS)]},
+    {'etiqueta': ETIQUETAS_ALERTA[1], 'condiciones': [
+        ('Desvío_Precio_Lista', '<', -MAX_PRECIO_DESVIACION)]},
+    {'etiqueta': ETIQUETAS_ALERTA[2], 'condiciones': [
+        ('Codigo', 'en', codigos_controlados), ('% Desc', '>', DESC_MAX_CONTROLADOS)]},
+    {'etiqueta': ETIQUETAS_ALERTA[3], 'condiciones': [
+        ('Solicitante', '==', CLIENTE_200046), ('% Desc', '>', DESC_INTERCOMPANY_200046)]},
+    {'etiqueta': ETIQUETAS_ALERTA[4], 'condiciones': [
+        ('Solicitante', '==', CLIENTE_200173), ('% Desc', '>', DESC_INTERCOMPANY_200173)]},
+    {'etiqueta': ETIQUETAS_ALERTA[5], 'condiciones': [
+        ('Jerarquia', 'en', marcas_6_porciento), ('% Desc', '>', DESC_MAX_NUTRICIA_BEBELAC)]},
+    {'etiqueta': ETIQUETAS_ALERTA[6], 'condiciones': [
+        ('% Desc', '>', DESC_MAX_GENERAL)]},
+    {'etiqueta': ETIQUETAS_ALERTA[CODIGO_ALERTA_ATIPICO], 'codigo': CODIGO_ALERTA_ATIPICO, 'condiciones': [
+        ('Puntaje_Atipico', '<', -UMBRAL_PRECIO_ATIPICO)]},
+]
+# Códigos de las alertas con desvío, en orden de prioridad
+CODIGOS_DESVIO = [regla.get('codigo', indice) for indice, regla in enumerate(REGLAS_AUDITORIA)]
+
+# Columnas de cada reporte (pantalla del tablero y archivos exportados)
+COLUMNAS_REPORTE_ALERTAS = [
+    'Fecha factura', 'Almacen', 'Nombre 1', 'Codigo', 'Material', 'Jerarquia', '% Desc', 'Valor neto',
+    'Precio_Objetivo', 'Desvío_Precio_Lista', 'Precio_Unitario_Neto_Factura', 'Puntaje_Atipico', 'Alerta_Descuento'
+]
+COLUMNAS_REPORTE_COMPLETO = [
+    'Fecha factura', 'Almacen', 'Nombre 1', 'Codigo', 'Material', 'Jerarquia', 'Cant', '% Desc', 'Valor neto',
+    'Precio_Objetivo', 'Desvío_Precio_Lista', 'Precio_Unitario_Neto_Factura', 'Puntaje_Atipico', 'Alerta_Descuento'
+]
+COLUMNAS_REPORTE_COMPARATIVO = [
+    'Fecha factura', 'Nombre 1', 'Solicitante', 'Codigo', 'Material', 
+    'Jerarquia', 'Cant', '% Desc', 'Valor neto', 
+    'Precio_Objetivo', 'Precio_Unitario_Neto_Factura', 'Desvío_Precio_Lista', 
+    'Alerta_Descuento'
+]
+
+
+def hojas_reporte(tipo_reporte, desvios, df_completo):
+    # Hojas de cada reporte descargable ('alertas', 'completo', 'comparativo' o 'consolidado')
+    hojas = {}
+    if tipo_reporte in ('alertas', 'consolidado'):
+        hojas['Alertas'] = desvios[COLUMNAS_REPORTE_ALERTAS]
+    if tipo_reporte in ('completo', 'consolidado'):
+        hojas['Listado Completo'] = df_completo[COLUMNAS_REPORTE_COMPLETO]
+    if tipo_reporte in ('comparativo', 'consolidado'):
+        hojas['Comparativo Precios'] = df_completo[df_completo['Desvío_Precio_Lista'].notna()][COLUMNAS_REPORTE_COMPARATIVO]
+    if tipo_reporte == 'consolidado':
+        return hojas
+    # Los reportes individuales llevan una sola hoja con el nombre histórico
+    return {'Reporte Auditoria': next(iter(hojas.values()))}
+
+
+# Columnas de texto repetitivo que se guardan como categóricas en el resultado de la auditoría
+COLUMNAS_CATEGORICAS = ['Codigo', 'Solicitante', 'Zona de Venta', 'Jerarquia', 'Nombre 1', 'Material', 'Tipo Venta']
+# Intermedios del cálculo de precio objetivo que no se muestran ni se exportan
+COLUMNAS_TEMPORALES = ['Factor_IVA', 'Precio_Farmacia_Target_SIN_IVA', 'Precio_Intercompany_Target_SIN_IVA']
+
+
+def normalizar_columnas_ventas(df_ventas):
+    # Nombres canónicos y tipos de esquema.ESQUEMA_FACTURACION. Las tablas que vienen de la
+    # ingesta ya están tipadas: solo se revisan los dtypes, sin convertir ninguna columna.
+    return aplicar_esquema(df_ventas, ESQUEMA_FACTURACION)
+
+
+# --- 2. FUNCIÓN PRINCIPAL DE AUDITORÍA ---
+def etapa_opcional(registro, nombre, filas=None):
+    # Medición opcional por etapa (ver instrumentacion.RegistroRendimiento)
+    return registro.etapa(nombre, filas) if registro is not None else nullcontext({})
+
+
+def categoria_texto(serie):
+    # Equivale a serie.astype(str).astype('category') pero convierte a texto solo los valores
+    # distintos (no un string por fila). Valores que dan el mismo texto comparten categoría.
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    categorias, inversa = np.unique(pd.Series(unicos, dtype=object).astype(str).to_numpy(dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(inversa[codigos], categories=categorias)
+
+
+def calcular_precios(catalogo, posicion, es_intercompany, valor_neto, cantidad):
+    # Núcleo NumPy del precio objetivo, el precio unitario facturado y el desvío. Solo se asignan
+    # los tres arreglos de salida: el resto de las operaciones escribe sobre esos mismos buffers.
+    precio_objetivo = catalogo.farmacia_sin_iva[posicion]
+    precio_objetivo[es_intercompany] = catalogo.intercompany_sin_iva[posicion[es_intercompany]]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precio_unitario = np.divide(valor_neto, cantidad)
+        valido = precio_objetivo > 0
+        valido &= ~np.isnan(precio_unitario)
+        desvio = np.full(len(posicion), np.nan)
+        np.divide(precio_unitario, precio_objetivo, out=desvio, where=valido)
+        desvio -= 1
+        desvio *= 100
+    return precio_objetivo, precio_unitario, desvio
+
+
+def adjuntar_columnas(df, columnas):
+    # Asignar un ndarray con df[col] = arr lo copia; envuelto en una Series sin copia se adjunta tal cual
+    for nombre, valores in columnas.items():
+        df[nombre] = pd.Series(valores, index=df.index, copy=False)
+
+
+def _columnas_atipicos(df_ventas):
+    df_ventas = normalizar_columnas_ventas(df_ventas)
+    return (
+        df_ventas['Codigo'],
+        df_ventas['Solicitante'],
+        df_ventas['Valor neto'].to_numpy(dtype=float),
+        df_ventas['Cant'].to_numpy(dtype=float),
+        pertenencia(df_ventas['Solicitante'], [CLIENTE_200046, CLIENTE_200173]),
+    )
+
+
+def calcular_puntaje_atipico(df_ventas, estadisticas=None):
+    # Puntaje de precio atípico de cada línea contra el resto del mismo DataFrame (ver atipicos.py).
+    # Para auditar por fragmentos se calcula una vez sobre el archivo completo y se reparte. Con
+    # estadisticas (atipicos.EstadisticasAtipicos) se puntúa contra esa referencia.
+    if estadisticas is not None:
+        return estadisticas.puntaje(*_columnas_atipicos(df_ventas))
+    return puntaje_precio_atipico(*_columnas_atipicos(df_ventas))
+
+
+def estadisticas_atipicos(lotes):
+    # Medianas y escalas de precio atípico de todas las líneas de los lotes, en una sola pasada
+    acumulador = AcumuladorAtipicos()
+    for df_lote in lotes:
+        acumulador.agregar(*_columnas_atipicos(df_lote))
+    return acumulador.estadisticas()
+
+
+def ejecutar_auditoria(df_ventas, df_precios, registro=None, puntaje_atipico=None):
+    # Lógica de auditoría...
+    with etapa_opcional(registro, 'auditoria.normalizacion', len(df_ventas)):
+        # 2. Nombres y tipos del esquema declarado ('% Desc', 'Almacen', 'Valor neto' y 'Cant' ya numéricos)
+        df_audit = normalizar_columnas_ventas(df_ventas)
+        # Cliente y código como categóricas de texto desde el inicio: las comparaciones de las
+        # reglas y del precio intercompany se resuelven sobre las categorías
+        df_audit['Solicitante'] = categoria_texto(df_audit['Solicitante'])
+        df_audit['Codigo'] = categoria_texto(df_audit['Codigo'])
+        # El merge deja un RangeIndex nuevo; se conserva ese comportamiento
+        df_audit.index = pd.RangeIndex(len(df_audit))
+
+    with etapa_opcional(registro, 'auditoria.precios', len(df_audit)):
+        # 3. Auditoría por Precio de Lista (catálogo preindexado por código y vigencia, sin merge)
+        catalogo = df_precios if isinstance(df_precios, CatalogoPrecios) else obtener_catalogo(df_precios)
+        # Con una lista con vigencias, cada línea toma el precio vigente en su fecha de factura
+        posicion = catalogo.posiciones(df_audit['Codigo'], df_audit.get('Fecha factura'))
+        precio_objetivo, precio_unitario, desvio = calcular_precios(
+            catalogo,
+            posicion,
+            pertenencia(df_audit['Solicitante'], [CLIENTE_200046, CLIENTE_200173]),
+            df_audit['Valor neto'].to_numpy(dtype=float),
+            df_audit['Cant'].to_numpy(dtype=float),
+        )
+
+        adjuntar_columnas(df_audit, {
+            'IVA_Lista': catalogo.iva[posicion].astype(np.float32),
+            'Precio_Farmacia_Target': catalogo.precio_farmacia[posicion],
+            'Precio_Intercompany_Target': catalogo.precio_intercompany[posicion],
+            'Precio_Objetivo': precio_objetivo,
+            'Precio_Unitario_Neto_Factura': precio_unitario,
+            'Desvío_Precio_Lista': desvio,
+        })
+        del posicion, precio_objetivo, precio_unitario, desvio
+
+    with etapa_opcional(registro, 'auditoria.atipicos', len(df_audit)):
+        # 3b. Precios atípicos por producto y por (producto, cliente), también para códigos sin precio en lista
+        if puntaje_atipico is None:
+            puntaje_atipico = calcular_puntaje_atipico(df_audit)
+        adjuntar_columnas(df_audit, {'Puntaje_Atipico': np.asarray(puntaje_atipico, dtype=float)})
+
+    with etapa_opcional(registro, 'auditoria.reglas', len(df_audit)):
+        # 4. Lógica de Prioridad de Descuentos (motor de reglas: ver REGLAS_AUDITORIA)
+        bits, codigos_alerta, _ = evaluar_reglas(df_audit, REGLAS_AUDITORIA, CODIGO_ALERTA_OK)
+        adjuntar_columnas(df_audit, {'Reglas_Incumplidas': bits})
+
+        # La alerta se guarda como código int8 (índice en ETIQUETAS_ALERTA) envuelto en un categórico
+        df_audit['Alerta_Descuento'] = pd.Categorical.from_codes(codigos_alerta, categories=ETIQUETAS_ALERTA)
+
+    with etapa_opcional(registro, 'auditoria.compactacion', len(df_audit)):
+        df_audit = compactar_auditoria(df_audit)
+    desvios_encontrados = df_audit[codigos_alerta != CODIGO_ALERTA_OK]
+    
+    return desvios_encontrados, df_audit
+
+
+# --- REPRESENTACIÓN COMPACTA DEL RESULTADO AUDITADO ---
+def compactar_auditoria(df_audit):
+    df_audit = df_audit.drop(columns=COLUMNAS_TEMPORALES, errors='ignore')
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df_audit.columns:
+            df_audit[columna] = df_audit[columna].astype('category')
+    # La tasa de IVA no necesita doble precisión (los montos en Gs. sí la conservan)
+    df_audit['IVA_Lista'] = df_audit['IVA_Lista'].astype(np.float32)
+    return df_audit
+
+
+# --- MÁSCARAS DE FILTRO (PRECALCULADAS SOBRE EL RESULTADO COMPLETO) ---
+# Cada categoría de los checkboxes "Excluir / Ver Solo" queda como un arreglo booleano por fila.
+def calcular_mascaras_filtro(df_audit):
+    return {
+        'controlados': df_audit['Codigo'].isin(codigos_controlados).to_numpy(),
+        'ofertas': (df_audit['Almacen'] == ALMACEN_OFERTAS).to_numpy(),
+        'funcionarios': df_audit['Zona de Venta'].isin(ZONAS_FUNCIONARIOS).to_numpy(),
+        'desvio': (df_audit['Alerta_Descuento'].cat.codes != CODIGO_ALERTA_OK).to_numpy(),
+    }
+
+
+def combinar_mascaras(mascaras, filtros):
+    # filtros: {categoria: 'excluir' | 'solo' | None}
+    seleccion = np.ones(len(mascaras['desvio']), dtype=bool)
+    for categoria, modo in filtros.items():
+        if modo == 'excluir':
+            seleccion &= ~mascaras[categoria]
+        elif modo == 'solo':
+            seleccion &= mascaras[categoria]
+    return seleccion
+
+
+# --- RESUMEN DE KPIs DE UN RESULTADO AUDITADO ---
+def _contar_alertas(df_audit):
+    codigos = df_audit['Alerta_Descuento'].cat.codes.to_numpy()
+    es_desvio = codigos != CODIGO_ALERTA_OK
+    valor_neto = df_audit['Valor neto'].to_numpy(dtype=float)
+    conteos = np.bincount(codigos, minlength=len(ETIQUETAS_ALERTA))
+    return len(df_audit), conteos, float(np.nansum(valor_neto[es_desvio]))
+
+
+def armar_resumen(total, conteos, valor_neto_desviado):
+    desviadas = int(conteos[CODIGOS_DESVIO].sum())
+    resumen = {
+        'Transacciones Auditadas': total,
+        'Transacciones con Desvío': desviadas,
+        'Nivel de Cumplimiento (%)': (1 - desviadas / total) * 100 if total > 0 else 0,
+        'Valor Neto de Desvíos (Gs.)': valor_neto_desviado,
+    }
+    for codigo in CODIGOS_DESVIO:
+        resumen[ETIQUETAS_ALERTA[codigo]] = int(conteos[codigo])
+    return resumen
+
+
+def resumir_auditoria(df_audit):
+    return armar_resumen(*_contar_alertas(df_audit))
+
+
+# --- AUDITORÍA INCREMENTAL POR LOTES ---
+# Acumula KPIs y la tabla de alertas lote a lote; solo se conservan las filas con desvío
+# (con columnas_alertas=None, solo los KPIs).
+class AcumuladorAuditoria:
+    def __init__(self, columnas_alertas=COLUMNAS_REPORTE_ALERTAS):
+        self.columnas_alertas = columnas_alertas
+        self.total = 0
+        self.conteos = np.zeros(len(ETIQUETAS_ALERTA), dtype=np.int64)
+        self.valor_neto_desviado = 0.0
+        self._alertas = []
+
+    def agregar(self, df_audit):
+        total, conteos, valor_neto_desviado = _contar_alertas(df_audit)
+        self.total += total
+        self.conteos += conteos
+        self.valor_neto_desviado += valor_neto_desviado
+        if self.columnas_alertas is None:
+            return
+        desvios = df_audit[df_audit['Alerta_Descuento'].cat.codes.to_numpy() != CODIGO_ALERTA_OK]
+        if not desvios.empty:
+            self._alertas.append(desvios[self.columnas_alertas])
+
+    def resumen(self):
+        return armar_resumen(self.total, self.conteos, self.valor_neto_desviado)
+
+    def tabla_alertas(self):
+        if not self._alertas:
+            return pd.DataFrame(columns=self.columnas_alertas)
+        # Cada lote trae sus propias categorías: se concatenan como texto y se vuelven a compactar
+        alertas = pd.concat(self._alertas, ignore_index=True)
+        for columna in COLUMNAS_CATEGORICAS + ['Alerta_Descuento']:
+            if columna in alertas.columns and not isinstance(alertas[columna].dtype, pd.CategoricalDtype):
+                alertas[columna] = alertas[columna].astype('category')
+        return alertas
+
+
+def auditar_por_lotes(lotes, df_precios, columnas_alertas=COLUMNAS_REPORTE_ALERTAS, estadisticas=None):
+    # estadisticas: medianas de precio atípico de todo el archivo (ver estadisticas_atipicos), para
+    # que el resultado coincida con el de auditar el archivo completo. Sin ellas, cada lote se
+    # compara solo consigo mismo.
+    acumulador = AcumuladorAuditoria(columnas_alertas)
+    # El catálogo se arma una vez y se reutiliza en todos los lotes
+    catalogo = df_precios if isinstance(df_precios, CatalogoPrecios) else obtener_catalogo(df_precios)
+    for df_lote in lotes:
+        puntaje_atipico = None if estadisticas is None else calcular_puntaje_atipico(df_lote, estadisticas)
+        _, df_audit = ejecutar_auditoria(df_lote, catalogo, puntaje_atipico=puntaje_atipico)
+        acumulador.agregar(df_audit)
+    return acumulador
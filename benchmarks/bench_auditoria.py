@@ -0,0 +1,198 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingesta  # noqa: E402
+import referencia  # noqa: E402
+from auditoria import (  # noqa: E402
+    CODIGO_ALERTA_ATIPICO, CODIGO_ALERTA_OK, COLUMNAS_REPORTE_ALERTAS, COLUMNAS_REPORTE_COMPARATIVO,
+    COLUMNAS_REPORTE_COMPLETO, ETIQUETAS_ALERTA, ejecutar_auditoria,
+)
+from exportacion import exportar  # noqa: E402
+from generar_libros import escribir_libro, generar_tablas  # noqa: E402
+
+# --- BANCO DE PRUEBAS DE RENDIMIENTO ---
+# Mide por separado cada etapa del tablero (lectura, auditoría, exportación, renderizado de
+# tablas) comparando la implementación original con la actual, registra tiempo y memoria pico,
+# y verifica que la columna Alerta_Descuento sea idéntica a la de la implementación original.
+#
+#   python benchmarks/bench_auditoria.py --filas 10000 100000 1000000 [--salida resultados.csv]
+
+FORMATO_STYLER = {
+    '% Desc': '{:.2f}%',
+    'Valor neto': 'Gs. {:,.0f}',
+    'Precio_Objetivo': 'Gs. {:,.2f}',
+    'Desvío_Precio_Lista': '{:.2f}%',
+    'Precio_Unitario_Neto_Factura': 'Gs. {:,.2f}'
+}
+
+
+def _to_excel_original(df):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='Reporte Auditoria')
+    return output.getvalue()
+
+
+# Cada etapa recibe el contexto (tablas leídas y resultados previos) y devuelve su resultado
+def etapa_lectura_excel(ctx):
+    with pd.ExcelFile(ctx['ruta']) as libro:
+        return pd.read_excel(libro, sheet_name=ingesta.HOJA_FACTURACION), pd.read_excel(libro, sheet_name=ingesta.HOJA_PRECIOS)
+
+
+def etapa_lectura_cache(ctx):
+    return ingesta.leer_libro(ctx['contenido'], ctx['huella'])
+
+
+def etapa_auditoria_original(ctx):
+    return referencia.ejecutar_auditoria(ctx['df_ventas'].copy(), ctx['df_precios'].copy())
+
+
+def etapa_auditoria(ctx):
+    # Como en el tablero: sobre las tablas tipadas por la ingesta (esquema aplicado al leer)
+    return ejecutar_auditoria(*ctx['tablas_tipadas'])
+
+
+def etapa_exportacion_original(ctx):
+    desvios, df_completo = ctx['resultado_original']
+    comparativo = df_completo[df_completo['Desvío_Precio_Lista'].notna()]
+    # reindex: la implementación original no calcula 'Puntaje_Atipico' (queda vacía, mismo ancho)
+    return [
+        _to_excel_original(desvios.reindex(columns=COLUMNAS_REPORTE_ALERTAS)),
+        _to_excel_original(df_completo.reindex(columns=COLUMNAS_REPORTE_COMPLETO)),
+        _to_excel_original(comparativo.reindex(columns=COLUMNAS_REPORTE_COMPARATIVO)),
+    ]
+
+
+def etapa_exportacion(ctx):
+    desvios, df_completo = ctx['resultado']
+    comparativo = df_completo[df_completo['Desvío_Precio_Lista'].notna()]
+    return exportar({
+        'Alertas': desvios[COLUMNAS_REPORTE_ALERTAS],
+        'Listado Completo': df_completo[COLUMNAS_REPORTE_COMPLETO],
+        'Comparativo Precios': comparativo[COLUMNAS_REPORTE_COMPARATIVO],
+    })
+
+
+def etapa_styler_original(ctx):
+    # Lo que hacía st.dataframe(df.style.format(...)) con el listado completo: formatear cada celda
+    _, df_completo = ctx['resultado_original']
+    return df_completo.reindex(columns=COLUMNAS_REPORTE_COMPLETO).style.format(FORMATO_STYLER).to_html()
+
+
+def etapa_grilla(ctx):
+    # Grilla paginada: ordenar por valor neto y cortar una página de 100 filas
+    _, df_completo = ctx['resultado']
+    orden = np.argsort(-pd.to_numeric(df_completo['Valor neto'], errors='coerce').to_numpy(), kind='stable')
+    return df_completo[COLUMNAS_REPORTE_COMPLETO].iloc[orden[:100]]
+
+
+ETAPAS = [
+    ('lectura_excel', etapa_lectura_excel, None),
+    ('lectura_cache', etapa_lectura_cache, None),
+    ('auditoria_original', etapa_auditoria_original, 'resultado_original'),
+    ('auditoria', etapa_auditoria, 'resultado'),
+    ('exportacion_original', etapa_exportacion_original, None),
+    ('exportacion', etapa_exportacion, None),
+    ('styler_original', etapa_styler_original, None),
+    ('grilla', etapa_grilla, None),
+]
+
+
+def medir(funcion, ctx, memoria):
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcion(ctx)
+    segundos = time.perf_counter() - inicio
+
+    pico_mb = np.nan
+    if memoria:
+        # Segunda ejecución bajo tracemalloc (agrega sobrecarga, por eso no se usa para el tiempo)
+        del resultado
+        gc.collect()
+        tracemalloc.start()
+        resultado = funcion(ctx)
+        pico_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return resultado, segundos, pico_mb
+
+
+def alertas_identicas(resultado_original, resultado):
+    # La implementación original no tiene la alerta de precio atípico: esas líneas deben ser OK
+    # en el original y el resto de las alertas debe coincidir
+    original = resultado_original[1]['Alerta_Descuento'].astype(str).to_numpy()
+    actual = resultado[1]['Alerta_Descuento'].astype(str).to_numpy()
+    if len(original) != len(actual):
+        return False
+    atipico = actual == ETIQUETAS_ALERTA[CODIGO_ALERTA_ATIPICO]
+    actual = np.where(atipico, ETIQUETAS_ALERTA[CODIGO_ALERTA_OK], actual)
+    return bool((original == actual).all())
+
+
+def ejecutar_banco(filas, carpeta, etapas, memoria=True, semilla=0):
+    ruta = os.path.join(carpeta, f'facturacion_{filas}.xlsx')
+    if not os.path.exists(ruta):
+        escribir_libro(ruta, *generar_tablas(filas, semilla))
+
+    with open(ruta, 'rb') as archivo:
+        contenido = archivo.read()
+    ctx = {'ruta': ruta, 'contenido': contenido, 'huella': ingesta.calcular_huella(contenido)}
+    ctx['df_ventas'], ctx['df_precios'] = etapa_lectura_excel(ctx)
+    ctx['tablas_tipadas'] = ingesta.leer_libro(contenido, ctx['huella'])  # Deja lista la caché Parquet para 'lectura_cache'
+
+    mediciones = []
+    for nombre, funcion, clave_resultado in ETAPAS:
+        # Las dos auditorías corren siempre: la verificación y las etapas siguientes usan su resultado
+        if nombre not in etapas and not clave_resultado:
+            continue
+        resultado, segundos, pico_mb = medir(funcion, ctx, memoria and nombre in etapas)
+        if clave_resultado:
+            ctx[clave_resultado] = resultado
+        if nombre in etapas:
+            mediciones.append({'Filas': filas, 'Etapa': nombre, 'Segundos': round(segundos, 4), 'Memoria pico (MB)': round(pico_mb, 1)})
+        del resultado
+
+    identicas = alertas_identicas(ctx['resultado_original'], ctx['resultado'])
+    return mediciones, identicas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de la auditoría de precios.")
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--datos', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos'),
+                        help="Carpeta donde se generan (o reutilizan) los libros sintéticos.")
+    parser.add_argument('--etapas', nargs='+', default=[nombre for nombre, _, _ in ETAPAS], choices=[nombre for nombre, _, _ in ETAPAS])
+    parser.add_argument('--sin-memoria', action='store_true', help="No medir memoria pico (evita la segunda ejecución de cada etapa).")
+    parser.add_argument('--salida', help="CSV donde guardar las mediciones.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.datos, exist_ok=True)
+    # Caché de ingesta aislada para no mezclar con la del tablero
+    ingesta.DIR_CACHE_INGESTA = tempfile.mkdtemp(prefix='bench_ingesta_')
+
+    mediciones, todas_identicas = [], True
+    for filas in args.filas:
+        resultado, identicas = ejecutar_banco(filas, args.datos, set(args.etapas), not args.sin_memoria)
+        mediciones.extend(resultado)
+        todas_identicas &= identicas
+        print(pd.DataFrame(resultado).to_string(index=False))
+        print(f"Alerta_Descuento idéntica a la implementación original, sin contar precios atípicos ({filas:,} filas): {'sí' if identicas else 'NO'}\n")
+
+    if args.salida:
+        pd.DataFrame(mediciones).to_csv(args.salida, index=False)
+    return 0 if todas_identicas else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auditoria import CLIENTE_200046, CLIENTE_200173, ZONAS_FUNCIONARIOS, codigos_controlados  # noqa: E402
+from exportacion import generar_xlsx  # noqa: E402
+from ingesta import HOJA_FACTURACION, HOJA_PRECIOS  # noqa: E402
+
+# --- GENERADOR DE LIBROS SINTÉTICOS PARA EL BANCO DE PRUEBAS ---
+# Produce hojas 'Facturacion' y 'Listado de Precios' con la misma estructura que los archivos
+# reales: códigos controlados, clientes intercompany 200046/200173, marcas NUTRICIA/BEBELAC,
+# zonas de funcionarios, almacén de ofertas 1012 y productos ausentes de la lista de precios.
+#
+#   python benchmarks/generar_libros.py --filas 10000 100000 1000000 --salida benchmarks/datos
+
+CANTIDAD_PRODUCTOS = 2_500
+CANTIDAD_CLIENTES = 800
+PROPORCION_SIN_PRECIO = 0.03  # Productos facturados que no figuran en la lista
+ZONAS_COMERCIALES = ['CAPITAL', 'GRAN ASUNCION', 'INTERIOR NORTE', 'INTERIOR SUR', 'CADENAS']
+MARCAS = ['NUTRICIA', 'BEBELAC', 'GENERICOS', 'LQF', 'DERMO', 'OTC', 'HOSPITALARIA']
+ALMACENES = [1001, 1002, 1012, 1041]
+DESCUENTOS = [0.0, 2.0, 3.0, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 10.0, 10.5, 11.5, 12.0]
+
+
+def generar_tablas(filas, semilla=0, fecha_inicio='2025-01-01', dias=30):
+    rng = np.random.default_rng(semilla)
+
+    # Lista de precios: productos propios más los códigos controlados reales
+    codigos = np.unique(np.concatenate([
+        np.arange(3_100_000, 3_100_000 + CANTIDAD_PRODUCTOS).astype(str),
+        np.array(codigos_controlados),
+    ]))
+    marcas_producto = rng.choice(MARCAS, len(codigos), p=[0.08, 0.06, 0.3, 0.2, 0.12, 0.14, 0.1])
+    precio_lista = rng.integers(2_000, 400_000, len(codigos)).astype(float)
+    df_precios = pd.DataFrame({
+        'Codigo': codigos.astype(np.int64),
+        'Descripcion': [f'PRODUCTO {c}' for c in codigos],
+        'IVA': rng.choice([0.1, 0.05, 0.0], len(codigos), p=[0.6, 0.35, 0.05]),
+        'Precio de Factura con Descuento': precio_lista,
+        'Precio Intercompany': (precio_lista * rng.uniform(0.85, 0.95, len(codigos))).round(),
+    })
+    con_precio = rng.random(len(codigos)) >= PROPORCION_SIN_PRECIO
+    df_precios = df_precios[con_precio].reset_index(drop=True)
+
+    # Facturación
+    indice_producto = rng.integers(0, len(codigos), filas)
+    clientes = np.concatenate([
+        np.arange(100_000, 100_000 + CANTIDAD_CLIENTES).astype(str),
+        [CLIENTE_200046, CLIENTE_200173],
+    ])
+    pesos_clientes = np.full(len(clientes), 0.9 / CANTIDAD_CLIENTES)
+    pesos_clientes[-2:] = 0.05
+    solicitante = rng.choice(clientes, filas, p=pesos_clientes)
+    zona = rng.choice(ZONAS_COMERCIALES + ZONAS_FUNCIONARIOS, filas, p=[0.3, 0.2, 0.15, 0.15, 0.16, 0.02, 0.02])
+    descuento = rng.choice(DESCUENTOS, filas, p=[0.2, 0.1, 0.15, 0.15, 0.05, 0.1, 0.05, 0.08, 0.03, 0.03, 0.02, 0.02, 0.02])
+    cantidad = rng.integers(1, 48, filas)
+
+    iva = df_precios.set_index(df_precios['Codigo'].astype(str))['IVA'].reindex(codigos).fillna(0.1).to_numpy()
+    precio_sin_iva = precio_lista / (1 + np.where(iva > 0, iva, 0))
+    es_intercompany = np.isin(solicitante, [CLIENTE_200046, CLIENTE_200173])
+    precio_base = np.where(es_intercompany, precio_sin_iva[indice_producto] * 0.9, precio_sin_iva[indice_producto])
+    # La mayoría se factura cerca del precio objetivo; una fracción queda por debajo de la tolerancia
+    factor_precio = np.where(rng.random(filas) < 0.08, rng.uniform(0.85, 0.975, filas), rng.uniform(0.985, 1.03, filas))
+
+    df_ventas = pd.DataFrame({
+        'Fecha factura': pd.Timestamp(fecha_inicio) + pd.to_timedelta(rng.integers(0, dias, filas), unit='D'),
+        'Almacen': rng.choice(ALMACENES, filas, p=[0.6, 0.2, 0.15, 0.05]),
+        'Tipo Venta': rng.choice(['ZVTA', 'ZOFE', 'ZINT'], filas, p=[0.85, 0.1, 0.05]),
+        'Zona de Venta': zona,
+        'Solicitante': solicitante.astype(np.int64),
+        'Nombre 1': [f'CLIENTE {c}' for c in solicitante],
+        'Codigo': codigos[indice_producto].astype(np.int64),
+        'Material': [f'PRODUCTO {c}' for c in codigos[indice_producto]],
+        'Jerarquia': marcas_producto[indice_producto],
+        '% Desc': descuento,
+        'Cant': cantidad,
+        'Valor neto': (precio_base * factor_precio * cantidad).round(),
+    })
+    return df_ventas, df_precios
+
+
+def escribir_libro(ruta, df_ventas, df_precios):
+    with open(ruta, 'wb') as destino:
+        destino.write(generar_xlsx({HOJA_FACTURACION: df_ventas, HOJA_PRECIOS: df_precios}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera libros sintéticos de facturación para el banco de pruebas.")
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--salida', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos'))
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.salida, exist_ok=True)
+    for filas in args.filas:
+        ruta = os.path.join(args.salida, f'facturacion_{filas}.xlsx')
+        escribir_libro(ruta, *generar_tablas(filas, args.semilla))
+        print(f"{ruta}: {filas:,} líneas ({os.path.getsize(ruta) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
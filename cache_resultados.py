@@ -0,0 +1,217 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ingesta import DIR_CACHE
+
+# --- CACHÉ DE RESULTADOS COMPARTIDA ENTRE SESIONES ---
+# Un único almacén por proceso para libros leídos, auditorías y exportaciones, con clave por
+# huella de contenido: si dos auditores suben el mismo archivo se calcula y guarda una sola vez.
+# Tiene un presupuesto en bytes con desalojo LRU, vencimiento por TTL y, opcionalmente, desborde
+# a disco de las entradas frías (se recuperan de ahí antes de volver a calcularlas).
+
+PRESUPUESTO_MB = float(os.environ.get('AUDITORIA_CACHE_MB', 1024))
+TTL_SEGUNDOS = float(os.environ.get('AUDITORIA_CACHE_TTL', 4 * 3600))
+DESBORDE_A_DISCO = os.environ.get('AUDITORIA_CACHE_DESBORDE', '1') not in ('0', 'false', 'no')
+PRESUPUESTO_DISCO_MB = float(os.environ.get('AUDITORIA_CACHE_DISCO_MB', 4 * PRESUPUESTO_MB))
+DIR_CACHE_RESULTADOS = os.path.join(DIR_CACHE, 'resultados')
+
+
+def tamano_en_memoria(valor):
+    # Estimación de bytes ocupados (DataFrames con deep=True, arreglos NumPy, bytes y contenedores)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(tamano_en_memoria(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamano_en_memoria(v) for v in valor)
+    if hasattr(valor, '__dict__'):
+        # Objetos propios (p. ej. índices precalculados): la suma de sus atributos
+        return tamano_en_memoria(vars(valor))
+    return 64
+
+
+class CacheResultados:
+    def __init__(self, presupuesto_mb=PRESUPUESTO_MB, ttl_segundos=TTL_SEGUNDOS, desborde=DESBORDE_A_DISCO,
+                 presupuesto_disco_mb=PRESUPUESTO_DISCO_MB, carpeta=DIR_CACHE_RESULTADOS):
+        self.presupuesto = int(presupuesto_mb * 1e6)
+        self.ttl = ttl_segundos
+        self.presupuesto_disco = int(presupuesto_disco_mb * 1e6)
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> (valor, bytes, creado)
+        self._en_disco = OrderedDict()  # clave -> (ruta, bytes, creado)
+        self._calculando = {}
+        self._bytes = 0
+        self._bytes_disco = 0
+        self._contadores = dict.fromkeys(
+            ['aciertos', 'aciertos_disco', 'fallos', 'desalojos', 'desbordes', 'vencidos'], 0
+        )
+
+        # Cada proceso usa su propia carpeta de desborde y la vacía al arrancar: nunca se
+        # deserializan archivos que no haya escrito este mismo proceso
+        self.carpeta = os.path.join(carpeta, str(os.getpid())) if desborde else None
+        if self.carpeta:
+            shutil.rmtree(self.carpeta, ignore_errors=True)
+            os.makedirs(self.carpeta, exist_ok=True)
+
+    def _vencida(self, creado):
+        return self.ttl > 0 and time.monotonic() - creado > self.ttl
+
+    def _tomar(self, clave):
+        # Requiere self._lock. Devuelve la entrada en memoria (marcándola como reciente) o None
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if self._vencida(entrada[2]):
+            self._quitar(clave)
+            self._contadores['vencidos'] += 1
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def _quitar(self, clave):
+        _, tamano, _ = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+    def obtener(self, clave, calcular):
+        # Devuelve (valor, origen) con origen 'memoria', 'disco' o 'calculado'. Las sesiones que
+        # piden la misma clave a la vez esperan al primer cálculo en lugar de repetirlo.
+        with self._lock:
+            entrada = self._tomar(clave)
+            if entrada is not None:
+                self._contadores['aciertos'] += 1
+                return entrada[0], 'memoria'
+            bloqueo = self._calculando.setdefault(clave, threading.Lock())
+
+        with bloqueo:
+            with self._lock:
+                entrada = self._tomar(clave)
+                if entrada is not None:
+                    self._contadores['aciertos'] += 1
+                    return entrada[0], 'memoria'
+
+            try:
+                valor, creado = self._recuperar_desborde(clave)
+                if valor is not None:
+                    origen = 'disco'
+                else:
+                    valor, creado, origen = calcular(), time.monotonic(), 'calculado'
+                with self._lock:
+                    self._contadores['aciertos_disco' if origen == 'disco' else 'fallos'] += 1
+                    self._guardar(clave, valor, creado)
+            finally:
+                with self._lock:
+                    self._calculando.pop(clave, None)
+        return valor, origen
+
+    def _purgar_vencidas(self):
+        # Requiere self._lock
+        for clave in [c for c, (_, _, creado) in self._entradas.items() if self._vencida(creado)]:
+            self._quitar(clave)
+            self._contadores['vencidos'] += 1
+        for clave in [c for c, (_, _, creado) in self._en_disco.items() if self._vencida(creado)]:
+            self._borrar_desborde(clave)
+            self._contadores['vencidos'] += 1
+
+    def _guardar(self, clave, valor, creado):
+        # Requiere self._lock
+        self._purgar_vencidas()
+        tamano = tamano_en_memoria(valor)
+        if clave in self._entradas:
+            self._quitar(clave)
+        if tamano > self.presupuesto:
+            # Más grande que todo el presupuesto: se devuelve sin quedar en memoria
+            self._desbordar(clave, valor, tamano, creado)
+            return
+        self._entradas[clave] = (valor, tamano, creado)
+        self._bytes += tamano
+        while self._bytes > self.presupuesto:
+            clave_fria, (valor_frio, tamano_frio, creado_frio) = next(iter(self._entradas.items()))
+            self._quitar(clave_fria)
+            self._contadores['desalojos'] += 1
+            if not self._vencida(creado_frio):
+                self._desbordar(clave_fria, valor_frio, tamano_frio, creado_frio)
+
+    def _ruta_desborde(self, clave):
+        return os.path.join(self.carpeta, hashlib.sha256(repr(clave).encode()).hexdigest()[:32] + '.pkl')
+
+    def _desbordar(self, clave, valor, tamano, creado):
+        # Requiere self._lock
+        if self.carpeta is None or tamano > self.presupuesto_disco:
+            return
+        ruta = self._ruta_desborde(clave)
+        ruta_tmp = f'{ruta}.tmp'
+        try:
+            with open(ruta_tmp, 'wb') as archivo:
+                pickle.dump(valor, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(ruta_tmp, ruta)
+        except Exception:
+            # Sin espacio en disco o valor no serializable: la entrada simplemente se descarta
+            if os.path.exists(ruta_tmp):
+                os.remove(ruta_tmp)
+            return
+        if clave in self._en_disco:
+            self._bytes_disco -= self._en_disco.pop(clave)[1]
+        self._en_disco[clave] = (ruta, tamano, creado)
+        self._bytes_disco += tamano
+        self._contadores['desbordes'] += 1
+        while self._bytes_disco > self.presupuesto_disco:
+            self._borrar_desborde(next(iter(self._en_disco)))
+
+    def _borrar_desborde(self, clave):
+        # Requiere self._lock
+        ruta, tamano, _ = self._en_disco.pop(clave)
+        self._bytes_disco -= tamano
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    def _recuperar_desborde(self, clave):
+        with self._lock:
+            entrada = self._en_disco.get(clave)
+            if entrada is None:
+                return None, None
+            ruta, _, creado = entrada
+            if self._vencida(creado):
+                self._borrar_desborde(clave)
+                self._contadores['vencidos'] += 1
+                return None, None
+        try:
+            with open(ruta, 'rb') as archivo:
+                valor = pickle.load(archivo)
+        except Exception:
+            return None, None
+        with self._lock:
+            if clave in self._en_disco:
+                self._borrar_desborde(clave)
+        return valor, creado
+
+    def contiene(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave) or self._en_disco.get(clave)
+            return entrada is not None and not self._vencida(entrada[-1])
+
+    def metricas(self):
+        with self._lock:
+            consultas = self._contadores['aciertos'] + self._contadores['aciertos_disco'] + self._contadores['fallos']
+            return {
+                'entradas': len(self._entradas),
+                'mb_en_memoria': round(self._bytes / 1e6, 1),
+                'mb_presupuesto': round(self.presupuesto / 1e6, 1),
+                'entradas_en_disco': len(self._en_disco),
+                'mb_en_disco': round(self._bytes_disco / 1e6, 1),
+                **self._contadores,
+                'tasa_aciertos': round((self._contadores['aciertos'] + self._contadores['aciertos_disco']) / consultas, 3) if consultas else None,
+            }
@@ -0,0 +1,184 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from esquema import ESQUEMA_LISTADO, aplicar_esquema
+
+# --- CATÁLOGO DE PRECIOS PREINDEXADO ---
+# El 'Listado de Precios' se normaliza una sola vez: objetivos SIN IVA precalculados y códigos
+# ordenados para resolver cada línea de factura con una búsqueda binaria + take (sin pd.merge).
+#
+# Con vigencias (columna 'Vigente_Desde'), la lista trae varias versiones por código y cada línea
+# toma la versión vigente en su 'Fecha factura': la última con Vigente_Desde <= fecha, como un
+# merge_asof hacia atrás agrupado por código. Las versiones se ordenan por (código, vigencia) en
+# una sola clave int64 y cada línea se resuelve con una búsqueda binaria: O(n log m), sin producto
+# cartesiano entre líneas y versiones ni reordenar la facturación.
+
+MAX_CATALOGOS_EN_MEMORIA = 16
+# Días desde 1970 desplazados a no negativos para la clave (código, vigencia). Una vigencia vacía
+# es la versión base del código (vigente desde siempre); una línea sin fecha toma la versión más reciente.
+_DESPLAZAMIENTO_DIAS = 2 ** 31
+
+
+def _dias(fechas, vacio):
+    dias = np.asarray(fechas, dtype='datetime64[D]')
+    valores = dias.astype(np.int64) + _DESPLAZAMIENTO_DIAS
+    valores[np.isnat(dias)] = vacio
+    return np.clip(valores, 0, 2 * _DESPLAZAMIENTO_DIAS - 1)
+
+
+class CatalogoPrecios:
+    # Todos los arreglos tienen una posición extra al final ("sin precio en lista") a la que
+    # apunta la posición -1: IVA nulo y objetivos en cero, igual que un merge sin coincidencia.
+
+    def __init__(self, codigos, iva, precio_farmacia, precio_intercompany, vigente_desde=None):
+        # Con vigente_desde, las filas vienen ordenadas por (código, vigencia) y un código puede repetirse
+        self.codigos = np.asarray(codigos, dtype=str)
+        self.vigente_desde = None if vigente_desde is None else np.asarray(vigente_desde, dtype='datetime64[D]')
+        iva = np.asarray(iva, dtype=float)
+        precio_farmacia = np.asarray(precio_farmacia, dtype=float)
+        precio_intercompany = np.asarray(precio_intercompany, dtype=float)
+
+        # --- AJUSTE CRÍTICO: QUITAR EL IVA DEL PRECIO OBJETIVO (PARA COMPARAR CON NETO) ---
+        factor_iva = 1 + iva
+        factor_iva[factor_iva <= 1] = np.nan
+        farmacia_sin_iva = np.where(np.isnan(factor_iva), precio_farmacia, precio_farmacia / factor_iva)
+        intercompany_sin_iva = np.where(np.isnan(factor_iva), precio_intercompany, precio_intercompany / factor_iva)
+        farmacia_sin_iva[np.isnan(farmacia_sin_iva)] = 0
+        intercompany_sin_iva[np.isnan(intercompany_sin_iva)] = 0
+
+        self.iva = np.append(iva, np.nan)
+        self.precio_farmacia = np.append(precio_farmacia, 0.0)
+        self.precio_intercompany = np.append(precio_intercompany, 0.0)
+        self.farmacia_sin_iva = np.append(farmacia_sin_iva, 0.0)
+        self.intercompany_sin_iva = np.append(intercompany_sin_iva, 0.0)
+
+        # Códigos distintos y la posición de su primera versión
+        self.claves, self.inicios = np.unique(self.codigos, return_index=True)
+        if self.con_vigencia:
+            rango = np.repeat(np.arange(len(self.claves), dtype=np.int64), np.diff(np.append(self.inicios, len(self.codigos))))
+            self.clave_version = (rango << 32) | _dias(self.vigente_desde, vacio=0)
+
+        firma = hashlib.sha256(self.codigos.tobytes())
+        for arreglo in (self.iva, self.precio_farmacia, self.precio_intercompany):
+            firma.update(arreglo.tobytes())
+        if self.con_vigencia:
+            firma.update(self.vigente_desde.tobytes())
+        self.version = firma.hexdigest()[:16]
+
+    @property
+    def con_vigencia(self):
+        return self.vigente_desde is not None
+
+    def __len__(self):
+        return len(self.codigos)
+
+    @classmethod
+    def desde_listado(cls, df_precios):
+        # Nombres canónicos y tipos del esquema (la ingesta ya lo aplicó: aquí no se convierte nada)
+        df_precios = aplicar_esquema(df_precios, ESQUEMA_LISTADO)
+        con_vigencia = 'Vigente_Desde' in df_precios.columns and df_precios['Vigente_Desde'].notna().any()
+        columnas = list(ESQUEMA_LISTADO) if con_vigencia else [c for c in ESQUEMA_LISTADO if c != 'Vigente_Desde']
+        df_precios = df_precios[columnas].dropna(subset=['Codigo'])
+
+        # Las filas sin código no pueden asignarse a ninguna línea; un código repetido en la
+        # lista (o repetido con la misma vigencia) conserva su primera aparición
+        if con_vigencia:
+            df_precios['Vigente_Desde'] = df_precios['Vigente_Desde'].dt.floor('D')
+            df_precios = df_precios.drop_duplicates(['Codigo', 'Vigente_Desde'], keep='first')
+            df_precios = df_precios.sort_values(['Codigo', 'Vigente_Desde'], kind='stable', na_position='first')
+        else:
+            df_precios = df_precios.drop_duplicates('Codigo', keep='first').sort_values('Codigo', kind='stable')
+
+        return cls(
+            df_precios['Codigo'].to_numpy(),
+            df_precios['IVA_Lista'].fillna(0).to_numpy(dtype=float),
+            df_precios['Precio_Farmacia_Target'].fillna(0).to_numpy(dtype=float),
+            df_precios['Precio_Intercompany_Target'].fillna(0).to_numpy(dtype=float),
+            df_precios['Vigente_Desde'].to_numpy() if con_vigencia else None,
+        )
+
+    def posiciones(self, codigos, fechas=None):
+        # Posición de cada código en el catálogo (-1 si no está en la lista). Se busca una vez
+        # por código distinto y se expande con los códigos del categórico. Con vigencias, la
+        # posición es la de la versión vigente en la fecha de cada línea.
+        if not isinstance(codigos.dtype, pd.CategoricalDtype):
+            codigos = codigos.astype('category')
+        claves = np.asarray(codigos.cat.categories.astype(str), dtype=str)
+
+        if len(self.claves) == 0:
+            rango_por_clave = np.full(len(claves), -1, dtype=np.int64)
+        else:
+            indice = np.searchsorted(self.claves, claves)
+            indice_valido = np.minimum(indice, len(self.claves) - 1)
+            rango_por_clave = np.where(self.claves[indice_valido] == claves, indice_valido, -1)
+
+        codigos_cat = codigos.cat.codes.to_numpy()
+        rango = np.where(codigos_cat >= 0, rango_por_clave[codigos_cat], -1)
+        if not self.con_vigencia:
+            # Un código por fila: el rango es la posición
+            return rango
+
+        # As-of por código: última versión con clave (código, vigencia) <= (código, fecha de la línea)
+        if fechas is None:
+            dias = np.full(len(rango), 2 * _DESPLAZAMIENTO_DIAS - 1)
+        else:
+            dias = _dias(fechas.to_numpy(dtype='datetime64[D]'), vacio=2 * _DESPLAZAMIENTO_DIAS - 1)
+        posicion = np.searchsorted(self.clave_version, (np.maximum(rango, 0) << 32) | dias, side='right') - 1
+        # Sin versión del mismo código en esa fecha (código ausente o línea anterior a su primera vigencia)
+        vigente = rango >= 0
+        vigente &= posicion >= self.inicios[np.maximum(rango, 0)]
+        return np.where(vigente, posicion, -1)
+
+    def a_dataframe(self):
+        df = pd.DataFrame({
+            'Codigo': self.codigos,
+            'IVA_Lista': self.iva[:-1],
+            'Precio_Farmacia_Target': self.precio_farmacia[:-1],
+            'Precio_Intercompany_Target': self.precio_intercompany[:-1],
+        })
+        if self.con_vigencia:
+            df['Vigente_Desde'] = self.vigente_desde.astype('datetime64[us]')
+        return df
+
+    def guardar(self, ruta):
+        self.a_dataframe().to_parquet(ruta, index=False)
+
+    @classmethod
+    def cargar(cls, ruta):
+        df = pd.read_parquet(ruta)
+        return cls(
+            df['Codigo'].to_numpy(), df['IVA_Lista'].to_numpy(),
+            df['Precio_Farmacia_Target'].to_numpy(), df['Precio_Intercompany_Target'].to_numpy(),
+            df['Vigente_Desde'].to_numpy() if 'Vigente_Desde' in df.columns else None,
+        )
+
+
+# --- REGISTRO EN MEMORIA (COMPARTIDO ENTRE ARCHIVOS Y SESIONES DEL MISMO PROCESO) ---
+_catalogos = OrderedDict()
+_candado_catalogos = threading.Lock()
+
+
+def huella_listado(df_precios):
+    hashes = pd.util.hash_pandas_object(df_precios, index=False).to_numpy()
+    firma = hashlib.sha256(repr(list(df_precios.columns)).encode('utf-8'))
+    firma.update(hashes.tobytes())
+    return firma.hexdigest()
+
+
+def obtener_catalogo(df_precios):
+    # La lista de precios cambia rara vez: si ya se procesó una idéntica, se reutiliza
+    clave = huella_listado(df_precios)
+    with _candado_catalogos:
+        if clave in _catalogos:
+            _catalogos.move_to_end(clave)
+            return _catalogos[clave]
+    catalogo = CatalogoPrecios.desde_listado(df_precios)
+    with _candado_catalogos:
+        _catalogos[clave] = catalogo
+        while len(_catalogos) > MAX_CATALOGOS_EN_MEMORIA:
+            _catalogos.popitem(last=False)
+    return catalogo
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CLIENTE DEL SERVICIO DE AUDITORÍA ---
+# Solo biblioteca estándar: sirve como ejemplo de integración para el ERP y para probar el
+# servicio en local (latencia y rendimiento con varios envíos concurrentes).
+#
+#   python cliente_auditoria.py LOTE.(json|csv|parquet) [--url URL] [--solo-desvios] [--repeticiones N] [--concurrencia C]
+#   python cliente_auditoria.py --precios LISTADO.(json|csv|parquet) [--url URL]
+#   python cliente_auditoria.py --referencia-atipicos FACTURACION.(json|csv|parquet) [--url URL]
+#   python cliente_auditoria.py --metricas [--url URL]
+
+URL_SERVICIO = os.environ.get('AUDITORIA_SERVICIO_URL', 'http://127.0.0.1:8765')
+TIPOS_CONTENIDO = {'json': 'application/json', 'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+TIMEOUT_SEGUNDOS = 300
+
+
+class ErrorServicio(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(f"{estado}: {mensaje}")
+        self.estado = estado
+
+
+def formato_de_archivo(ruta):
+    extension = os.path.splitext(ruta)[1].lower().lstrip('.')
+    formato = 'parquet' if extension == 'pq' else extension
+    if formato not in TIPOS_CONTENIDO:
+        raise ValueError(f"Formato no soportado: '{ruta}' (json, csv o parquet).")
+    return formato
+
+
+def _pedir(metodo, url, cuerpo=None, formato=None):
+    encabezados = {'Content-Type': TIPOS_CONTENIDO[formato]} if formato else {}
+    pedido = urllib.request.Request(url, data=cuerpo, method=metodo, headers=encabezados)
+    try:
+        with urllib.request.urlopen(pedido, timeout=TIMEOUT_SEGUNDOS) as respuesta:
+            return json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        try:
+            mensaje = json.loads(e.read()).get('error', e.reason)
+        except ValueError:
+            mensaje = e.reason
+        raise ErrorServicio(e.code, mensaje) from None
+
+
+def auditar_lote(contenido, formato, url=URL_SERVICIO, solo_desvios=False):
+    # {'resumen': KPIs, 'segundos': {...}, 'lineas': [{'Linea', 'Alerta_Descuento', ...}, ...]}
+    return _pedir('POST', f"{url}/auditar{'?solo_desvios=1' if solo_desvios else ''}", contenido, formato)
+
+
+def cargar_precios(contenido, formato, url=URL_SERVICIO):
+    return _pedir('PUT', f'{url}/precios', contenido, formato)
+
+
+def cargar_referencia_atipicos(contenido, formato, url=URL_SERVICIO):
+    return _pedir('PUT', f'{url}/referencia-atipicos', contenido, formato)
+
+
+def metricas(url=URL_SERVICIO):
+    return _pedir('GET', f'{url}/metricas')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cliente del servicio local de auditoría de precios.")
+    parser.add_argument('lote', nargs='?', help="Lote de facturación a auditar (JSON, CSV o Parquet).")
+    parser.add_argument('--url', default=URL_SERVICIO)
+    parser.add_argument('--solo-desvios', action='store_true', help="Pide solo las líneas con alerta.")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Envía el lote N veces (medición de latencia).")
+    parser.add_argument('--concurrencia', type=int, default=1, help="Envíos simultáneos.")
+    parser.add_argument('--precios', metavar='LISTADO', help="Reemplaza la lista de precios del servicio.")
+    parser.add_argument('--referencia-atipicos', metavar='FACTURACION',
+                        help="Reemplaza la facturación de referencia del puntaje de precio atípico.")
+    parser.add_argument('--metricas', action='store_true', help="Muestra las métricas del servicio.")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.precios:
+            with open(args.precios, 'rb') as archivo:
+                info = cargar_precios(archivo.read(), formato_de_archivo(args.precios), args.url)
+            print(f"Lista de precios cargada: {info['codigos']:,} códigos.")
+        if args.referencia_atipicos:
+            with open(args.referencia_atipicos, 'rb') as archivo:
+                info = cargar_referencia_atipicos(archivo.read(), formato_de_archivo(args.referencia_atipicos), args.url)
+            print(f"Referencia de atípicos cargada: {info['productos']:,} productos.")
+        if args.lote:
+            formato = formato_de_archivo(args.lote)
+            with open(args.lote, 'rb') as archivo:
+                contenido = archivo.read()
+
+            def enviar(_):
+                inicio = time.perf_counter()
+                respuesta = auditar_lote(contenido, formato, args.url, args.solo_desvios)
+                return respuesta, time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+                resultados = list(pool.map(enviar, range(args.repeticiones)))
+            total = time.perf_counter() - inicio
+
+            respuesta = resultados[0][0]
+            for clave, valor in respuesta['resumen'].items():
+                print(f"{clave}: {valor:,}" if isinstance(valor, int) else f"{clave}: {valor:,.2f}")
+            latencias = sorted(segundos * 1000 for _, segundos in resultados)
+            lineas = respuesta['resumen']['Transacciones Auditadas'] * len(resultados)
+            print(
+                f"{len(resultados)} envíos en {total:.2f} s ({lineas / total:,.0f} líneas/s); latencia ms "
+                f"p50 {latencias[len(latencias) // 2]:.1f}, máx {latencias[-1]:.1f}"
+            )
+        if args.metricas or not (args.lote or args.precios or args.referencia_atipicos):
+            print(json.dumps(metricas(args.url), ensure_ascii=False, indent=2))
+    except (OSError, ValueError, ErrorServicio) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import pandas as pd
+
+# --- ESQUEMA DECLARADO DE LAS TABLAS DE ENTRADA ---
+# Nombre canónico, tipo y alias aceptados de cada columna. La ingesta lo aplica una sola vez al
+# leer (Excel, CSV o Parquet): las tablas quedan con nombres canónicos y columnas tipadas, y la
+# auditoría las recibe así sin volver a convertirlas. aplicar_esquema es idempotente: sobre una
+# tabla ya tipada solo revisa los dtypes.
+#
+# Tipos:
+#   'texto'  -> str (códigos y clientes como texto: se conservan los ceros a la izquierda)
+#   'numero' -> numérico (se respeta el dtype numérico leído; el resto se convierte con coerce)
+#   'entero' -> el entero más chico que represente los valores (float si hay vacíos)
+#   'fecha'  -> datetime64[us]
+
+ESQUEMA_FACTURACION = {
+    'Fecha factura': ('fecha', []),
+    'Almacen': ('entero', []),
+    'Tipo Venta': ('texto', []),
+    'Zona de Venta': ('texto', []),
+    'Solicitante': ('texto', []),
+    'Nombre 1': ('texto', []),
+    'Codigo': ('texto', ['codigo']),
+    'Material': ('texto', []),
+    'Jerarquia': ('texto', ['jerarquia']),
+    '% Desc': ('numero', ['Descuento %']),
+    'Valor neto': ('numero', ['Valor Neto', 'VALOR NETO']),
+    'Cant': ('numero', []),
+}
+
+ESQUEMA_LISTADO = {
+    'Codigo': ('texto', []),
+    'IVA_Lista': ('numero', ['IVA']),
+    'Precio_Farmacia_Target': ('numero', ['Precio de Factura con Descuento']),
+    'Precio_Intercompany_Target': ('numero', ['Precio Intercompany']),
+    # Opcional: con esta columna la lista trae varias versiones por código (ver catalogo.py)
+    'Vigente_Desde': ('fecha', ['Vigente desde', 'Vigencia', 'Vigencia desde', 'Fecha Vigencia']),
+}
+
+
+def alias_columnas(esquema):
+    # {nombre aceptado: nombre canónico}, incluido el propio nombre canónico
+    alias = {}
+    for canonica, (_, otros) in esquema.items():
+        alias[canonica] = canonica
+        alias.update(dict.fromkeys(otros, canonica))
+    return alias
+
+
+def tipos_lectura(esquema):
+    # dtype para el lector de Excel: solo las columnas de texto (los números se dejan inferir y
+    # se convierten con coerce, para que una celda con texto no haga fallar la lectura)
+    return {nombre: str for nombre, canonica in alias_columnas(esquema).items() if esquema[canonica][0] == 'texto'}
+
+
+def convertir_fecha(serie):
+    try:
+        fechas = pd.to_datetime(serie, format='ISO8601')
+    except (ValueError, TypeError):
+        # Exportaciones con fecha local (dd/mm/aaaa)
+        fechas = pd.to_datetime(serie, dayfirst=True, errors='coerce')
+    return fechas.astype('datetime64[us]')
+
+
+def convertir_columna(serie, tipo):
+    # Devuelve la misma Series si ya tiene el tipo declarado
+    dtype = serie.dtype
+    if tipo == 'texto':
+        if isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            return serie
+        return serie.astype(str)
+    if tipo == 'fecha':
+        if dtype == 'datetime64[us]':
+            return serie
+        if pd.api.types.is_datetime64_dtype(dtype):
+            return serie.astype('datetime64[us]')
+        return convertir_fecha(serie)
+    if tipo == 'entero':
+        if dtype.kind in 'iu' and dtype.itemsize < 8:
+            return serie
+        return pd.to_numeric(serie, errors='coerce', downcast='integer')
+    # 'numero'
+    if dtype.kind in 'iuf' and not pd.api.types.is_extension_array_dtype(dtype):
+        return serie
+    if pd.api.types.is_numeric_dtype(dtype):
+        # Enteros/flotantes con nulos de pandas (Int64, Float64): a float64 de NumPy
+        return serie.astype(float)
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def aplicar_esquema(df, esquema):
+    # Nombres canónicos (sin espacios sobrantes ni alias) y columnas con su tipo declarado. Las
+    # columnas fuera del esquema se conservan tal cual. Devuelve un DataFrame nuevo: las tablas
+    # cacheadas de entrada no se modifican.
+    # astype(str): un DataFrame sin columnas (p. ej. de una lista vacía) tiene un RangeIndex
+    df = df.set_axis(df.columns.astype(str).str.strip(), axis=1).rename(columns=alias_columnas(esquema))
+    for columna, (tipo, _) in esquema.items():
+        if columna in df.columns:
+            serie = df[columna]
+            convertida = convertir_columna(serie, tipo)
+            if convertida is not serie:
+                df[columna] = convertida
+    return df
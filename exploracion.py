@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# --- EXPLORADOR DE DESVÍOS (DRILL-DOWN CLIENTE -> PRODUCTO -> LÍNEAS) ---
+# Índice por dimensión construido una sola vez por resultado auditado: códigos de grupo por fila
+# y una permutación que deja contiguas las filas de cada grupo (CSR: orden + inicios). Con eso,
+# un ranking es un np.bincount sobre las filas seleccionadas y bajar un nivel solo recorre las
+# filas del grupo elegido, sin volver a escanear ni agrupar el DataFrame completo.
+
+# Dimensiones del explorador (etiqueta en pantalla -> columna del resultado auditado)
+DIMENSIONES_EXPLORACION = {
+    'Cliente': 'Nombre 1',
+    'Producto': 'Codigo',
+    'Almacén': 'Almacen',
+    'Marca': 'Jerarquia',
+}
+# Columna descriptiva que acompaña a cada dimensión en el ranking
+DESCRIPCION_DIMENSION = {'Codigo': 'Material'}
+# Dimensión a la que se baja desde cada una al elegir un valor
+SIGUIENTE_DIMENSION = {'Nombre 1': 'Codigo', 'Codigo': 'Nombre 1', 'Almacen': 'Nombre 1', 'Jerarquia': 'Codigo'}
+ORDENES_RANKING = {
+    'Valor neto desviado': 'Valor Neto de Desvíos (Gs.)',
+    'Cantidad de alertas': 'Líneas con Desvío',
+}
+SIN_DATO = '(sin dato)'
+
+
+class IndiceExploracion:
+    # Solo arreglos NumPy (sin referencia al DataFrame): la caché compartida mide su tamaño real
+
+    def __init__(self, df_audit, dimensiones=DIMENSIONES_EXPLORACION.values()):
+        filas = len(df_audit)
+        tipo_posicion = np.int32 if filas < np.iinfo(np.int32).max else np.int64
+        self.filas = filas
+        self.valor_neto = np.nan_to_num(df_audit['Valor neto'].to_numpy(dtype=float))
+        self.grupos = {}
+        self.etiquetas = {}
+        self.descripciones = {}
+        self.orden = {}
+        self.inicios = {}
+        for dimension in dimensiones:
+            serie = df_audit[dimension]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                grupos, etiquetas = serie.cat.codes.to_numpy(), serie.cat.categories
+            else:
+                grupos, etiquetas = pd.factorize(serie, sort=True)
+            # Los vacíos (código -1) forman un grupo propio al final
+            etiquetas = np.append(np.asarray(etiquetas.astype(str), dtype=object), SIN_DATO)
+            grupos = np.where(grupos < 0, len(etiquetas) - 1, grupos).astype(tipo_posicion)
+
+            orden = np.argsort(grupos, kind='stable').astype(tipo_posicion)
+            inicios = np.zeros(len(etiquetas) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(grupos, minlength=len(etiquetas)), out=inicios[1:])
+
+            self.grupos[dimension] = grupos
+            self.etiquetas[dimension] = etiquetas
+            self.orden[dimension] = orden
+            self.inicios[dimension] = inicios
+            if dimension in DESCRIPCION_DIMENSION:
+                # Descripción de la primera fila de cada grupo (p. ej. el material de cada código)
+                descripcion = df_audit[DESCRIPCION_DIMENSION[dimension]].astype(str).to_numpy(dtype=object)
+                primeras = orden[inicios[:-1][np.diff(inicios) > 0]]
+                valores = np.full(len(etiquetas), '', dtype=object)
+                valores[grupos[primeras]] = descripcion[primeras]
+                self.descripciones[dimension] = valores
+
+    def filas_grupo(self, dimension, grupo):
+        # Posiciones (ascendentes) de las filas del grupo: un corte de la permutación, sin escanear
+        inicio, fin = self.inicios[dimension][grupo], self.inicios[dimension][grupo + 1]
+        return self.orden[dimension][inicio:fin]
+
+    def ranking(self, dimension, seleccion, desvio, limite=20, orden_por=ORDENES_RANKING['Valor neto desviado'], filas=None):
+        # Top-N de grupos por valor neto desviado o cantidad de alertas entre las filas
+        # seleccionadas (opcionalmente restringidas a las filas de un grupo de otro nivel)
+        grupos = self.grupos[dimension]
+        valor_neto = self.valor_neto
+        if filas is not None:
+            grupos, valor_neto, seleccion, desvio = grupos[filas], valor_neto[filas], seleccion[filas], desvio[filas]
+        cantidad = len(self.etiquetas[dimension])
+        con_desvio = seleccion & desvio
+
+        lineas = np.bincount(grupos[seleccion], minlength=cantidad)
+        lineas_desvio = np.bincount(grupos[con_desvio], minlength=cantidad)
+        valor_desvio = np.bincount(grupos[con_desvio], weights=valor_neto[con_desvio], minlength=cantidad)
+
+        candidatos = np.flatnonzero(lineas_desvio)
+        clave = valor_desvio if orden_por == ORDENES_RANKING['Valor neto desviado'] else lineas_desvio
+        if len(candidatos) > limite:
+            # Solo se ordena el top-N, no todos los grupos
+            candidatos = candidatos[np.argpartition(-clave[candidatos], limite - 1)[:limite]]
+        candidatos = candidatos[np.lexsort((-valor_desvio[candidatos], -lineas_desvio[candidatos], -clave[candidatos]))]
+
+        ranking = pd.DataFrame({'Grupo': candidatos, 'Valor': self.etiquetas[dimension][candidatos]})
+        if dimension in self.descripciones:
+            ranking['Descripción'] = self.descripciones[dimension][candidatos]
+        ranking['Líneas'] = lineas[candidatos]
+        ranking['Líneas con Desvío'] = lineas_desvio[candidatos]
+        ranking['% con Desvío'] = lineas_desvio[candidatos] / lineas[candidatos] * 100
+        ranking['Valor Neto de Desvíos (Gs.)'] = valor_desvio[candidatos]
+        return ranking
+
+    def lineas(self, ruta, seleccion, desvio=None):
+        # Filas que cumplen toda la ruta [(dimensión, grupo), ...]: se parte del grupo más chico
+        # y se filtra por los demás con sus códigos de grupo
+        ruta = sorted(ruta, key=lambda paso: len(self.filas_grupo(*paso)))
+        filas = self.filas_grupo(*ruta[0])
+        for dimension, grupo in ruta[1:]:
+            filas = filas[self.grupos[dimension][filas] == grupo]
+        mascara = seleccion[filas]
+        if desvio is not None:
+            mascara &= desvio[filas]
+        return filas[mascara]
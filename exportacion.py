@@ -0,0 +1,89 @@
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import xlsxwriter
+
+# --- EXPORTACIÓN DE REPORTES (XLSX EN MODO DE MEMORIA CONSTANTE, ZIP CSV/PARQUET) ---
+
+MIME_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MIME_ZIP = 'application/zip'
+
+FILAS_POR_BLOQUE = 10_000
+MAX_FILAS_XLSX = 1_048_575  # Límite de filas de una hoja de Excel (sin contar el encabezado)
+
+
+def _valores_python(serie):
+    # xlsxwriter escribe tipos nativos de Python; los nulos se dejan como celdas vacías
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def _escribir_hoja(libro, nombre_hoja, df, formato_encabezado):
+    hoja = libro.add_worksheet(nombre_hoja[:31])
+    hoja.write_row(0, 0, [str(c) for c in df.columns], formato_encabezado)
+
+    # En modo de memoria constante las filas deben escribirse en orden; se procesan
+    # bloques de FILAS_POR_BLOQUE para no materializar toda la tabla como objetos Python.
+    fila = 1
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+        columnas = [_valores_python(bloque[c]) for c in bloque.columns]
+        for valores in zip(*columnas):
+            hoja.write_row(fila, 0, valores)
+            fila += 1
+
+
+def generar_xlsx(hojas):
+    # hojas: {nombre_hoja: DataFrame}. Un solo libro con una hoja por reporte.
+    for nombre, df in hojas.items():
+        if len(df) > MAX_FILAS_XLSX:
+            raise ValueError(
+                f"La hoja '{nombre}' tiene {len(df):,} filas y supera el límite de Excel. Use la exportación ZIP."
+            )
+
+    output = BytesIO()
+    libro = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'dd/mm/yyyy',
+        'nan_inf_to_errors': True,
+    })
+    formato_encabezado = libro.add_format({'bold': True})
+    for nombre, df in hojas.items():
+        _escribir_hoja(libro, nombre, df, formato_encabezado)
+    libro.close()
+    return output.getvalue()
+
+
+def generar_zip(hojas, formato='csv'):
+    # Variante para salidas muy grandes: un archivo CSV o Parquet por reporte dentro de un ZIP
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for nombre, df in hojas.items():
+            if formato == 'parquet':
+                buffer = BytesIO()
+                df.to_parquet(buffer, index=False)
+                archivo_zip.writestr(f"{nombre}.parquet", buffer.getvalue())
+            else:
+                with archivo_zip.open(f"{nombre}.csv", 'w') as destino:
+                    # Se escribe por bloques directamente dentro del ZIP
+                    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+                        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+                        texto = bloque.to_csv(index=False, header=(inicio == 0))
+                        destino.write(texto.encode('utf-8-sig' if inicio == 0 else 'utf-8'))
+                    if len(df) == 0:
+                        destino.write(pd.DataFrame(columns=df.columns).to_csv(index=False).encode('utf-8-sig'))
+    return output.getvalue()
+
+
+# formato -> (extensión del archivo descargado, tipo MIME)
+FORMATOS_EXPORTACION = {
+    'xlsx': ('xlsx', MIME_XLSX),
+    'csv': ('zip', MIME_ZIP),
+    'parquet': ('zip', MIME_ZIP),
+}
+
+
+def exportar(hojas, formato='xlsx'):
+    if formato == 'xlsx':
+        return generar_xlsx(hojas)
+    return generar_zip(hojas, formato)
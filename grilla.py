@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- GRILLA PAGINADA DEL LADO DEL SERVIDOR ---
+# Búsqueda, orden y paginación se resuelven en el servidor; al navegador solo se envía la
+# página visible. El formato numérico va por column_config (sin Styler ni formateo por celda).
+
+TAMANOS_PAGINA = [50, 100, 250, 500]
+SIN_ORDEN = '(orden original)'
+
+
+def _es_texto(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(serie)
+
+
+def _mascara_busqueda(df, texto):
+    # Busca el texto (sin distinguir mayúsculas) en las columnas de texto. En las categóricas
+    # se evalúa solo sobre las categorías distintas y se expande con los códigos.
+    mascara = np.zeros(len(df), dtype=bool)
+    for columna in df.columns:
+        serie = df[columna]
+        if not _es_texto(serie) or pd.api.types.is_datetime64_any_dtype(serie):
+            continue
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            coincide = serie.cat.categories.astype(str).str.contains(texto, case=False, regex=False)
+            mascara |= np.append(np.asarray(coincide, dtype=bool), False)[serie.cat.codes.to_numpy()]
+        else:
+            mascara |= serie.astype(str).str.contains(texto, case=False, regex=False).to_numpy()
+    return mascara
+
+
+def _permutacion_orden(serie, descendente):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Rango alfabético de cada categoría; los nulos (código -1) quedan al final
+        rango = np.argsort(np.argsort(serie.cat.categories.astype(str).to_numpy(), kind='stable'))
+        claves = np.append(rango, len(rango))[serie.cat.codes.to_numpy()]
+        serie = pd.Series(claves)
+    return np.asarray(
+        serie.reset_index(drop=True).sort_values(ascending=not descendente, na_position='last', kind='stable').index
+    )
+
+
+def _posiciones_visibles(df, clave, firma, texto, orden, descendente):
+    # Caché por grilla en session_state; se invalida cuando cambia la firma de los datos
+    # (archivo + filtros). Así cambiar de página no vuelve a ordenar ni a buscar. Se guarda solo
+    # la permutación del orden elegido y la máscara de la última búsqueda: la memoria por sesión
+    # no crece con cada columna que se ordena.
+    cache = st.session_state.get(f'_grilla_{clave}')
+    if cache is None or cache['firma'] != firma:
+        cache = {'firma': firma, 'busquedas': {}, 'ordenes': {}}
+        st.session_state[f'_grilla_{clave}'] = cache
+
+    if orden == SIN_ORDEN:
+        cache['ordenes'] = {}
+        posiciones = np.arange(len(df))
+    else:
+        if (orden, descendente) not in cache['ordenes']:
+            cache['ordenes'] = {(orden, descendente): _permutacion_orden(df[orden], descendente)}
+        posiciones = cache['ordenes'][(orden, descendente)]
+
+    texto = texto.strip()
+    if texto:
+        if texto not in cache['busquedas']:
+            cache['busquedas'] = {texto: _mascara_busqueda(df, texto)}
+        posiciones = posiciones[cache['busquedas'][texto][posiciones]]
+    return posiciones
+
+
+def mostrar_grilla(df, clave, firma, column_config=None):
+    col_busqueda, col_orden, col_direccion, col_tamano = st.columns([2, 2, 1, 1])
+    texto = col_busqueda.text_input("Buscar", key=f'{clave}_busqueda', placeholder="Cliente, código, material...")
+    orden = col_orden.selectbox("Ordenar por", [SIN_ORDEN] + list(df.columns), key=f'{clave}_orden')
+    descendente = col_direccion.toggle("Descendente", key=f'{clave}_descendente')
+    tamano = col_tamano.selectbox("Filas por página", TAMANOS_PAGINA, index=1, key=f'{clave}_tamano')
+
+    posiciones = _posiciones_visibles(df, clave, firma, texto, orden, descendente)
+    total = len(posiciones)
+    paginas = max(1, math.ceil(total / tamano))
+
+    clave_pagina = f'{clave}_pagina'
+    if st.session_state.get(clave_pagina, 1) > paginas:
+        st.session_state[clave_pagina] = paginas
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key=clave_pagina)
+
+    inicio = (pagina - 1) * tamano
+    fin = min(inicio + tamano, total)
+    st.dataframe(df.iloc[posiciones[inicio:fin]], column_config=column_config, width='stretch')
+    st.caption(f"Mostrando filas {inicio + 1 if total else 0:,}–{fin:,} de {total:,} (página {pagina} de {paginas})")
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from catalogo import CatalogoPrecios, obtener_catalogo
+from esquema import ESQUEMA_LISTADO, aplicar_esquema
+from ingesta import DIR_CACHE
+
+# --- HISTORIAL DE PRECIOS CON VIGENCIAS (SQLITE) ---
+# Cada listado que se registra queda como una versión por código con su fecha de vigencia. Una
+# versión rige desde su fecha hasta la siguiente del mismo código. El historial completo se usa
+# como lista de precios con vigencias: cada línea se compara con el precio vigente en su fecha
+# de factura (ver catalogo.CatalogoPrecios.posiciones).
+
+RUTA_HISTORIAL_PRECIOS = os.environ.get('AUDITORIA_HISTORIAL_PRECIOS', os.path.join(DIR_CACHE, 'historial_precios.sqlite'))
+
+COLUMNAS_PRECIO = ['IVA_Lista', 'Precio_Farmacia_Target', 'Precio_Intercompany_Target']
+
+
+class HistorialPrecios:
+    def __init__(self, ruta=RUTA_HISTORIAL_PRECIOS):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS versiones (Codigo TEXT NOT NULL, Vigente_Desde TEXT NOT NULL, '
+                'IVA_Lista REAL, Precio_Farmacia_Target REAL, Precio_Intercompany_Target REAL, '
+                'Fecha_Registro TEXT NOT NULL, PRIMARY KEY (Codigo, Vigente_Desde)) WITHOUT ROWID'
+            )
+
+    @contextmanager
+    def _conectar(self, escritura=False):
+        # Igual que historico.HistoricoAuditoria: autocommit y BEGIN IMMEDIATE para las escrituras
+        conexion = sqlite3.connect(self.ruta, timeout=60, isolation_level=None)
+        try:
+            if escritura:
+                conexion.execute('BEGIN IMMEDIATE')
+            yield conexion
+            if escritura:
+                conexion.execute('COMMIT')
+        except BaseException:
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+            raise
+        finally:
+            conexion.close()
+
+    def _leer_versiones(self, conexion):
+        df = pd.read_sql_query(
+            'SELECT Codigo, Vigente_Desde, IVA_Lista, Precio_Farmacia_Target, Precio_Intercompany_Target '
+            'FROM versiones ORDER BY Codigo, Vigente_Desde', conexion
+        )
+        return aplicar_esquema(df, ESQUEMA_LISTADO)
+
+    def registrar(self, df_precios, vigente_desde=None):
+        # Incorpora un listado. Las filas sin 'Vigente_Desde' propia toman vigente_desde. Solo se
+        # guardan los precios que cambian respecto de la versión vigente en esa fecha; si ya hay
+        # una versión del código con la misma fecha, se reemplaza.
+        df = aplicar_esquema(df_precios, ESQUEMA_LISTADO).dropna(subset=['Codigo'])
+        fechas = df['Vigente_Desde'] if 'Vigente_Desde' in df.columns else pd.Series(pd.NaT, index=df.index, dtype='datetime64[us]')
+        if vigente_desde is not None:
+            fechas = fechas.fillna(pd.Timestamp(vigente_desde))
+        if fechas.isna().any():
+            raise ValueError("Indique la fecha de vigencia del listado de precios.")
+        df = pd.DataFrame({
+            'Codigo': df['Codigo'].to_numpy(),
+            'Vigente_Desde': fechas.dt.floor('D').to_numpy(),
+            **{columna: df[columna].fillna(0).to_numpy(dtype=float) for columna in COLUMNAS_PRECIO},
+        }).drop_duplicates(['Codigo', 'Vigente_Desde'], keep='first')
+
+        with self._conectar(escritura=True) as conexion:
+            existentes = self._leer_versiones(conexion)
+            if existentes.empty:
+                cambia = np.ones(len(df), dtype=bool)
+            else:
+                # Precio vigente en la fecha de cada fila, con la misma búsqueda as-of de la auditoría
+                catalogo = CatalogoPrecios.desde_listado(existentes)
+                posicion = catalogo.posiciones(df['Codigo'], df['Vigente_Desde'])
+                vigentes = [catalogo.iva[posicion], catalogo.precio_farmacia[posicion], catalogo.precio_intercompany[posicion]]
+                cambia = posicion < 0
+                for columna, vigente in zip(COLUMNAS_PRECIO, vigentes):
+                    cambia |= ~np.isclose(df[columna].to_numpy(), vigente, rtol=0, atol=1e-9)
+            nuevas = df[cambia]
+
+            fecha_registro = datetime.now().isoformat(timespec='microseconds')
+            conexion.executemany(
+                'INSERT INTO versiones (Codigo, Vigente_Desde, IVA_Lista, Precio_Farmacia_Target, '
+                'Precio_Intercompany_Target, Fecha_Registro) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (Codigo, Vigente_Desde) DO UPDATE SET IVA_Lista = excluded.IVA_Lista, '
+                'Precio_Farmacia_Target = excluded.Precio_Farmacia_Target, '
+                'Precio_Intercompany_Target = excluded.Precio_Intercompany_Target, Fecha_Registro = excluded.Fecha_Registro',
+                (
+                    (codigo, desde.date().isoformat(), *precios, fecha_registro)
+                    for codigo, desde, *precios in nuevas.itertuples(index=False, name=None)
+                )
+            )
+        return {'Precios en el listado': len(df), 'Versiones nuevas': len(nuevas), 'Sin cambios': len(df) - len(nuevas)}
+
+    def listado(self):
+        # Todas las versiones como lista de precios con vigencias (entrada válida para la auditoría)
+        with self._conectar() as conexion:
+            return self._leer_versiones(conexion)
+
+    def catalogo(self):
+        # Catálogo preindexado del historial (reutilizado mientras el historial no cambie)
+        return obtener_catalogo(self.listado())
+
+    def version(self):
+        # Cambia con cada registro que agrega o reemplaza versiones
+        with self._conectar() as conexion:
+            cantidad, ultimo = conexion.execute('SELECT COUNT(*), MAX(Fecha_Registro) FROM versiones').fetchone()
+        return f'{cantidad}-{ultimo or ""}'
@@ -0,0 +1,316 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from auditoria import (
+    CODIGO_ALERTA_OK, ETIQUETAS_ALERTA, armar_resumen, calcular_puntaje_atipico, ejecutar_auditoria,
+    estadisticas_atipicos, normalizar_columnas_ventas,
+)
+from ingesta import COLUMNAS_COMPROBANTE, DIR_CACHE
+
+# --- HISTÓRICO INCREMENTAL DE LÍNEAS AUDITADAS (SQLITE) ---
+# Cada línea de factura se identifica por una huella de sus columnas de negocio. Al incorporar
+# un archivo solo se auditan las líneas que no están en el histórico, así que cargar el delta
+# de un día cuesta en proporción al delta y no al acumulado del mes o del año.
+
+RUTA_HISTORICO = os.environ.get('AUDITORIA_HISTORICO', os.path.join(DIR_CACHE, 'historico_auditoria.sqlite'))
+
+# Los identificadores de comprobante (ingesta.COLUMNAS_COMPROBANTE), si vienen en el archivo,
+# forman parte de la identidad de la línea
+COLUMNAS_IDENTIDAD_TEXTO = ['Tipo Venta', 'Zona de Venta', 'Solicitante', 'Nombre 1', 'Codigo', 'Material', 'Jerarquia']
+COLUMNAS_IDENTIDAD_NUMERO = ['Almacen', '% Desc', 'Valor neto', 'Cant']
+
+# Columnas guardadas por línea (además de Id_Linea, Codigo_Alerta, Reglas_Incumplidas y Fecha_Ingesta)
+COLUMNAS_HISTORICO = [
+    'Fecha factura', 'Almacen', 'Tipo Venta', 'Zona de Venta', 'Solicitante', 'Nombre 1', 'Codigo',
+    'Material', 'Jerarquia', 'Cant', '% Desc', 'Valor neto',
+    'Precio_Objetivo', 'Precio_Unitario_Neto_Factura', 'Desvío_Precio_Lista',
+]
+
+# Cubo de agregados mensuales: por cada dimensión (y el total) se guarda, por mes, valor de la
+# dimensión y tipo de alerta, la cantidad de líneas y la suma de 'Valor neto'. Se actualiza en
+# la misma transacción que la ingesta, así las tendencias no vuelven a leer líneas.
+DIMENSION_TOTAL = 'Total'
+DIMENSIONES_CUBO = [DIMENSION_TOTAL, 'Solicitante', 'Codigo', 'Jerarquia', 'Almacen']
+SIN_FECHA = 'Sin fecha'
+FILAS_POR_LOTE_CUBO = 200_000
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def identificar_lineas(df_ventas):
+    # Huella int64 por línea sobre valores normalizados (texto, número y fecha), de modo que el
+    # mismo renglón produzca la misma huella aunque el Excel lo tipifique distinto en otro archivo.
+    # Las líneas idénticas dentro de un archivo se distinguen por su número de aparición.
+    claves = {}
+    if 'Fecha factura' in df_ventas.columns:
+        claves['Fecha factura'] = pd.to_datetime(df_ventas['Fecha factura'], errors='coerce')
+    for columna in COLUMNAS_COMPROBANTE + COLUMNAS_IDENTIDAD_TEXTO:
+        if columna in df_ventas.columns:
+            claves[columna] = df_ventas[columna].astype(str)
+    for columna in COLUMNAS_IDENTIDAD_NUMERO:
+        if columna in df_ventas.columns:
+            claves[columna] = pd.to_numeric(df_ventas[columna], errors='coerce').astype(float)
+
+    huellas = pd.util.hash_pandas_object(pd.DataFrame(claves), index=False).to_numpy()
+    aparicion = pd.Series(huellas).groupby(huellas).cumcount().to_numpy()
+    ids = pd.util.hash_pandas_object(pd.DataFrame({'h': huellas, 'n': aparicion}), index=False).to_numpy()
+    return ids.view(np.int64)
+
+
+def _valores_dimension(serie):
+    # Texto estable por valor (1012 y 1012.0 dan '1012'); en numéricas se formatean solo los valores
+    # distintos y en categóricas solo las categorías
+    if pd.api.types.is_numeric_dtype(serie):
+        codigos, valores = pd.factorize(serie)
+        textos = np.array([f'{v:g}' for v in valores] + [''], dtype=object)
+        return pd.Series(textos[codigos], index=serie.index)
+    return serie.astype(str).where(serie.notna(), '')
+
+
+def agregar_cubo(df_audit, codigos_alerta):
+    if 'Fecha factura' in df_audit.columns:
+        mes = df_audit['Fecha factura'].dt.strftime('%Y-%m').fillna(SIN_FECHA)
+    else:
+        mes = pd.Series(SIN_FECHA, index=df_audit.index)
+    base = pd.DataFrame({
+        'Mes': mes.to_numpy(),
+        'Codigo_Alerta': np.asarray(codigos_alerta, dtype=np.int64),
+        'Valor neto': df_audit['Valor neto'].to_numpy(dtype=float),
+    })
+
+    partes = []
+    for dimension in DIMENSIONES_CUBO:
+        if dimension == DIMENSION_TOTAL:
+            base['Valor'] = ''
+        elif dimension in df_audit.columns:
+            base['Valor'] = _valores_dimension(df_audit[dimension]).to_numpy()
+        else:
+            continue
+        agregado = base.groupby(['Mes', 'Valor', 'Codigo_Alerta'], sort=False)['Valor neto'].agg(['size', 'sum']).reset_index()
+        agregado.insert(0, 'Dimension', dimension)
+        partes.append(agregado)
+    return pd.concat(partes, ignore_index=True).rename(columns={'size': 'Lineas', 'sum': 'Valor_Neto'})
+
+
+def _valor_sql(valor):
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NaT:
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class HistoricoAuditoria:
+    def __init__(self, ruta=RUTA_HISTORICO):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            columnas = ', '.join(f'{_q(c)}' for c in COLUMNAS_HISTORICO)
+            conexion.execute(
+                f'CREATE TABLE IF NOT EXISTS lineas (Id_Linea INTEGER PRIMARY KEY, {columnas}, '
+                'Codigo_Alerta INTEGER NOT NULL, Reglas_Incumplidas INTEGER NOT NULL, Fecha_Ingesta TEXT NOT NULL)'
+            )
+            conexion.execute(f'CREATE INDEX IF NOT EXISTS idx_lineas_fecha ON lineas ({_q("Fecha factura")})')
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS cubo (Dimension TEXT NOT NULL, Valor TEXT NOT NULL, Mes TEXT NOT NULL, '
+                'Codigo_Alerta INTEGER NOT NULL, Lineas INTEGER NOT NULL, Valor_Neto REAL NOT NULL, '
+                'PRIMARY KEY (Dimension, Valor, Mes, Codigo_Alerta)) WITHOUT ROWID'
+            )
+            # Históricos creados antes de existir el cubo: se arma una vez a partir de las líneas
+            cubo_vacio = conexion.execute('SELECT 1 FROM cubo LIMIT 1').fetchone() is None
+            hay_lineas = conexion.execute('SELECT 1 FROM lineas LIMIT 1').fetchone() is not None
+        if cubo_vacio and hay_lineas:
+            self.reconstruir_cubo()
+
+    @contextmanager
+    def _conectar(self, escritura=False):
+        # Conexión en modo autocommit; las escrituras abren su propia transacción BEGIN IMMEDIATE,
+        # así la verificación de duplicados y la inserción no se intercalan entre sesiones.
+        conexion = sqlite3.connect(self.ruta, timeout=60, isolation_level=None)
+        try:
+            if escritura:
+                conexion.execute('BEGIN IMMEDIATE')
+            yield conexion
+            if escritura:
+                conexion.execute('COMMIT')
+        except BaseException:
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+            raise
+        finally:
+            conexion.close()
+
+    def _ids_existentes(self, conexion, ids):
+        conexion.execute('CREATE TEMP TABLE IF NOT EXISTS ids_entrantes (Id_Linea INTEGER PRIMARY KEY)')
+        conexion.execute('DELETE FROM ids_entrantes')
+        conexion.executemany('INSERT OR IGNORE INTO ids_entrantes VALUES (?)', ((int(i),) for i in ids))
+        filas = conexion.execute('SELECT e.Id_Linea FROM ids_entrantes e JOIN lineas l ON l.Id_Linea = e.Id_Linea')
+        return np.fromiter((fila[0] for fila in filas), dtype=np.int64)
+
+    def ingerir(self, df_ventas, df_precios):
+        # Incorpora un archivo: deduplica contra el histórico y audita solo las líneas nuevas (el
+        # puntaje de precio atípico sí se calcula contra todas las líneas del archivo)
+        df_ventas = normalizar_columnas_ventas(df_ventas)
+        ids = identificar_lineas(df_ventas)
+
+        with self._conectar(escritura=True) as conexion:
+            es_nueva = ~np.isin(ids, self._ids_existentes(conexion, ids))
+            nuevas = int(es_nueva.sum())
+            if nuevas:
+                puntaje_atipico = calcular_puntaje_atipico(df_ventas)[es_nueva]
+                _, df_audit = ejecutar_auditoria(df_ventas[es_nueva], df_precios, puntaje_atipico=puntaje_atipico)
+                self._insertar(conexion, ids[es_nueva], df_audit)
+                self._acumular_cubo(conexion, agregar_cubo(df_audit, df_audit['Alerta_Descuento'].cat.codes))
+
+        return {'Líneas en el archivo': len(df_ventas), 'Líneas nuevas': nuevas, 'Líneas ya registradas': len(df_ventas) - nuevas}
+
+    def _insertar(self, conexion, ids, df_audit):
+        fecha_ingesta = datetime.now().isoformat(timespec='seconds')
+        valores = [
+            df_audit[c].astype(object).tolist() if c in df_audit.columns else [None] * len(df_audit)
+            for c in COLUMNAS_HISTORICO
+        ]
+        codigos = df_audit['Alerta_Descuento'].cat.codes.tolist()
+        reglas = df_audit['Reglas_Incumplidas'].tolist()
+        filas = (
+            (int(id_linea), *(_valor_sql(v) for v in fila), codigo, regla, fecha_ingesta)
+            for id_linea, codigo, regla, *fila in zip(ids, codigos, reglas, *valores)
+        )
+        columnas = ', '.join(['Id_Linea'] + [_q(c) for c in COLUMNAS_HISTORICO] + ['Codigo_Alerta', 'Reglas_Incumplidas', 'Fecha_Ingesta'])
+        marcadores = ', '.join(['?'] * (len(COLUMNAS_HISTORICO) + 4))
+        conexion.executemany(f'INSERT OR IGNORE INTO lineas ({columnas}) VALUES ({marcadores})', filas)
+
+    def _acumular_cubo(self, conexion, agregado):
+        conexion.executemany(
+            'INSERT INTO cubo (Dimension, Valor, Mes, Codigo_Alerta, Lineas, Valor_Neto) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (Dimension, Valor, Mes, Codigo_Alerta) DO UPDATE SET '
+            'Lineas = Lineas + excluded.Lineas, Valor_Neto = Valor_Neto + excluded.Valor_Neto',
+            agregado[['Dimension', 'Valor', 'Mes', 'Codigo_Alerta', 'Lineas', 'Valor_Neto']].itertuples(index=False, name=None)
+        )
+
+    def reconstruir_cubo(self):
+        # Recalcula el cubo completo leyendo las líneas por lotes
+        columnas = ', '.join(_q(c) for c in ['Fecha factura', 'Valor neto'] + DIMENSIONES_CUBO[1:])
+        with self._conectar(escritura=True) as conexion:
+            conexion.execute('DELETE FROM cubo')
+            lotes = pd.read_sql_query(
+                f'SELECT {columnas}, Codigo_Alerta FROM lineas', conexion, chunksize=FILAS_POR_LOTE_CUBO
+            )
+            for lote in lotes:
+                # SQLite devuelve la fecha como texto ISO: agregar_cubo espera datetime (como leer)
+                lote['Fecha factura'] = pd.to_datetime(lote['Fecha factura'], errors='coerce')
+                self._acumular_cubo(conexion, agregar_cubo(lote, lote['Codigo_Alerta']))
+
+    def estadisticas_atipicos(self):
+        # Medianas de precio atípico de todas las líneas registradas (referencia del servicio de
+        # auditoría), leídas por lotes
+        columnas = ', '.join(_q(c) for c in ['Codigo', 'Solicitante', 'Valor neto', 'Cant'])
+        with self._conectar() as conexion:
+            return estadisticas_atipicos(
+                pd.read_sql_query(f'SELECT {columnas} FROM lineas', conexion, chunksize=FILAS_POR_LOTE_CUBO)
+            )
+
+    def _condicion_meses(self, desde, hasta):
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append('Mes >= ?')
+            parametros.append(desde)
+        if hasta is not None:
+            condiciones.append('Mes <= ?')
+            parametros.append(hasta)
+        return ''.join(' AND ' + c for c in condiciones), parametros
+
+    def meses(self):
+        with self._conectar() as conexion:
+            filas = conexion.execute(
+                'SELECT DISTINCT Mes FROM cubo WHERE Dimension = ? AND Mes != ? ORDER BY Mes', (DIMENSION_TOTAL, SIN_FECHA)
+            ).fetchall()
+        return [fila[0] for fila in filas]
+
+    def tendencia(self, dimension=DIMENSION_TOTAL, valor='', desde=None, hasta=None):
+        # Serie mensual (meses 'AAAA-MM') de un valor de la dimensión, desde el cubo
+        donde, parametros = self._condicion_meses(desde, hasta)
+        with self._conectar() as conexion:
+            df = pd.read_sql_query(
+                f'SELECT Mes, Codigo_Alerta, Lineas, Valor_Neto FROM cubo WHERE Dimension = ? AND Valor = ?{donde}',
+                conexion, params=[dimension, valor] + parametros
+            )
+        lineas = df.pivot_table(index='Mes', columns='Codigo_Alerta', values='Lineas', aggfunc='sum', fill_value=0)
+        lineas = lineas.reindex(columns=range(len(ETIQUETAS_ALERTA)), fill_value=0)
+        lineas.columns = ETIQUETAS_ALERTA
+        es_desvio = df['Codigo_Alerta'] != CODIGO_ALERTA_OK
+
+        mensual = pd.DataFrame(index=lineas.index)
+        mensual['Transacciones Auditadas'] = lineas.sum(axis=1)
+        mensual['Transacciones con Desvío'] = mensual['Transacciones Auditadas'] - lineas[ETIQUETAS_ALERTA[CODIGO_ALERTA_OK]]
+        mensual['Nivel de Cumplimiento (%)'] = (1 - mensual['Transacciones con Desvío'] / mensual['Transacciones Auditadas']) * 100
+        mensual['Valor Neto de Desvíos (Gs.)'] = df[es_desvio].groupby('Mes')['Valor_Neto'].sum().reindex(mensual.index, fill_value=0.0)
+        return mensual.join(lineas).sort_index()
+
+    def ranking(self, dimension, desde=None, hasta=None, limite=20):
+        # Valores de la dimensión con más líneas desviadas en el período
+        donde, parametros = self._condicion_meses(desde, hasta)
+        with self._conectar() as conexion:
+            df = pd.read_sql_query(
+                'SELECT Valor, SUM(Lineas) AS "Transacciones Auditadas", '
+                f'SUM(CASE WHEN Codigo_Alerta != {CODIGO_ALERTA_OK} THEN Lineas ELSE 0 END) AS "Transacciones con Desvío", '
+                f'SUM(CASE WHEN Codigo_Alerta != {CODIGO_ALERTA_OK} THEN Valor_Neto ELSE 0 END) AS "Valor Neto de Desvíos (Gs.)" '
+                f'FROM cubo WHERE Dimension = ?{donde} GROUP BY Valor '
+                'ORDER BY "Transacciones con Desvío" DESC, "Valor Neto de Desvíos (Gs.)" DESC LIMIT ?',
+                conexion, params=[dimension] + parametros + [limite]
+            )
+        df.insert(3, 'Nivel de Cumplimiento (%)', (1 - df['Transacciones con Desvío'] / df['Transacciones Auditadas']) * 100)
+        return df
+
+    def _condicion_fechas(self, desde, hasta):
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append(f'{_q("Fecha factura")} >= ?')
+            parametros.append(pd.Timestamp(desde).isoformat())
+        if hasta is not None:
+            condiciones.append(f'{_q("Fecha factura")} < ?')
+            parametros.append((pd.Timestamp(hasta) + pd.Timedelta(days=1)).isoformat())
+        return (' WHERE ' + ' AND '.join(condiciones)) if condiciones else '', parametros
+
+    def kpis(self, desde=None, hasta=None):
+        # Mismos KPIs que el tablero, calculados en SQLite sin cargar las líneas
+        donde, parametros = self._condicion_fechas(desde, hasta)
+        with self._conectar() as conexion:
+            filas = conexion.execute(
+                f'SELECT Codigo_Alerta, COUNT(*), SUM({_q("Valor neto")}) FROM lineas{donde} GROUP BY Codigo_Alerta',
+                parametros
+            ).fetchall()
+        conteos = np.zeros(len(ETIQUETAS_ALERTA), dtype=np.int64)
+        valor_neto_desviado = 0.0
+        for codigo, cantidad, valor in filas:
+            conteos[codigo] = cantidad
+            if codigo != CODIGO_ALERTA_OK:
+                valor_neto_desviado += valor or 0.0
+        return armar_resumen(int(conteos.sum()), conteos, valor_neto_desviado)
+
+    def leer(self, desde=None, hasta=None, solo_desvios=False):
+        donde, parametros = self._condicion_fechas(desde, hasta)
+        if solo_desvios:
+            donde += (' AND ' if donde else ' WHERE ') + f'Codigo_Alerta != {CODIGO_ALERTA_OK}'
+        with self._conectar() as conexion:
+            df = pd.read_sql_query(f'SELECT * FROM lineas{donde}', conexion, params=parametros)
+        df['Fecha factura'] = pd.to_datetime(df['Fecha factura'], errors='coerce')
+        df['Alerta_Descuento'] = pd.Categorical.from_codes(df.pop('Codigo_Alerta').astype(np.int8), categories=ETIQUETAS_ALERTA)
+        return df
+
+    def rango_fechas(self):
+        with self._conectar() as conexion:
+            minimo, maximo = conexion.execute(
+                f'SELECT MIN({_q("Fecha factura")}), MAX({_q("Fecha factura")}) FROM lineas'
+            ).fetchone()
+        return (pd.Timestamp(minimo), pd.Timestamp(maximo)) if minimo else (None, None)
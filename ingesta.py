@@ -0,0 +1,288 @@
+import csv
+import hashlib
+import os
+import unicodedata
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from esquema import ESQUEMA_FACTURACION, ESQUEMA_LISTADO, alias_columnas, aplicar_esquema, tipos_lectura
+
+# --- CAPA DE INGESTA: LECTURA DEL LIBRO Y CACHÉ COLUMNAR POR HUELLA DE CONTENIDO ---
+
+HOJA_FACTURACION = 'Facturacion'
+HOJA_PRECIOS = 'Listado de Precios'
+# Esquema declarado de cada tabla (ver esquema.py): se aplica una sola vez, al leer
+ESQUEMAS = {HOJA_FACTURACION: ESQUEMA_FACTURACION, HOJA_PRECIOS: ESQUEMA_LISTADO}
+
+# Directorio raíz para los archivos intermedios (Parquet) generados por el tablero
+DIR_CACHE = os.environ.get(
+    'AUDITORIA_DIR_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_auditoria')
+)
+DIR_CACHE_INGESTA = os.path.join(DIR_CACHE, 'ingesta')
+
+# Identificadores de comprobante que, si vienen en la facturación, se conservan al leer
+# (el histórico los usa para identificar cada línea)
+COLUMNAS_COMPROBANTE = ['Factura', 'Nro Factura', 'Documento', 'Posicion', 'Posición']
+
+
+def calcular_huella(contenido):
+    # Huella SHA-256 de los bytes subidos: identifica el archivo sin importar su nombre
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _rutas_cache(huella):
+    carpeta = os.path.join(DIR_CACHE_INGESTA, huella)
+    return (
+        os.path.join(carpeta, 'facturacion.parquet'),
+        os.path.join(carpeta, 'listado_precios.parquet'),
+    )
+
+
+def _leer_cache(huella):
+    ruta_ventas, ruta_precios = _rutas_cache(huella)
+    if not (os.path.exists(ruta_ventas) and os.path.exists(ruta_precios)):
+        return None
+    try:
+        df_ventas, df_precios = pd.read_parquet(ruta_ventas), pd.read_parquet(ruta_precios)
+    except Exception:
+        # Caché corrupta o pyarrow no disponible: se vuelve a leer el Excel
+        return None
+    # Sin costo si la caché ya se escribió tipada; convierte las escritas antes del esquema
+    return aplicar_esquema(df_ventas, ESQUEMA_FACTURACION), aplicar_esquema(df_precios, ESQUEMA_LISTADO)
+
+
+def _guardar_cache(huella, df_ventas, df_precios):
+    ruta_ventas, ruta_precios = _rutas_cache(huella)
+    try:
+        os.makedirs(os.path.dirname(ruta_ventas), exist_ok=True)
+        for df, ruta in ((df_ventas, ruta_ventas), (df_precios, ruta_precios)):
+            # Escritura atómica: nunca queda un Parquet a medio escribir
+            ruta_tmp = f"{ruta}.{os.getpid()}.tmp"
+            df.to_parquet(ruta_tmp, index=False)
+            os.replace(ruta_tmp, ruta)
+    except Exception:
+        # Columnas con tipos mezclados (ej. códigos numéricos y texto) no son
+        # representables en Arrow; en ese caso solo queda la caché en memoria.
+        for ruta in (ruta_ventas, ruta_precios):
+            for residuo in (ruta, f"{ruta}.{os.getpid()}.tmp"):
+                if os.path.exists(residuo):
+                    os.remove(residuo)
+
+
+def _leer_hoja(libro, hoja):
+    # Códigos y textos se leen directamente como str (dtype del lector); luego el esquema
+    # renombra los alias y convierte lo que falte (números con coerce, fechas)
+    df = pd.read_excel(libro, sheet_name=hoja, dtype=tipos_lectura(ESQUEMAS[hoja]))
+    return aplicar_esquema(df, ESQUEMAS[hoja])
+
+
+def leer_cache_libro(huella):
+    # Tablas ya leídas de un archivo (o None si nunca se leyó o la caché no está disponible)
+    return _leer_cache(huella)
+
+
+def leer_libro(contenido, huella=None):
+    # Devuelve (df_ventas, df_precios) leyendo el Excel una sola vez por contenido.
+    # Las lecturas posteriores del mismo archivo salen del Parquet en disco.
+    if huella is None:
+        huella = calcular_huella(contenido)
+
+    tablas = _leer_cache(huella)
+    if tablas is not None:
+        return tablas
+
+    # Un único ExcelFile para ambas hojas: el libro se descomprime y parsea una vez
+    with pd.ExcelFile(BytesIO(contenido)) as libro:
+        df_ventas = _leer_hoja(libro, HOJA_FACTURACION)
+        df_precios = _leer_hoja(libro, HOJA_PRECIOS)
+
+    _guardar_cache(huella, df_ventas, df_precios)
+    return df_ventas, df_precios
+
+
+# --- LECTURA EN STREAMING PARA HOJAS DE FACTURACIÓN MUY GRANDES ---
+# openpyxl en modo read_only recorre la hoja fila por fila sin construir el árbol completo
+# del libro; la memoria pico depende de filas_por_lote y no del tamaño del archivo.
+FILAS_POR_LOTE = 50_000
+
+
+def _origen_excel(origen):
+    # Acepta ruta, bytes o un objeto tipo archivo
+    return BytesIO(origen) if isinstance(origen, (bytes, bytearray)) else origen
+
+
+def leer_precios(origen):
+    return _leer_hoja(_origen_excel(origen), HOJA_PRECIOS)
+
+
+def iterar_facturacion(origen, filas_por_lote=FILAS_POR_LOTE):
+    libro = load_workbook(_origen_excel(origen), read_only=True, data_only=True)
+    try:
+        if HOJA_FACTURACION not in libro.sheetnames:
+            raise ValueError(f"Worksheet named '{HOJA_FACTURACION}' not found")
+        filas = libro[HOJA_FACTURACION].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = [
+            nombre if nombre is not None else f"Unnamed: {i}"
+            for i, nombre in enumerate(encabezado)
+        ]
+
+        lote = []
+        for fila in filas:
+            # Las filas totalmente vacías (formato residual al final de la hoja) se descartan
+            if all(valor is None for valor in fila):
+                continue
+            lote.append(fila)
+            if len(lote) >= filas_por_lote:
+                yield aplicar_esquema(pd.DataFrame(lote, columns=columnas), ESQUEMA_FACTURACION)
+                lote = []
+        if lote:
+            yield aplicar_esquema(pd.DataFrame(lote, columns=columnas), ESQUEMA_FACTURACION)
+    finally:
+        libro.close()
+
+
+# --- LECTURA COLUMNAR: CSV Y PARQUET (PAR DE ARCHIVOS O ZIP) ---
+# Alternativa rápida al Excel: el ERP exporta las mismas tablas como CSV o Parquet. Se leen con
+# pyarrow, con tipos explícitos y solo las columnas que usa la auditoría. Cada archivo se asigna
+# a su tabla por el nombre ('...facturacion...' / '...listado de precios...').
+EXTENSIONES_TABLA = ('.csv', '.parquet', '.pq')
+EXTENSIONES_ENTRADA = ('.xlsx', '.zip') + EXTENSIONES_TABLA
+
+
+def _normalizar_nombre(nombre):
+    base = os.path.splitext(os.path.basename(nombre))[0]
+    return unicodedata.normalize('NFKD', base).encode('ascii', 'ignore').decode().lower()
+
+
+def _tabla_de_archivo(nombre):
+    base = _normalizar_nombre(nombre)
+    if 'factur' in base or 'venta' in base:
+        return HOJA_FACTURACION
+    if 'precio' in base or 'listado' in base:
+        return HOJA_PRECIOS
+    return None
+
+
+def _columnas_tabla(tabla, columnas_archivo):
+    # {columna en el archivo: tipo del esquema} de las columnas que se van a leer
+    esquema = ESQUEMAS[tabla]
+    alias = alias_columnas(esquema)
+    extra = COLUMNAS_COMPROBANTE if tabla == HOJA_FACTURACION else []
+    proyeccion = {}
+    for columna in columnas_archivo:
+        nombre = str(columna).strip()
+        if nombre in alias:
+            proyeccion[columna] = esquema[alias[nombre]][0]
+        elif nombre in extra:
+            proyeccion[columna] = 'texto'
+    return proyeccion
+
+
+def _leer_csv(contenido, tabla):
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    # Separador, codificación y encabezado a partir de la primera línea
+    primera_linea = contenido[:contenido.find(b'\n') if b'\n' in contenido else len(contenido)]
+    try:
+        encabezado = primera_linea.decode('utf-8-sig')
+        codificacion = 'utf8'
+    except UnicodeDecodeError:
+        encabezado = primera_linea.decode('latin-1')
+        codificacion = 'latin-1'
+    separador = max(',;\t|', key=encabezado.count)
+    columnas = next(csv.reader([encabezado.rstrip('\r')], delimiter=separador))
+    proyeccion = _columnas_tabla(tabla, columnas)
+
+    def leer(tipos_arrow):
+        return pv.read_csv(
+            BytesIO(contenido),
+            read_options=pv.ReadOptions(encoding=codificacion),
+            parse_options=pv.ParseOptions(delimiter=separador),
+            convert_options=pv.ConvertOptions(include_columns=list(proyeccion), column_types=tipos_arrow),
+        ).to_pandas()
+
+    # Textos (incluidos códigos: se conservan ceros a la izquierda) y fechas como string; números como float64
+    tipos = {c: pa.float64() if tipo in ('numero', 'entero') else pa.string() for c, tipo in proyeccion.items()}
+    try:
+        df = leer(tipos)
+    except pa.ArrowInvalid:
+        # Algún valor no numérico en una columna numérica: se lee como texto y el esquema lo convierte con coerce
+        df = leer({c: pa.string() for c in proyeccion})
+    return aplicar_esquema(df, ESQUEMAS[tabla])
+
+
+def _leer_parquet(contenido, tabla):
+    import pyarrow.parquet as pq
+
+    origen = BytesIO(contenido)
+    proyeccion = _columnas_tabla(tabla, pq.ParquetFile(origen).schema_arrow.names)
+    origen.seek(0)
+    # Proyección de columnas: el resto del archivo no se descomprime
+    df = pd.read_parquet(origen, columns=list(proyeccion), engine='pyarrow')
+    return aplicar_esquema(df, ESQUEMAS[tabla])
+
+
+def leer_tabla(nombre, contenido, tabla):
+    if nombre.lower().endswith('.csv'):
+        return _leer_csv(contenido, tabla)
+    return _leer_parquet(contenido, tabla)
+
+
+def _archivos_de_zip(contenido):
+    with zipfile.ZipFile(BytesIO(contenido)) as zf:
+        return [
+            (info.filename, zf.read(info))
+            for info in zf.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(EXTENSIONES_TABLA)
+            and not os.path.basename(info.filename).startswith(('.', '__'))
+        ]
+
+
+def huella_archivos(archivos):
+    # archivos: lista de (nombre, contenido). Un solo archivo conserva la huella de su contenido;
+    # un par se identifica por ambas huellas, sin importar el orden en que se suban.
+    if len(archivos) == 1:
+        return calcular_huella(archivos[0][1])
+    huellas = sorted(calcular_huella(contenido) for _, contenido in archivos)
+    return calcular_huella(''.join(huellas).encode())
+
+
+def leer_archivos(archivos, huella=None):
+    # Punto de entrada general: un libro .xlsx, un .zip con las dos tablas o el par de archivos
+    # CSV/Parquet. Devuelve (df_ventas, df_precios) con la misma caché Parquet que leer_libro.
+    if huella is None:
+        huella = huella_archivos(archivos)
+    if len(archivos) == 1 and archivos[0][0].lower().endswith('.xlsx'):
+        return leer_libro(archivos[0][1], huella)
+
+    tablas = _leer_cache(huella)
+    if tablas is not None:
+        return tablas
+
+    if len(archivos) == 1 and archivos[0][0].lower().endswith('.zip'):
+        archivos = _archivos_de_zip(archivos[0][1])
+
+    por_tabla = {}
+    for nombre, contenido in archivos:
+        tabla = _tabla_de_archivo(nombre)
+        if tabla is None or not nombre.lower().endswith(EXTENSIONES_TABLA):
+            raise ValueError(f"No se reconoce la tabla del archivo '{nombre}'.")
+        if tabla in por_tabla:
+            raise ValueError(f"Hay más de un archivo para la tabla '{tabla}'.")
+        por_tabla[tabla] = (nombre, contenido)
+    faltantes = [t for t in (HOJA_FACTURACION, HOJA_PRECIOS) if t not in por_tabla]
+    if faltantes:
+        raise ValueError(f"Falta la tabla '{faltantes[0]}'.")
+
+    df_ventas = leer_tabla(*por_tabla[HOJA_FACTURACION], HOJA_FACTURACION)
+    df_precios = leer_tabla(*por_tabla[HOJA_PRECIOS], HOJA_PRECIOS)
+    _guardar_cache(huella, df_ventas, df_precios)
+    return df_ventas, df_precios
@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- INSTRUMENTACIÓN DE ETAPAS (TIEMPO, FILAS Y MEMORIA) ---
+# Cada rerun del tablero registra cuánto tardó cada etapa, cuántas filas procesó, cuánto varió
+# la memoria del proceso y si las cachés acertaron. Además de mostrarse en el tablero, cada
+# medición se emite como una línea JSON en el logger 'tablero.rendimiento' para agregarlas
+# entre sesiones (p. ej. con jq o cargándolas en un DataFrame).
+
+LOGGER = logging.getLogger('tablero.rendimiento')
+if not LOGGER.handlers:
+    _manejador = logging.StreamHandler(sys.stderr)
+    _manejador.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(_manejador)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+
+def memoria_proceso_mb():
+    # Memoria residente actual del proceso. Es del proceso completo: con varias sesiones
+    # simultáneas el delta de una etapa puede incluir asignaciones de otra sesión.
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    # Fuera de Linux solo está disponible el pico (ru_maxrss: bytes en macOS, KB en el resto)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1e6 if sys.platform == 'darwin' else pico / 1e3
+
+
+class RegistroRendimiento:
+    def __init__(self, sesion=None, ejecucion=None):
+        self.sesion = sesion
+        self.ejecucion = ejecucion
+        self.etapas = []
+        self.caches = {}
+
+    def _emitir(self, evento, **datos):
+        LOGGER.info(json.dumps({'evento': evento, 'sesion': self.sesion, 'ejecucion': self.ejecucion, **datos}, ensure_ascii=False))
+
+    @contextmanager
+    def etapa(self, nombre, filas=None):
+        # La medición es un dict: el bloque puede completar 'filas' si recién las conoce al final
+        medicion = {'Etapa': nombre, 'Filas': filas}
+        memoria_inicial = memoria_proceso_mb()
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            medicion['Segundos'] = round(time.perf_counter() - inicio, 4)
+            medicion['Δ Memoria (MB)'] = round(memoria_proceso_mb() - memoria_inicial, 1)
+            self.etapas.append(medicion)
+            self._emitir(
+                'etapa', etapa=nombre, filas=medicion['Filas'], segundos=medicion['Segundos'],
+                delta_memoria_mb=medicion['Δ Memoria (MB)']
+            )
+
+    def cache(self, nombre, acierto):
+        self.caches[nombre] = acierto
+        self._emitir('cache', cache=nombre, acierto=acierto)
+
+    def tabla(self):
+        tabla = pd.DataFrame(self.etapas, columns=['Etapa', 'Filas', 'Segundos', 'Δ Memoria (MB)'])
+        return tabla.astype({'Filas': 'Int64'})
+
+    def cerrar(self, **extra):
+        # Resumen del rerun completo (una línea por ejecución del script)
+        self._emitir(
+            'ejecucion', segundos=round(sum(e['Segundos'] for e in self.etapas), 4),
+            memoria_mb=round(memoria_proceso_mb(), 1), caches=self.caches, **extra
+        )
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from auditoria import CODIGO_ALERTA_OK, calcular_puntaje_atipico, ejecutar_auditoria, etapa_opcional
+from catalogo import CatalogoPrecios, obtener_catalogo
+
+# --- AUDITORÍA EN PARALELO POR FRAGMENTOS DE FILAS ---
+# Para archivos grandes, la facturación se divide en fragmentos contiguos que se auditan en un
+# pool de procesos contra el mismo catálogo de precios (de solo lectura, entregado una vez a cada
+# proceso). Los fragmentos se vuelven a unir en el orden original; el resultado es idéntico al de
+# ejecutar_auditoria. Por debajo del umbral se audita en el proceso actual. El puntaje de precio
+# atípico compara cada línea con todo el archivo: se calcula antes de fragmentar.
+
+UMBRAL_PARALELO = int(os.environ.get('AUDITORIA_UMBRAL_PARALELO', 400_000))
+PROCESOS = int(os.environ.get('AUDITORIA_PROCESOS', 0)) or os.cpu_count() or 1
+MIN_FILAS_POR_FRAGMENTO = 50_000
+# Con seguimiento de avance, la auditoría en un solo proceso también se hace por fragmentos de
+# este tamaño para informar las filas auditadas y los KPIs parciales a medida que avanza
+FILAS_POR_AVANCE = 100_000
+
+# Estado de cada proceso del pool (lo completa el inicializador)
+_TRABAJO = {}
+
+
+def _iniciar_trabajador(df_ventas, catalogo, puntaje_atipico):
+    # Con 'fork' los argumentos se heredan sin serializar; con 'spawn' se envían una vez por proceso
+    _TRABAJO['ventas'] = df_ventas
+    _TRABAJO['catalogo'] = catalogo
+    _TRABAJO['puntaje_atipico'] = puntaje_atipico
+
+
+def _auditar_fragmento(inicio, fin):
+    _, df_audit = ejecutar_auditoria(
+        _TRABAJO['ventas'].iloc[inicio:fin], _TRABAJO['catalogo'], puntaje_atipico=_TRABAJO['puntaje_atipico'][inicio:fin]
+    )
+    return df_audit
+
+
+def combinar_fragmentos(fragmentos):
+    # Cada fragmento trae sus propias categorías: se unen ordenadas, igual que las que produce
+    # astype('category') sobre el archivo completo. Las de categorías fijas (Alerta_Descuento) se
+    # concatenan tal cual.
+    columnas = {}
+    for columna in fragmentos[0].columns:
+        partes = [fragmento[columna] for fragmento in fragmentos]
+        tipos = {parte.dtype for parte in partes}
+        if isinstance(partes[0].dtype, pd.CategoricalDtype) and len(tipos) > 1:
+            columnas[columna] = pd.Series(union_categoricals(partes, sort_categories=True), copy=False)
+        else:
+            columnas[columna] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(columnas)
+
+
+def limites_fragmentos(filas, procesos):
+    cantidad = max(1, min(procesos, filas // MIN_FILAS_POR_FRAGMENTO))
+    limites = np.linspace(0, filas, cantidad + 1).astype(int)
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def _auditar_en_serie(df_ventas, catalogo, puntaje_atipico, progreso):
+    # Un solo proceso, fragmento a fragmento, informando cada uno a medida que termina
+    cantidad = -(-len(df_ventas) // FILAS_POR_AVANCE)
+    resultados = []
+    for inicio, fin in limites_fragmentos(len(df_ventas), cantidad):
+        _, df_audit = ejecutar_auditoria(df_ventas.iloc[inicio:fin], catalogo, puntaje_atipico=puntaje_atipico[inicio:fin])
+        progreso(df_audit)
+        resultados.append(df_audit)
+    return resultados
+
+
+def auditar_en_paralelo(df_ventas, df_precios, procesos=None, umbral=None, registro=None, progreso=None, puntaje_atipico=None):
+    # Misma salida que ejecutar_auditoria: (desvios_encontrados, df_audit). progreso, si se indica,
+    # recibe cada fragmento auditado (en el orden en que terminan) para informar el avance.
+    # puntaje_atipico: puntaje ya calculado contra otra referencia (ver auditoria.calcular_puntaje_atipico).
+    procesos = procesos or PROCESOS
+    umbral = UMBRAL_PARALELO if umbral is None else umbral
+    fragmentos = limites_fragmentos(len(df_ventas), procesos)
+    if procesos <= 1 or len(df_ventas) < umbral or len(fragmentos) == 1:
+        if progreso is None or len(df_ventas) <= FILAS_POR_AVANCE:
+            resultado = ejecutar_auditoria(df_ventas, df_precios, registro, puntaje_atipico)
+            if progreso is not None:
+                progreso(resultado[1])
+            return resultado
+        fragmentos = None
+
+    catalogo = df_precios if isinstance(df_precios, CatalogoPrecios) else obtener_catalogo(df_precios)
+    if puntaje_atipico is None:
+        with etapa_opcional(registro, 'auditoria.atipicos', len(df_ventas)):
+            puntaje_atipico = calcular_puntaje_atipico(df_ventas)
+    with etapa_opcional(registro, 'auditoria.fragmentos', len(df_ventas)):
+        if fragmentos is None:
+            resultados = _auditar_en_serie(df_ventas, catalogo, puntaje_atipico, progreso)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=len(fragmentos), initializer=_iniciar_trabajador, initargs=(df_ventas, catalogo, puntaje_atipico)
+            ) as pool:
+                futuros = {pool.submit(_auditar_fragmento, inicio, fin): i for i, (inicio, fin) in enumerate(fragmentos)}
+                resultados = [None] * len(fragmentos)
+                for futuro in as_completed(futuros):
+                    resultados[futuros[futuro]] = futuro.result()
+                    if progreso is not None:
+                        progreso(resultados[futuros[futuro]])
+
+    with etapa_opcional(registro, 'auditoria.combinacion', len(df_ventas)):
+        df_audit = combinar_fragmentos(resultados)
+    desvios_encontrados = df_audit[df_audit['Alerta_Descuento'].cat.codes.to_numpy() != CODIGO_ALERTA_OK]
+    return desvios_encontrados, df_audit
@@ -0,0 +1,80 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+# --- MOTOR DE REGLAS DECLARATIVO ---
+# Cada regla es un dict con su etiqueta y una lista de condiciones (columna, operador, valor)
+# que deben cumplirse todas. Las condiciones repetidas entre reglas se evalúan una sola vez.
+# El resultado es una máscara de bits por fila (bit i = regla i incumplida); la etiqueta
+# prioritaria es la de la primera regla incumplida, igual que np.select. El código de alerta de
+# la regla i es i, o el 'codigo' de la regla si lo indica.
+
+OPERADORES = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+MAX_REGLAS = 16  # Bits disponibles en la máscara uint16
+
+
+def _clave_condicion(columna, operador, valor):
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        valor = tuple(sorted(valor))
+    return columna, operador, valor
+
+
+def pertenencia(serie, valores):
+    # En columnas categóricas se evalúa sobre las categorías y se expande con los códigos
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        en_categorias = np.append(serie.cat.categories.isin(valores), False)
+        return en_categorias[serie.cat.codes.to_numpy()]
+    return serie.isin(valores).to_numpy()
+
+
+def _evaluar_condicion(df, columna, operador, valor):
+    serie = df[columna]
+    if operador == 'en':
+        return pertenencia(serie, valor)
+    if operador == '==' and isinstance(serie.dtype, pd.CategoricalDtype):
+        return pertenencia(serie, [valor])
+    # Las comparaciones con NaN dan False, igual que en las condiciones originales
+    return np.asarray(OPERADORES[operador](serie, valor), dtype=bool)
+
+
+def evaluar_reglas(df, reglas, codigo_ok=None, condiciones_evaluadas=None):
+    # Devuelve (bits uint16, código de la regla prioritaria int8, conteo por regla).
+    # condiciones_evaluadas: caché {condición: máscara} que se completa y puede reutilizarse
+    # entre llamadas sobre las mismas filas (p. ej. al simular otros umbrales)
+    if len(reglas) > MAX_REGLAS:
+        raise ValueError(f"El motor admite hasta {MAX_REGLAS} reglas; se recibieron {len(reglas)}.")
+    if codigo_ok is None:
+        codigo_ok = len(reglas)
+
+    if condiciones_evaluadas is None:
+        condiciones_evaluadas = {}
+    bits = np.zeros(len(df), dtype=np.uint16)
+    codigos = np.full(len(df), codigo_ok, dtype=np.int8)
+    conteos = np.zeros(len(reglas), dtype=np.int64)
+
+    # Se recorre de la última a la primera regla: la de mayor prioridad pisa el código
+    for indice in range(len(reglas) - 1, -1, -1):
+        regla = reglas[indice]
+        mascara = np.ones(len(df), dtype=bool)
+        for columna, operador, valor in regla['condiciones']:
+            clave = _clave_condicion(columna, operador, valor)
+            if clave not in condiciones_evaluadas:
+                condiciones_evaluadas[clave] = _evaluar_condicion(df, columna, operador, valor)
+            mascara &= condiciones_evaluadas[clave]
+        bits[mascara] |= np.uint16(1 << indice)
+        codigos[mascara] = regla.get('codigo', indice)
+        conteos[indice] = np.count_nonzero(mascara)
+
+    return bits, codigos, conteos
+
+
+def contar_por_regla(bits, cantidad_reglas):
+    return np.array([np.count_nonzero(bits & (1 << i)) for i in range(cantidad_reglas)], dtype=np.int64)
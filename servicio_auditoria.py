@@ -0,0 +1,464 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from auditoria import CODIGO_ALERTA_OK, calcular_puntaje_atipico, estadisticas_atipicos, resumir_auditoria
+from catalogo import CatalogoPrecios
+from esquema import ESQUEMA_FACTURACION, ESQUEMA_LISTADO, aplicar_esquema
+from historial_precios import RUTA_HISTORIAL_PRECIOS, HistorialPrecios
+from historico import RUTA_HISTORICO, HistoricoAuditoria
+from ingesta import COLUMNAS_COMPROBANTE, HOJA_FACTURACION, HOJA_PRECIOS, iterar_facturacion, leer_precios, leer_tabla
+from instrumentacion import LOGGER
+from paralelo import auditar_en_paralelo
+
+# --- SERVICIO HTTP LOCAL DE AUDITORÍA (INTEGRACIÓN CON EL ERP) ---
+# Proceso de larga duración que audita lotes de facturación antes de contabilizarlos. La lista de
+# precios se preindexa una vez (catalogo.CatalogoPrecios) y queda residente: cada lote solo paga
+# su propia auditoría. Junto a ella quedan residentes las medianas de precio atípico por producto
+# y cliente (atipicos.EstadisticasAtipicos) del histórico de auditorías o de un archivo de
+# facturación de referencia: cada línea se compara con esas medianas y no solo con su lote, así
+# una factura de una sola línea también puede marcarse como atípica. Solo biblioteca estándar
+# (http.server), sin servicios externos.
+#
+#   python servicio_auditoria.py (--precios RUTA | --historial-precios [RUTA]) [--referencia-atipicos RUTA]
+#                                [--host H] [--puerto P] [--concurrencia N]
+#
+#   POST /auditar   lote en JSON (lista de líneas o {"lineas": [...]}), CSV o Parquet. El formato
+#                   sale de ?formato=json|csv|parquet o del Content-Type. Con ?solo_desvios=1 la
+#                   respuesta trae solo las líneas con alerta. Devuelve el resumen de KPIs y la
+#                   alerta de cada línea ('Linea' = posición en el lote).
+#   PUT  /precios   reemplaza la lista de precios residente (mismos formatos, columnas del
+#                   'Listado de Precios'); los lotes en curso terminan con la lista anterior.
+#   PUT  /referencia-atipicos  reemplaza las medianas de precio atípico con las de una tabla de
+#                   facturación (mismos formatos que /auditar).
+#   GET  /metricas  lotes, líneas, rendimiento (líneas/s) y latencias (p50/p90/p99) recientes.
+#   GET  /salud     estado y lista de precios cargada.
+#
+# Cada lote se audita en el hilo de su conexión (ThreadingHTTPServer), con un tope de
+# AUDITORIA_SERVICIO_CONCURRENCIA auditorías simultáneas; los demás lotes esperan su turno y, si
+# ya esperan más de AUDITORIA_SERVICIO_MAX_ESPERA, se responde 503 en lugar de acumular latencia.
+# Sin lista de precios cargada se responde 409 (es un error de configuración, no de carga). Los
+# lotes de más de paralelo.UMBRAL_PARALELO líneas se reparten en procesos como en el resto de la
+# aplicación. Sin referencia de precios atípicos (histórico vacío), cada lote se compara consigo mismo.
+
+HOST_SERVICIO = os.environ.get('AUDITORIA_SERVICIO_HOST', '127.0.0.1')
+PUERTO_SERVICIO = int(os.environ.get('AUDITORIA_SERVICIO_PUERTO', 8765))
+MAX_AUDITORIAS_SIMULTANEAS = int(os.environ.get('AUDITORIA_SERVICIO_CONCURRENCIA', 0)) or os.cpu_count() or 1
+MAX_LOTES_EN_ESPERA = int(os.environ.get('AUDITORIA_SERVICIO_MAX_ESPERA', 32))
+MAX_MB_LOTE = float(os.environ.get('AUDITORIA_SERVICIO_MAX_MB', 256))
+# Lotes recientes sobre los que se calculan percentiles de latencia y el rendimiento por minuto
+MUESTRAS_METRICAS = 4096
+VENTANA_RENDIMIENTO_SEGUNDOS = 60
+
+# Columnas que necesitan las reglas y el precio objetivo; el resto del esquema es opcional
+COLUMNAS_LOTE_OBLIGATORIAS = ['Almacen', 'Zona de Venta', 'Solicitante', 'Codigo', 'Jerarquia', '% Desc', 'Valor neto', 'Cant']
+COLUMNAS_RESPUESTA = [
+    'Codigo', 'Alerta_Descuento', 'Codigo_Alerta', 'Reglas_Incumplidas', 'Precio_Objetivo',
+    'Precio_Unitario_Neto_Factura', 'Desvío_Precio_Lista', 'Puntaje_Atipico',
+]
+FORMATOS_LOTE = {
+    'application/json': 'json',
+    'text/csv': 'csv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/octet-stream': 'parquet',
+}
+
+
+class ServicioOcupado(Exception):
+    pass
+
+
+class SinListaPrecios(Exception):
+    pass
+
+
+def formato_lote(tipo_contenido, formato=None):
+    formato = formato or FORMATOS_LOTE.get((tipo_contenido or '').split(';')[0].strip().lower())
+    if formato not in ('json', 'csv', 'parquet'):
+        raise ValueError("Indique el formato del lote (?formato=json|csv|parquet o Content-Type).")
+    return formato
+
+
+def leer_tabla_lote(contenido, formato, tabla):
+    # DataFrame con el esquema de la tabla aplicado (nombres canónicos y tipos)
+    if formato in ('csv', 'parquet'):
+        return leer_tabla(f'lote.{formato}', contenido, tabla)
+    datos = json.loads(contenido)
+    if isinstance(datos, dict) and 'lineas' in datos:
+        datos = datos['lineas']
+    if not isinstance(datos, (list, dict)):
+        raise ValueError("El JSON debe ser una lista de líneas, {'lineas': [...]} o un objeto de columnas.")
+    return aplicar_esquema(pd.DataFrame(datos), ESQUEMA_FACTURACION if tabla == HOJA_FACTURACION else ESQUEMA_LISTADO)
+
+
+def leer_lote(contenido, formato):
+    df_ventas = leer_tabla_lote(contenido, formato, HOJA_FACTURACION)
+    if df_ventas.empty:
+        raise ValueError("El lote no tiene líneas.")
+    faltantes = [columna for columna in COLUMNAS_LOTE_OBLIGATORIAS if columna not in df_ventas.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el lote: {', '.join(faltantes)}.")
+    return df_ventas
+
+
+def respuesta_lote(df_audit, solo_desvios=False):
+    # Una fila por línea auditada con su posición en el lote y los identificadores de comprobante
+    # que haya enviado el ERP. Se serializa con to_json (sin armar un dict por línea).
+    codigos = df_audit['Alerta_Descuento'].cat.codes.to_numpy()
+    lineas = pd.DataFrame({'Linea': np.arange(len(df_audit))})
+    for columna in [c for c in COLUMNAS_COMPROBANTE if c in df_audit.columns]:
+        lineas[columna] = df_audit[columna].to_numpy()
+    for columna in COLUMNAS_RESPUESTA:
+        lineas[columna] = codigos if columna == 'Codigo_Alerta' else df_audit[columna].to_numpy()
+    if solo_desvios:
+        lineas = lineas[codigos != CODIGO_ALERTA_OK]
+    return lineas.to_json(orient='records', force_ascii=False)
+
+
+def _cargar_catalogo(df_precios):
+    df_precios = aplicar_esquema(df_precios, ESQUEMA_LISTADO)
+    if 'Codigo' not in df_precios.columns:
+        raise ValueError("La lista de precios no tiene la columna 'Codigo'.")
+    catalogo = CatalogoPrecios.desde_listado(df_precios)
+    if len(catalogo) == 0:
+        raise ValueError("La lista de precios no tiene códigos.")
+    return catalogo
+
+
+class MetricasServicio:
+    def __init__(self, muestras=MUESTRAS_METRICAS):
+        self.inicio = time.monotonic()
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(
+            ['lotes', 'lotes_con_error', 'lotes_rechazados', 'lotes_sin_precios', 'cargas_con_error', 'lineas',
+             'lineas_con_desvio'], 0
+        )
+        self._en_curso = 0
+        # (momento de fin, líneas, segundos totales, segundos en cola) de los últimos lotes
+        self._lotes = deque(maxlen=muestras)
+
+    def entrar(self):
+        with self._lock:
+            self._en_curso += 1
+
+    def salir(self):
+        with self._lock:
+            self._en_curso -= 1
+
+    def registrar_lote(self, lineas, con_desvio, segundos, espera):
+        with self._lock:
+            self._contadores['lotes'] += 1
+            self._contadores['lineas'] += lineas
+            self._contadores['lineas_con_desvio'] += con_desvio
+            self._lotes.append((time.monotonic(), lineas, segundos, espera))
+
+    def registrar_error(self, contador='lotes_con_error'):
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def instantanea(self):
+        with self._lock:
+            contadores, en_curso, lotes = dict(self._contadores), self._en_curso, list(self._lotes)
+        ahora = time.monotonic()
+        activo = ahora - self.inicio
+        metricas = {
+            'segundos_activo': round(activo, 1),
+            'lotes_en_curso': en_curso,
+            **contadores,
+            'lineas_por_segundo': round(contadores['lineas'] / activo, 1) if activo > 0 else None,
+        }
+        recientes = [lote for lote in lotes if ahora - lote[0] <= VENTANA_RENDIMIENTO_SEGUNDOS]
+        metricas['lineas_por_segundo_ultimo_minuto'] = round(sum(lote[1] for lote in recientes) / VENTANA_RENDIMIENTO_SEGUNDOS, 1)
+        if lotes:
+            _, lineas, segundos, espera = (np.array(columna) for columna in zip(*lotes))
+            p50, p90, p99 = np.percentile(segundos, [50, 90, 99]) * 1000
+            metricas['latencia_ms'] = {
+                'muestras': len(lotes), 'p50': round(p50, 1), 'p90': round(p90, 1), 'p99': round(p99, 1),
+                'max': round(segundos.max() * 1000, 1), 'espera_en_cola_p50': round(np.percentile(espera, 50) * 1000, 1),
+            }
+            metricas['lineas_por_lote_promedio'] = round(float(lineas.mean()), 1)
+        return metricas
+
+
+def referencia_de_archivo(ruta):
+    # Medianas de precio atípico de un histórico (.sqlite) o de una tabla de facturación
+    # (.xlsx en streaming, CSV o Parquet)
+    if ruta.lower().endswith(('.sqlite', '.db')):
+        return HistoricoAuditoria(ruta).estadisticas_atipicos()
+    if ruta.lower().endswith('.xlsx'):
+        return estadisticas_atipicos(iterar_facturacion(ruta))
+    with open(ruta, 'rb') as archivo:
+        return estadisticas_atipicos([leer_tabla(os.path.basename(ruta), archivo.read(), HOJA_FACTURACION)])
+
+
+class ServicioAuditoria:
+    def __init__(self, catalogo=None, origen_catalogo=None, concurrencia=MAX_AUDITORIAS_SIMULTANEAS,
+                 max_en_espera=MAX_LOTES_EN_ESPERA, estadisticas=None, origen_estadisticas=None):
+        self.concurrencia = concurrencia
+        self.metricas = MetricasServicio()
+        # Cupos de admisión (lotes auditándose más lotes en espera) y tope de auditorías simultáneas
+        self._cupos = threading.BoundedSemaphore(concurrencia + max_en_espera)
+        self._auditando = threading.BoundedSemaphore(concurrencia)
+        self._catalogo = None
+        self._info_catalogo = None
+        self._estadisticas = None
+        self._info_estadisticas = None
+        if catalogo is not None:
+            self.reemplazar_catalogo(catalogo, origen_catalogo)
+        if estadisticas is not None:
+            self.reemplazar_estadisticas(estadisticas, origen_estadisticas)
+
+    def reemplazar_catalogo(self, catalogo, origen=None):
+        # Cambio atómico de referencia: cada lote toma el catálogo vigente al empezar
+        info = {
+            'origen': origen,
+            'codigos': int(len(catalogo.claves)),
+            'versiones': int(len(catalogo)),
+            'con_vigencia': catalogo.con_vigencia,
+            'cargado': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._catalogo, self._info_catalogo = catalogo, info
+        return info
+
+    def info_catalogo(self):
+        return self._info_catalogo
+
+    def reemplazar_estadisticas(self, estadisticas, origen=None):
+        if len(estadisticas) == 0:
+            raise ValueError("La referencia de precios atípicos no tiene líneas con precio.")
+        # Los índices por clave se arman ahora y no en el primer lote
+        estadisticas.puntaje(pd.Series([], dtype=str), pd.Series([], dtype=str), [], [], [])
+        info = {
+            'origen': origen,
+            'productos': len(estadisticas),
+            'cargado': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._estadisticas, self._info_estadisticas = estadisticas, info
+        return info
+
+    def info_estadisticas(self):
+        return self._info_estadisticas
+
+    def auditar(self, contenido, formato, solo_desvios=False):
+        # Devuelve el cuerpo JSON (bytes) de la respuesta. SinListaPrecios si todavía no se cargó
+        # una lista de precios y ServicioOcupado si no hay cupo.
+        if self._catalogo is None:
+            raise SinListaPrecios("No hay una lista de precios cargada (PUT /precios).")
+        if not self._cupos.acquire(blocking=False):
+            raise ServicioOcupado("Demasiados lotes en espera; reintente en unos segundos.")
+        try:
+            encolado = time.perf_counter()
+            with self._auditando:
+                return self._auditar_lote(contenido, formato, solo_desvios, encolado)
+        finally:
+            self._cupos.release()
+
+    def _auditar_lote(self, contenido, formato, solo_desvios, encolado):
+        inicio = time.perf_counter()
+        catalogo, estadisticas = self._catalogo, self._estadisticas
+        self.metricas.entrar()
+        try:
+            df_ventas = leer_lote(contenido, formato)
+            puntaje_atipico = None if estadisticas is None else calcular_puntaje_atipico(df_ventas, estadisticas)
+            _, df_audit = auditar_en_paralelo(df_ventas, catalogo, puntaje_atipico=puntaje_atipico)
+            resumen = resumir_auditoria(df_audit)
+            lineas = respuesta_lote(df_audit, solo_desvios)
+        finally:
+            self.metricas.salir()
+        fin = time.perf_counter()
+        segundos = {'espera': round(inicio - encolado, 4), 'auditoria': round(fin - inicio, 4)}
+        self.metricas.registrar_lote(len(df_audit), resumen['Transacciones con Desvío'], fin - encolado, inicio - encolado)
+        LOGGER.info(json.dumps({'evento': 'lote_servicio', 'filas': len(df_audit), **segundos}, ensure_ascii=False))
+        cuerpo = f'{{"resumen": {json.dumps(resumen, ensure_ascii=False)}, "segundos": {json.dumps(segundos)}, "lineas": {lineas}}}'
+        return cuerpo.encode('utf-8')
+
+
+class ManejadorAuditoria(BaseHTTPRequestHandler):
+    server_version = 'ServicioAuditoria/1.0'
+    # Conexiones persistentes: el ERP puede enviar varios lotes por la misma conexión
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def servicio(self):
+        return self.server.servicio
+
+    def log_message(self, formato, *args):
+        # Cada lote ya se registra como línea JSON en instrumentacion.LOGGER
+        pass
+
+    def _responder(self, estado, cuerpo, encabezados=None):
+        if not isinstance(cuerpo, bytes):
+            cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _error(self, estado, mensaje, encabezados=None):
+        self._responder(estado, {'error': mensaje}, encabezados)
+
+    def _leer_cuerpo(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        if largo > MAX_MB_LOTE * 1e6:
+            # No se lee el cuerpo: la conexión se cierra después de responder
+            self.close_connection = True
+            return None
+        return self.rfile.read(largo)
+
+    def do_GET(self):
+        ruta = urlparse(self.path).path
+        if ruta == '/metricas':
+            self._responder(HTTPStatus.OK, {
+                **self.servicio.metricas.instantanea(), 'catalogo': self.servicio.info_catalogo(),
+                'referencia_atipicos': self.servicio.info_estadisticas(),
+            })
+        elif ruta == '/salud':
+            catalogo = self.servicio.info_catalogo()
+            self._responder(HTTPStatus.OK, {
+                'estado': 'ok' if catalogo else 'sin_precios', 'concurrencia': self.servicio.concurrencia,
+                'catalogo': catalogo,
+                'referencia_atipicos': self.servicio.info_estadisticas(),
+            })
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {ruta}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/auditar':
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {url.path}")
+            return
+        contenido = self._leer_cuerpo()
+        if contenido is None:
+            self.servicio.metricas.registrar_error('lotes_rechazados')
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"El lote supera {MAX_MB_LOTE:g} MB.")
+            return
+        parametros = parse_qs(url.query)
+        try:
+            formato = formato_lote(self.headers.get('Content-Type'), parametros.get('formato', [None])[0])
+            solo_desvios = parametros.get('solo_desvios', ['0'])[0] in ('1', 'true', 'si', 'sí')
+            cuerpo = self.servicio.auditar(contenido, formato, solo_desvios)
+        except ServicioOcupado as e:
+            self.servicio.metricas.registrar_error('lotes_rechazados')
+            self._error(HTTPStatus.SERVICE_UNAVAILABLE, str(e), {'Retry-After': '1'})
+        except SinListaPrecios as e:
+            # Sin Retry-After: reintentar no sirve hasta que se cargue una lista de precios
+            self.servicio.metricas.registrar_error('lotes_sin_precios')
+            self._error(HTTPStatus.CONFLICT, str(e))
+        except (ValueError, KeyError) as e:
+            # Lote mal formado (JSON inválido, columnas faltantes, valores no convertibles)
+            self.servicio.metricas.registrar_error()
+            self._error(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            self.servicio.metricas.registrar_error()
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+        else:
+            self._responder(HTTPStatus.OK, cuerpo)
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        if url.path not in ('/precios', '/referencia-atipicos'):
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {url.path}")
+            return
+        contenido = self._leer_cuerpo()
+        if contenido is None:
+            self.servicio.metricas.registrar_error('cargas_con_error')
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"La tabla supera {MAX_MB_LOTE:g} MB.")
+            return
+        try:
+            formato = formato_lote(self.headers.get('Content-Type'), parse_qs(url.query).get('formato', [None])[0])
+            origen = f'PUT {url.path} ({formato})'
+            if url.path == '/precios':
+                info = self.servicio.reemplazar_catalogo(_cargar_catalogo(leer_tabla_lote(contenido, formato, HOJA_PRECIOS)), origen)
+            else:
+                info = self.servicio.reemplazar_estadisticas(estadisticas_atipicos([leer_lote(contenido, formato)]), origen)
+        except (ValueError, KeyError) as e:
+            self.servicio.metricas.registrar_error('cargas_con_error')
+            self._error(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            # Archivo dañado (p. ej. un .xlsx que no es un zip) u otro error de lectura
+            self.servicio.metricas.registrar_error('cargas_con_error')
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+        else:
+            self._responder(HTTPStatus.OK, info)
+
+
+def catalogo_de_archivo(ruta):
+    # Lista de precios de un libro .xlsx (hoja 'Listado de Precios') o de un CSV/Parquet
+    if ruta.lower().endswith('.xlsx'):
+        return _cargar_catalogo(leer_precios(ruta))
+    with open(ruta, 'rb') as archivo:
+        return _cargar_catalogo(leer_tabla(os.path.basename(ruta), archivo.read(), HOJA_PRECIOS))
+
+
+def iniciar_servidor(servicio, host=HOST_SERVICIO, puerto=PUERTO_SERVICIO):
+    # Con puerto=0 el sistema asigna uno libre (servidor.server_address[1])
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorAuditoria)
+    servidor.servicio = servicio
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de auditoría de precios para el ERP.")
+    precios = parser.add_mutually_exclusive_group()
+    precios.add_argument('--precios', metavar='RUTA', help="Lista de precios residente: libro .xlsx o tabla CSV/Parquet del 'Listado de Precios'.")
+    precios.add_argument('--historial-precios', nargs='?', const=RUTA_HISTORIAL_PRECIOS, default=None, metavar='RUTA',
+                         help="Usa el historial de precios registrado (precio vigente en la fecha de cada línea).")
+    parser.add_argument('--referencia-atipicos', metavar='RUTA', default=None,
+                        help="Histórico (.sqlite) o facturación (.xlsx/CSV/Parquet) con la que se comparan los precios "
+                             "atípicos (por defecto, el histórico de auditorías si existe).")
+    parser.add_argument('--host', default=HOST_SERVICIO)
+    parser.add_argument('--puerto', type=int, default=PUERTO_SERVICIO)
+    parser.add_argument('--concurrencia', type=int, default=MAX_AUDITORIAS_SIMULTANEAS, help="Tope de lotes auditados a la vez.")
+    args = parser.parse_args(argv)
+
+    servicio = ServicioAuditoria(concurrencia=args.concurrencia)
+    try:
+        if args.precios:
+            servicio.reemplazar_catalogo(catalogo_de_archivo(args.precios), args.precios)
+        elif args.historial_precios:
+            catalogo = HistorialPrecios(args.historial_precios).catalogo()
+            if len(catalogo) == 0:
+                raise ValueError(f"El historial de precios '{args.historial_precios}' no tiene versiones registradas.")
+            servicio.reemplazar_catalogo(catalogo, args.historial_precios)
+        referencia = args.referencia_atipicos or (RUTA_HISTORICO if os.path.exists(RUTA_HISTORICO) else None)
+        if referencia:
+            estadisticas = referencia_de_archivo(referencia)
+            if len(estadisticas) or args.referencia_atipicos:
+                servicio.reemplazar_estadisticas(estadisticas, referencia)
+    except (OSError, ValueError, KeyError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    servidor = iniciar_servidor(servicio, args.host, args.puerto)
+    host, puerto = servidor.server_address[:2]
+    catalogo = servicio.info_catalogo()
+    estado = f"{catalogo['codigos']:,} códigos en la lista de precios" if catalogo else "sin lista de precios (PUT /precios)"
+    referencia = servicio.info_estadisticas()
+    estado += f", referencia de precios atípicos: {referencia['origen']}" if referencia else ", precios atípicos contra cada lote"
+    print(f"Servicio de auditoría en http://{host}:{puerto} (hasta {args.concurrencia} lotes a la vez, {estado}).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from auditoria import (
+    CLIENTE_200046, CLIENTE_200173, CODIGO_ALERTA_OK, CODIGOS_DESVIO, DESC_INTERCOMPANY_200046,
+    DESC_INTERCOMPANY_200173, DESC_MAX_CONTROLADOS, DESC_MAX_GENERAL, DESC_MAX_NUTRICIA_BEBELAC, ETIQUETAS_ALERTA,
+    MAX_PRECIO_DESVIACION, REGLAS_AUDITORIA, UMBRAL_PRECIO_ATIPICO, armar_resumen,
+)
+from reglas import contar_por_regla, evaluar_reglas
+
+# --- SIMULADOR DE UMBRALES (WHAT-IF) ---
+# Recalcula las alertas con otros límites sin volver a auditar: del resultado auditado se
+# conservan solo las columnas numéricas que comparan las reglas y las máscaras de las condiciones
+# que no dependen de un umbral (controlados, marcas, clientes, zonas). Cada simulación vuelve a
+# evaluar solo las comparaciones numéricas y la prioridad entre reglas.
+
+# Umbral -> (etiqueta, índice de la regla en REGLAS_AUDITORIA, valor vigente, signo). El umbral
+# reemplaza el valor de la condición numérica de la regla (multiplicado por el signo: el desvío
+# de precio se compara con -MAX_PRECIO_DESVIACION y el puntaje atípico con -UMBRAL_PRECIO_ATIPICO).
+UMBRALES_SIMULABLES = {
+    'MAX_PRECIO_DESVIACION': ('Precio facturado bajo lista (%)', 1, MAX_PRECIO_DESVIACION, -1),
+    'DESC_MAX_CONTROLADOS': ('Descuento máximo controlados (%)', 2, DESC_MAX_CONTROLADOS, 1),
+    'DESC_INTERCOMPANY_200046': (f'Descuento intercompany {CLIENTE_200046} (%)', 3, DESC_INTERCOMPANY_200046, 1),
+    'DESC_INTERCOMPANY_200173': (f'Descuento intercompany {CLIENTE_200173} (%)', 4, DESC_INTERCOMPANY_200173, 1),
+    'DESC_MAX_NUTRICIA_BEBELAC': ('Descuento máximo Nutricia/Bebelac (%)', 5, DESC_MAX_NUTRICIA_BEBELAC, 1),
+    'DESC_MAX_GENERAL': ('Descuento máximo general (%)', 6, DESC_MAX_GENERAL, 1),
+    'UMBRAL_PRECIO_ATIPICO': ('Precio atípico (desvíos MAD bajo la mediana)', 7, UMBRAL_PRECIO_ATIPICO, -1),
+}
+
+
+def _condicion_umbral(condiciones):
+    # Posición de la condición numérica (la que compara contra un número) de una regla
+    for posicion, (_, _, valor) in enumerate(condiciones):
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            return posicion
+    raise ValueError("La regla no tiene una condición numérica.")
+
+
+def reglas_con_umbrales(umbrales, reglas=REGLAS_AUDITORIA):
+    # Copia de las reglas con los umbrales {clave de UMBRALES_SIMULABLES: valor} reemplazados
+    reglas = [dict(regla, condiciones=list(regla['condiciones'])) for regla in reglas]
+    for clave, valor in umbrales.items():
+        _, indice, _, signo = UMBRALES_SIMULABLES[clave]
+        condiciones = reglas[indice]['condiciones']
+        posicion = _condicion_umbral(condiciones)
+        columna, operador, _ = condiciones[posicion]
+        condiciones[posicion] = (columna, operador, signo * valor)
+    return reglas
+
+
+class SimuladorUmbrales:
+    # Solo arreglos NumPy y máscaras (sin referencia al DataFrame auditado): la caché compartida mide su tamaño real
+
+    def __init__(self, df_audit):
+        columnas = {
+            REGLAS_AUDITORIA[indice]['condiciones'][_condicion_umbral(REGLAS_AUDITORIA[indice]['condiciones'])][0]
+            for _, indice, _, _ in UMBRALES_SIMULABLES.values()
+        }
+        self.columnas = {
+            columna: df_audit[columna].to_numpy(dtype=float, na_value=np.nan) for columna in sorted(columnas)
+        }
+        self.valor_neto = np.nan_to_num(df_audit['Valor neto'].to_numpy(dtype=float))
+        # Una evaluación completa con los umbrales vigentes deja en la caché todas las condiciones
+        # (las categóricas se evalúan solo aquí, sobre el resultado auditado)
+        self.condiciones = {}
+        evaluar_reglas(df_audit, REGLAS_AUDITORIA, CODIGO_ALERTA_OK, self.condiciones)
+
+    def simular(self, umbrales, seleccion=None):
+        # KPIs (mismo formato que auditoria.armar_resumen) y líneas que incumplen cada regla con
+        # los umbrales indicados; los que no se indican quedan en su valor vigente
+        reglas = reglas_con_umbrales(umbrales)
+        # Copia de la caché: las comparaciones con umbrales simulados no se acumulan entre llamadas
+        # El motor recibe un DataFrame que envuelve los mismos arreglos, sin copiarlos
+        columnas = pd.DataFrame(self.columnas, copy=False)
+        bits, codigos, _ = evaluar_reglas(columnas, reglas, CODIGO_ALERTA_OK, dict(self.condiciones))
+        valor_neto = self.valor_neto
+        if seleccion is not None:
+            bits, codigos, valor_neto = bits[seleccion], codigos[seleccion], valor_neto[seleccion]
+        conteos = np.bincount(codigos, minlength=len(ETIQUETAS_ALERTA))
+        valor_desviado = float(np.bincount(codigos, weights=valor_neto, minlength=len(ETIQUETAS_ALERTA))[CODIGOS_DESVIO].sum())
+        return armar_resumen(len(codigos), conteos, valor_desviado), contar_por_regla(bits, len(reglas))
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from generar_libros import generar_tablas  # noqa: E402
+
+FILAS_SINTETICAS = 30_000
+
+
+@pytest.fixture(scope='session')
+def tablas_sinteticas():
+    # Facturación y listado con la estructura del generador del banco de pruebas (tratar como solo lectura)
+    return generar_tablas(FILAS_SINTETICAS, semilla=1)
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atipicos import FACTOR_MAD_NORMAL, MIN_LINEAS_PRODUCTO, puntaje_precio_atipico  # noqa: E402
+
+
+def _puntaje(codigos, clientes, precios, cantidad=None, canal=None):
+    cantidad = np.ones(len(precios)) if cantidad is None else np.asarray(cantidad, dtype=float)
+    canal = np.zeros(len(precios), dtype=bool) if canal is None else np.asarray(canal)
+    valor_neto = np.asarray(precios, dtype=float) * cantidad
+    return puntaje_precio_atipico(pd.Series(codigos), pd.Series(clientes), valor_neto, cantidad, canal)
+
+
+def test_puntaje_con_mediana_y_mad():
+    # Mediana 100; desvíos absolutos 0 x5, 2 x4, 50 -> MAD 1; escala 1,4826 (más que el 1 % de la mediana)
+    precios = [100.0] * 5 + [102.0] * 4 + [50.0]
+    clientes = [f'C{i}' for i in range(len(precios))]
+    puntaje = _puntaje(['P'] * len(precios), clientes, precios)
+    assert puntaje[-1] == pytest.approx((50 - 100) / FACTOR_MAD_NORMAL)
+    assert puntaje[5] == pytest.approx(2 / FACTOR_MAD_NORMAL)
+    assert puntaje[0] == 0
+
+
+def test_escala_minima_con_mad_cero():
+    # Casi siempre el mismo precio: MAD 0 y la escala queda en el 1 % de la mediana
+    precios = [200.0] * 9 + [190.0]
+    puntaje = _puntaje(['P'] * 10, [f'C{i}' for i in range(10)], precios)
+    assert puntaje[-1] == pytest.approx(-10 / 2.0)
+
+
+def test_usa_el_precio_unitario():
+    precios = [100.0] * 9 + [50.0]
+    cantidad = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    puntaje = _puntaje(['P'] * 10, [f'C{i}' for i in range(10)], precios, cantidad)
+    assert puntaje[-1] == pytest.approx((50 - 100) / 1.0)
+
+
+def test_producto_con_pocas_lineas_no_se_puntua():
+    precios = [100.0] * (MIN_LINEAS_PRODUCTO - 2) + [10.0]
+    puntaje = _puntaje(['P'] * len(precios), ['C'] * len(precios), precios)
+    assert np.isnan(puntaje).all()
+
+
+def test_precio_invalido_o_sin_codigo_queda_sin_puntaje():
+    precios = [100.0] * 10 + [0.0, 100.0]
+    codigos = ['P'] * 11 + [None]
+    puntaje = _puntaje(codigos, [f'C{i}' for i in range(12)], precios, [1.0] * 10 + [1.0, 1.0])
+    assert np.isnan(puntaje[10]) and np.isnan(puntaje[11])
+    assert not np.isnan(puntaje[:10]).any()
+
+
+def test_canales_se_comparan_por_separado():
+    # Intercompany se factura con su propio precio: no es atípico frente a farmacia
+    precios = [100.0] * 10 + [60.0] * 10
+    canal = [False] * 10 + [True] * 10
+    puntaje = _puntaje(['P'] * 20, [f'C{i}' for i in range(20)], precios, canal=canal)
+    assert (puntaje == 0).all()
+
+
+def test_mediana_del_cliente_bajo_la_del_producto():
+    # El cliente X factura casi siempre por debajo: su línea a precio normal también lo refleja
+    precios = [100.0] * 10 + [90.0, 90.0, 100.0]
+    clientes = [f'C{i}' for i in range(10)] + ['X', 'X', 'X']
+    puntaje = _puntaje(['P'] * 13, clientes, precios)
+    escala = 1.0  # MAD 0: 1 % de la mediana
+    assert puntaje[12] == pytest.approx((90 - 100) / escala)
+    assert puntaje[10] == pytest.approx((90 - 100) / escala)
+    assert puntaje[0] == 0
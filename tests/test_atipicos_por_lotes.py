@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import paralelo  # noqa: E402
+from auditoria import (  # noqa: E402
+    CODIGO_ALERTA_ATIPICO, CODIGOS_DESVIO, UMBRAL_PRECIO_ATIPICO, calcular_puntaje_atipico, ejecutar_auditoria,
+    estadisticas_atipicos,
+)
+from paralelo import auditar_en_paralelo  # noqa: E402
+from servicio_auditoria import ServicioAuditoria, _cargar_catalogo  # noqa: E402
+
+# El puntaje de precio atípico compara cada línea con todo el archivo: auditar por fragmentos, en
+# procesos o línea a línea desde el servicio tiene que dar el mismo puntaje que el archivo completo.
+
+
+def _lotes(df_ventas, filas):
+    return [df_ventas.iloc[inicio:inicio + filas] for inicio in range(0, len(df_ventas), filas)]
+
+
+@pytest.fixture(scope='module')
+def ventas_con_atipicos(tablas_sinteticas):
+    # Algunas líneas con puntaje facturadas al 30 % de su precio
+    df_ventas, df_precios = tablas_sinteticas
+    puntaje = calcular_puntaje_atipico(df_ventas)
+    plantadas = np.flatnonzero(np.isfinite(puntaje))[::997][:20]
+    df_ventas = df_ventas.copy()
+    df_ventas.loc[df_ventas.index[plantadas], 'Valor neto'] *= 0.3
+    return df_ventas, df_precios, plantadas
+
+
+def test_puntaje_por_lotes_igual_al_del_archivo_completo(ventas_con_atipicos):
+    df_ventas, _, plantadas = ventas_con_atipicos
+    completo = calcular_puntaje_atipico(df_ventas)
+    estadisticas = estadisticas_atipicos(_lotes(df_ventas, 3_000))
+    por_lotes = np.concatenate([calcular_puntaje_atipico(lote, estadisticas) for lote in _lotes(df_ventas, 7_000)])
+    np.testing.assert_array_equal(por_lotes, completo)
+    assert (completo[plantadas] < -UMBRAL_PRECIO_ATIPICO).all()
+
+
+def test_puntaje_en_paralelo_igual_al_del_archivo_completo(ventas_con_atipicos, monkeypatch):
+    df_ventas, df_precios, plantadas = ventas_con_atipicos
+    monkeypatch.setattr(paralelo, 'MIN_FILAS_POR_FRAGMENTO', 5_000)
+    _, df_audit = ejecutar_auditoria(df_ventas, df_precios)
+    _, df_paralelo = auditar_en_paralelo(df_ventas, df_precios, procesos=3, umbral=0)
+    # Cada fragmento se puntúa contra el archivo completo, no solo contra sus propias líneas
+    np.testing.assert_array_equal(df_paralelo['Puntaje_Atipico'].to_numpy(), df_audit['Puntaje_Atipico'].to_numpy())
+    assert (df_paralelo['Puntaje_Atipico'].to_numpy()[plantadas] < -UMBRAL_PRECIO_ATIPICO).all()
+    pd.testing.assert_series_equal(df_paralelo['Alerta_Descuento'], df_audit['Alerta_Descuento'])
+
+
+def test_lote_de_una_linea_en_el_servicio_igual_al_archivo_completo(ventas_con_atipicos):
+    df_ventas, df_precios, plantadas = ventas_con_atipicos
+    _, df_audit = ejecutar_auditoria(df_ventas, df_precios)
+    servicio = ServicioAuditoria(concurrencia=1, max_en_espera=0)
+    servicio.reemplazar_catalogo(_cargar_catalogo(df_precios))
+    servicio.reemplazar_estadisticas(estadisticas_atipicos([df_ventas]))
+
+    for fila in [plantadas[0], plantadas[-1], 0]:
+        lote = df_ventas.iloc[[fila]].to_csv(index=False).encode('utf-8')
+        linea = json.loads(servicio.auditar(lote, 'csv'))['lineas'][0]
+        esperado = df_audit['Puntaje_Atipico'].iloc[fila]
+        if np.isnan(esperado):
+            assert linea['Puntaje_Atipico'] is None
+        else:
+            assert linea['Puntaje_Atipico'] == pytest.approx(esperado, rel=1e-9)
+        assert linea['Codigo_Alerta'] == df_audit['Alerta_Descuento'].cat.codes.iloc[fila]
+        assert linea['Reglas_Incumplidas'] == df_audit['Reglas_Incumplidas'].iloc[fila]
+    # Las plantadas incumplen la regla de precio atípico aunque su alerta sea otra de más prioridad
+    bit_atipico = 1 << CODIGOS_DESVIO.index(CODIGO_ALERTA_ATIPICO)
+    assert (df_audit['Reglas_Incumplidas'].to_numpy()[plantadas] & bit_atipico).all()
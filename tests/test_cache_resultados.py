@@ -0,0 +1,87 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_resultados  # noqa: E402
+from cache_resultados import CacheResultados  # noqa: E402
+
+
+def _valor(mb, relleno=0):
+    # Arreglo de exactamente mb MB (tamano_en_memoria usa nbytes)
+    return np.full(int(mb * 1e6), relleno, dtype=np.uint8)
+
+
+def _cache(tmp_path, **opciones):
+    opciones = {'presupuesto_mb': 3, 'ttl_segundos': 0, 'desborde': False, 'carpeta': str(tmp_path), **opciones}
+    return CacheResultados(**opciones)
+
+
+def test_calcula_una_vez_y_luego_acierta(tmp_path):
+    cache = _cache(tmp_path)
+    llamadas = []
+    for _ in range(3):
+        valor, origen = cache.obtener('a', lambda: llamadas.append(1) or _valor(1))
+    assert len(llamadas) == 1 and origen == 'memoria'
+    metricas = cache.metricas()
+    assert (metricas['fallos'], metricas['aciertos'], metricas['mb_en_memoria']) == (1, 2, 1.0)
+
+
+def test_desaloja_la_menos_usada_al_superar_el_presupuesto(tmp_path):
+    cache = _cache(tmp_path)
+    for clave in 'abc':
+        cache.obtener(clave, lambda: _valor(1))
+    cache.obtener('a', lambda: _valor(1))  # 'a' pasa a ser la más reciente
+    cache.obtener('d', lambda: _valor(1))
+    assert not cache.contiene('b')
+    assert all(cache.contiene(clave) for clave in 'acd')
+    assert cache.metricas()['desalojos'] == 1 and cache.metricas()['mb_en_memoria'] == 3.0
+
+
+def test_valor_mas_grande_que_el_presupuesto_no_queda_en_memoria(tmp_path):
+    cache = _cache(tmp_path)
+    cache.obtener('a', lambda: _valor(1))
+    valor, origen = cache.obtener('grande', lambda: _valor(5))
+    assert origen == 'calculado' and len(valor) == 5_000_000
+    assert not cache.contiene('grande') and cache.contiene('a')
+
+
+def test_ttl_vence_las_entradas(tmp_path, monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(cache_resultados.time, 'monotonic', lambda: reloj[0])
+    cache = _cache(tmp_path, ttl_segundos=60)
+    cache.obtener('a', lambda: _valor(1))
+    reloj[0] += 59
+    assert cache.obtener('a', lambda: _valor(1))[1] == 'memoria'
+    reloj[0] += 2
+    assert not cache.contiene('a')
+    assert cache.obtener('a', lambda: _valor(1))[1] == 'calculado'
+    assert cache.metricas()['vencidos'] == 1
+
+
+def test_desborde_a_disco_y_recuperacion(tmp_path):
+    cache = _cache(tmp_path, desborde=True)
+    cache.obtener('a', lambda: _valor(1, relleno=7))
+    for clave in 'bcd':
+        cache.obtener(clave, lambda: _valor(1))
+    metricas = cache.metricas()
+    assert metricas['desbordes'] == 1 and metricas['entradas_en_disco'] == 1
+    assert cache.contiene('a')
+
+    valor, origen = cache.obtener('a', lambda: _valor(1))
+    assert origen == 'disco' and valor[0] == 7
+    # Al volver a memoria sale del disco (y desborda la que ahora es la menos usada)
+    assert cache.metricas()['aciertos_disco'] == 1
+    assert cache.obtener('a', lambda: _valor(1))[1] == 'memoria'
+
+
+def test_desborde_respeta_su_presupuesto(tmp_path):
+    cache = _cache(tmp_path, presupuesto_mb=1, desborde=True, presupuesto_disco_mb=2)
+    for clave in 'abcd':
+        cache.obtener(clave, lambda: _valor(1))
+    # Tres desbordadas con lugar para dos en disco: la más antigua se borra
+    assert not cache.contiene('a')
+    assert cache.metricas()['entradas_en_disco'] == 2
+    assert len(os.listdir(cache.carpeta)) == 2
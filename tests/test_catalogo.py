@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogo import CatalogoPrecios  # noqa: E402
+
+
+def _listado(codigos, precios, vigencias=None):
+    df = pd.DataFrame({
+        'Codigo': codigos,
+        'IVA_Lista': [0.1] * len(codigos),
+        'Precio_Farmacia_Target': precios,
+        'Precio_Intercompany_Target': precios,
+    })
+    if vigencias is not None:
+        df['Vigente_Desde'] = pd.to_datetime(vigencias)
+    return df
+
+
+def _precios(catalogo, posiciones):
+    return catalogo.precio_farmacia[posiciones].tolist()
+
+
+def test_sin_vigencia_codigo_ausente_y_repetido():
+    catalogo = CatalogoPrecios.desde_listado(_listado(['B', 'A', 'A'], [200.0, 100.0, 999.0]))
+    assert not catalogo.con_vigencia
+    posiciones = catalogo.posiciones(pd.Series(['A', 'C', 'B', None]))
+    assert posiciones[1] == -1 and posiciones[3] == -1
+    # Un código repetido en la lista conserva su primera aparición; -1 apunta a "sin precio"
+    assert _precios(catalogo, posiciones) == [100.0, 0.0, 200.0, 0.0]
+
+
+def test_as_of_toma_la_ultima_vigencia_hasta_la_fecha():
+    catalogo = CatalogoPrecios.desde_listado(_listado(
+        ['A', 'A', 'A', 'B'], [100.0, 110.0, 120.0, 50.0],
+        ['2024-01-01', '2024-03-01', '2024-06-01', '2024-02-01'],
+    ))
+    assert catalogo.con_vigencia
+    codigos = pd.Series(['A', 'A', 'A', 'A', 'B', 'B'])
+    fechas = pd.Series(pd.to_datetime(
+        ['2024-02-15', '2024-03-01', '2024-12-31', '2024-03-01T18:30', '2024-02-01', '2025-01-01'], format='ISO8601'
+    ))
+    assert _precios(catalogo, catalogo.posiciones(codigos, fechas)) == [100.0, 110.0, 120.0, 110.0, 50.0, 50.0]
+
+
+def test_linea_anterior_a_la_primera_vigencia_queda_sin_precio():
+    catalogo = CatalogoPrecios.desde_listado(_listado(['A', 'B'], [100.0, 50.0], ['2024-03-01', '2024-01-01']))
+    fechas = pd.Series(pd.to_datetime(['2024-02-28', '2023-12-31', '2024-01-01']))
+    posiciones = catalogo.posiciones(pd.Series(['A', 'B', 'B']), fechas)
+    # No toma la versión de otro código aunque sea la anterior en el orden (código, vigencia)
+    assert posiciones[:2].tolist() == [-1, -1]
+    assert _precios(catalogo, posiciones) == [0.0, 0.0, 50.0]
+
+
+def test_vigencia_repetida_y_vigencia_vacia():
+    catalogo = CatalogoPrecios.desde_listado(_listado(
+        ['A', 'A', 'A'], [100.0, 999.0, 80.0], ['2024-03-01', '2024-03-01', None],
+    ))
+    # Misma (código, vigencia): queda la primera; la vigencia vacía rige desde siempre
+    fechas = pd.Series(pd.to_datetime(['2024-03-05', '2020-01-01']))
+    assert _precios(catalogo, catalogo.posiciones(pd.Series(['A', 'A']), fechas)) == [100.0, 80.0]
+
+
+def test_linea_sin_fecha_toma_la_version_mas_reciente():
+    catalogo = CatalogoPrecios.desde_listado(_listado(['A', 'A'], [100.0, 110.0], ['2024-01-01', '2024-06-01']))
+    fechas = pd.Series(pd.to_datetime([None, '2024-02-01']))
+    assert _precios(catalogo, catalogo.posiciones(pd.Series(['A', 'A']), fechas)) == [110.0, 100.0]
+    assert _precios(catalogo, catalogo.posiciones(pd.Series(['A']))) == [110.0]
+
+
+def test_categorico_y_texto_dan_las_mismas_posiciones():
+    catalogo = CatalogoPrecios.desde_listado(_listado(['A', 'A', 'B'], [1.0, 2.0, 3.0], ['2024-01-01', '2024-02-01', '2024-01-01']))
+    codigos = pd.Series(['B', 'A', 'X', 'A'])
+    fechas = pd.Series(pd.to_datetime(['2024-01-10', '2024-01-10', '2024-01-10', '2024-02-10']))
+    np.testing.assert_array_equal(
+        catalogo.posiciones(codigos, fechas), catalogo.posiciones(codigos.astype('category'), fechas)
+    )
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from esquema import ESQUEMA_FACTURACION, ESQUEMA_LISTADO, aplicar_esquema, convertir_columna  # noqa: E402
+
+
+def test_alias_y_espacios_en_los_nombres():
+    df = pd.DataFrame({
+        ' IVA ': [0.1], 'Precio de Factura con Descuento': [100], 'Precio Intercompany': [90],
+        'Codigo': ['001'], 'Vigencia': ['2024-01-01'], 'Otra': ['x'],
+    })
+    resultado = aplicar_esquema(df, ESQUEMA_LISTADO)
+    assert list(resultado.columns) == [
+        'IVA_Lista', 'Precio_Farmacia_Target', 'Precio_Intercompany_Target', 'Codigo', 'Vigente_Desde', 'Otra'
+    ]
+    # Las columnas fuera del esquema se conservan y la tabla de entrada no se modifica
+    assert resultado['Otra'].tolist() == ['x']
+    assert list(df.columns)[0] == ' IVA '
+
+
+def test_tipos_declarados():
+    df = pd.DataFrame({
+        'Fecha factura': ['31/01/2024', '01/02/2024', None],
+        'Almacen': ['1001', '1012', 'x'],
+        'Solicitante': ['000123', '200046', '7'],
+        'Codigo': [3000001, 3000002, 3000003],
+        '% Desc': ['5', 'n/d', '7.5'],
+        'Valor neto': [100, 200, 300],
+    })
+    resultado = aplicar_esquema(df, ESQUEMA_FACTURACION)
+    assert resultado['Fecha factura'].dtype == 'datetime64[us]'
+    assert resultado['Fecha factura'].tolist()[:2] == [pd.Timestamp('2024-01-31'), pd.Timestamp('2024-02-01')]
+    assert pd.isna(resultado['Fecha factura'].iloc[2])
+    # Texto conserva ceros a la izquierda; los números de código pasan a texto
+    assert resultado['Solicitante'].tolist() == ['000123', '200046', '7']
+    assert resultado['Codigo'].tolist() == ['3000001', '3000002', '3000003']
+    # Entero con un valor no convertible: float con NaN
+    assert resultado['Almacen'].dtype.kind == 'f' and np.isnan(resultado['Almacen'].iloc[2])
+    assert resultado['% Desc'].dtype == float and np.isnan(resultado['% Desc'].iloc[1])
+    assert resultado['Valor neto'].dtype == np.int64
+
+
+def test_entero_sin_vacios_usa_el_tipo_mas_chico():
+    resultado = aplicar_esquema(pd.DataFrame({'Almacen': [1001, 1012, 1041]}), ESQUEMA_FACTURACION)
+    assert resultado['Almacen'].dtype == np.int16
+
+
+def test_numeros_con_nulos_de_pandas_pasan_a_float():
+    df = pd.DataFrame({'Valor neto': pd.array([1, None], dtype='Int64')})
+    resultado = aplicar_esquema(df, ESQUEMA_FACTURACION)
+    assert resultado['Valor neto'].dtype == np.float64
+
+
+def test_idempotente_sobre_una_tabla_tipada():
+    df = aplicar_esquema(pd.DataFrame({
+        'Fecha factura': ['2024-01-31'], 'Almacen': [1001], 'Codigo': ['1'], 'Valor neto': [10.0],
+    }), ESQUEMA_FACTURACION)
+    pd.testing.assert_frame_equal(aplicar_esquema(df, ESQUEMA_FACTURACION), df)
+    # Sobre columnas ya tipadas no se convierte nada: se devuelve la misma Series
+    for columna in df.columns:
+        serie = df[columna]
+        assert convertir_columna(serie, ESQUEMA_FACTURACION[columna][0]) is serie
+
+
+def test_tabla_vacia_sin_columnas():
+    # Un DataFrame de una lista vacía tiene un RangeIndex como columnas
+    resultado = aplicar_esquema(pd.DataFrame([]), ESQUEMA_FACTURACION)
+    assert resultado.empty and list(resultado.columns) == []
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from historico import DIMENSION_TOTAL, HistoricoAuditoria  # noqa: E402
+
+
+def _tablas():
+    df_ventas = pd.DataFrame({
+        'Fecha factura': pd.to_datetime(['2024-01-15', '2024-01-20', '2024-02-03']),
+        'Almacen': [1001, 1001, 1012],
+        'Tipo Venta': ['Contado'] * 3,
+        'Zona de Venta': ['CENTRAL'] * 3,
+        'Solicitante': ['100001', '100002', '100001'],
+        'Nombre 1': ['Farmacia A', 'Farmacia B', 'Farmacia A'],
+        'Codigo': ['3000001', '3000001', '3000002'],
+        'Material': ['Producto 1', 'Producto 1', 'Producto 2'],
+        'Jerarquia': ['MARCA', 'MARCA', 'MARCA'],
+        'Cant': [1.0, 2.0, 1.0],
+        '% Desc': [0.0, 10.0, 0.0],
+        'Valor neto': [1000.0, 1800.0, 500.0],
+    })
+    df_precios = pd.DataFrame({
+        'Codigo': ['3000001', '3000002'],
+        'IVA_Lista': [0.1, 0.1],
+        'Precio_Farmacia_Target': [1100.0, 550.0],
+        'Precio_Intercompany_Target': [900.0, 450.0],
+    })
+    return df_ventas, df_precios
+
+
+def test_reabrir_con_cubo_vacio_lo_reconstruye(tmp_path):
+    # Históricos anteriores al cubo (o con el cubo borrado): al abrirlos se arma desde las líneas
+    ruta = str(tmp_path / 'historico.sqlite')
+    historico = HistoricoAuditoria(ruta)
+    historico.ingerir(*_tablas())
+    esperado = historico.tendencia()
+
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute('DELETE FROM cubo')
+
+    reabierto = HistoricoAuditoria(ruta)
+    pd.testing.assert_frame_equal(reabierto.tendencia(), esperado)
+    assert list(reabierto.tendencia().index) == ['2024-01', '2024-02']
+    assert reabierto.tendencia(DIMENSION_TOTAL)['Transacciones Auditadas'].sum() == 3
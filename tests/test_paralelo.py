@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import paralelo  # noqa: E402
+from auditoria import (  # noqa: E402
+    COLUMNAS_REPORTE_ALERTAS, AcumuladorAuditoria, auditar_por_lotes, ejecutar_auditoria, estadisticas_atipicos,
+    resumir_auditoria,
+)
+from paralelo import auditar_en_paralelo  # noqa: E402
+
+
+def _lotes(df_ventas, filas):
+    return [df_ventas.iloc[inicio:inicio + filas] for inicio in range(0, len(df_ventas), filas)]
+
+
+def test_paralelo_igual_a_ejecutar_auditoria(tablas_sinteticas, monkeypatch):
+    df_ventas, df_precios = tablas_sinteticas
+    monkeypatch.setattr(paralelo, 'MIN_FILAS_POR_FRAGMENTO', 5_000)
+    desvios, df_audit = ejecutar_auditoria(df_ventas, df_precios)
+
+    desvios_paralelo, df_paralelo = auditar_en_paralelo(df_ventas, df_precios, procesos=3, umbral=0)
+    pd.testing.assert_frame_equal(df_paralelo, df_audit)
+    pd.testing.assert_frame_equal(desvios_paralelo, desvios)
+
+
+def test_serie_con_avance_igual_a_ejecutar_auditoria(tablas_sinteticas, monkeypatch):
+    df_ventas, df_precios = tablas_sinteticas
+    monkeypatch.setattr(paralelo, 'FILAS_POR_AVANCE', 7_000)
+    _, df_audit = ejecutar_auditoria(df_ventas, df_precios)
+
+    acumulador = AcumuladorAuditoria(columnas_alertas=None)
+    _, df_serie = auditar_en_paralelo(df_ventas, df_precios, procesos=1, progreso=acumulador.agregar)
+    pd.testing.assert_frame_equal(df_serie, df_audit)
+    # Los KPIs parciales, sumados fragmento a fragmento, terminan en los del resultado completo
+    assert acumulador.total == len(df_ventas)
+    assert acumulador.resumen() == resumir_auditoria(df_audit)
+
+
+def test_por_lotes_igual_a_ejecutar_auditoria(tablas_sinteticas):
+    df_ventas, df_precios = tablas_sinteticas
+    desvios, df_audit = ejecutar_auditoria(df_ventas, df_precios)
+
+    estadisticas = estadisticas_atipicos(_lotes(df_ventas, 4_000))
+    acumulador = auditar_por_lotes(_lotes(df_ventas, 4_000), df_precios, estadisticas=estadisticas)
+    assert acumulador.resumen() == resumir_auditoria(df_audit)
+
+    alertas = acumulador.tabla_alertas()
+    esperadas = desvios[COLUMNAS_REPORTE_ALERTAS].reset_index(drop=True)
+    assert len(alertas) == len(esperadas)
+    assert alertas['Alerta_Descuento'].astype(str).tolist() == esperadas['Alerta_Descuento'].astype(str).tolist()
+    np.testing.assert_array_equal(alertas['Valor neto'].to_numpy(), esperadas['Valor neto'].to_numpy())
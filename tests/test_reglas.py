@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reglas import MAX_REGLAS, contar_por_regla, evaluar_reglas  # noqa: E402
+
+REGLAS = [
+    {'etiqueta': 'Zona', 'condiciones': [('Zona', 'en', ['EMPLEADOS']), ('Desc', '>', 0)]},
+    {'etiqueta': 'Precio', 'condiciones': [('Desvio', '<', -2.5)]},
+    {'etiqueta': 'General', 'condiciones': [('Desc', '>', 7)]},
+]
+
+
+def _lineas():
+    return pd.DataFrame({
+        'Zona': pd.Categorical(['EMPLEADOS', 'CENTRAL', 'CENTRAL', 'EMPLEADOS', 'CENTRAL', None]),
+        'Desc': [10.0, 10.0, 3.0, 0.0, np.nan, 8.0],
+        'Desvio': [-5.0, -5.0, 0.0, -5.0, np.nan, 1.0],
+    })
+
+
+def test_prioridad_es_la_primera_regla_incumplida():
+    bits, codigos, conteos = evaluar_reglas(_lineas(), REGLAS)
+    # Fila 0 incumple las tres reglas, fila 1 las dos últimas, fila 3 solo la de precio
+    assert codigos.tolist() == [0, 1, 3, 1, 3, 2]
+    assert codigos.dtype == np.int8
+    # Los conteos son por regla incumplida, no por código asignado
+    assert conteos.tolist() == [1, 3, 3]
+
+
+def test_mascara_de_bits_marca_todas_las_reglas_incumplidas():
+    bits, _, _ = evaluar_reglas(_lineas(), REGLAS)
+    assert bits.dtype == np.uint16
+    assert bits.tolist() == [0b111, 0b110, 0, 0b010, 0, 0b100]
+    assert contar_por_regla(bits, len(REGLAS)).tolist() == [1, 3, 3]
+
+
+def test_codigo_ok_y_codigo_propio_de_una_regla():
+    reglas = REGLAS[:2] + [dict(REGLAS[2], codigo=9)]
+    _, codigos, _ = evaluar_reglas(_lineas(), reglas, codigo_ok=7)
+    # La regla con 'codigo' produce ese código; el bit sigue siendo el de su posición
+    assert codigos.tolist() == [0, 1, 7, 1, 7, 9]
+
+
+def test_nan_no_incumple_comparaciones():
+    bits, _, _ = evaluar_reglas(_lineas(), REGLAS)
+    assert bits[4] == 0
+
+
+def test_cache_de_condiciones_se_reutiliza():
+    condiciones = {}
+    evaluar_reglas(_lineas(), REGLAS, condiciones_evaluadas=condiciones)
+    assert ('Desc', '>', 7) in condiciones
+    # Una máscara en la caché reemplaza la evaluación de esa condición
+    condiciones[('Desc', '>', 7)] = np.zeros(6, dtype=bool)
+    _, codigos, _ = evaluar_reglas(_lineas(), REGLAS, condiciones_evaluadas=condiciones)
+    assert codigos.tolist() == [0, 1, 3, 1, 3, 3]
+
+
+def test_rechaza_mas_reglas_que_bits():
+    with pytest.raises(ValueError):
+        evaluar_reglas(_lineas(), REGLAS * (MAX_REGLAS // len(REGLAS) + 1))
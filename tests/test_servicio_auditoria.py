@@ -0,0 +1,112 @@
+import http.client
+import json
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import servicio_auditoria  # noqa: E402
+from servicio_auditoria import ServicioAuditoria, iniciar_servidor  # noqa: E402
+
+
+@pytest.fixture
+def servicio():
+    servicio = ServicioAuditoria(concurrencia=1, max_en_espera=0)
+    servidor = iniciar_servidor(servicio, '127.0.0.1', 0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    servicio.puerto = servidor.server_address[1]
+    yield servicio
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _pedir(servicio, metodo, ruta, cuerpo=None, tipo='text/csv'):
+    conexion = http.client.HTTPConnection('127.0.0.1', servicio.puerto, timeout=60)
+    try:
+        conexion.request(metodo, ruta, body=cuerpo, headers={'Content-Type': tipo} if cuerpo is not None else {})
+        respuesta = conexion.getresponse()
+        return respuesta.status, dict(respuesta.getheaders()), json.loads(respuesta.read())
+    finally:
+        conexion.close()
+
+
+def _csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+
+@pytest.fixture
+def con_precios(servicio, tablas_sinteticas):
+    _, df_precios = tablas_sinteticas
+    estado, _, info = _pedir(servicio, 'PUT', '/precios', _csv(df_precios))
+    assert estado == 200 and info['codigos'] > 0
+    return servicio
+
+
+def test_salud_y_ruta_desconocida(servicio):
+    estado, _, cuerpo = _pedir(servicio, 'GET', '/salud')
+    assert estado == 200 and cuerpo['estado'] == 'sin_precios'
+    assert _pedir(servicio, 'GET', '/otra')[0] == 404
+    assert _pedir(servicio, 'POST', '/otra', b'[]')[0] == 404
+
+
+def test_sin_lista_de_precios_responde_409_sin_reintento(servicio, tablas_sinteticas):
+    df_ventas, _ = tablas_sinteticas
+    estado, encabezados, _ = _pedir(servicio, 'POST', '/auditar', _csv(df_ventas.head(20)))
+    assert estado == 409 and 'Retry-After' not in encabezados
+    metricas = _pedir(servicio, 'GET', '/metricas')[2]
+    assert metricas['lotes_sin_precios'] == 1 and metricas['lotes_rechazados'] == 0
+
+
+def test_lote_valido(con_precios, tablas_sinteticas):
+    df_ventas, _ = tablas_sinteticas
+    estado, _, cuerpo = _pedir(con_precios, 'POST', '/auditar', _csv(df_ventas.head(200)))
+    assert estado == 200
+    assert cuerpo['resumen']['Transacciones Auditadas'] == 200 and len(cuerpo['lineas']) == 200
+    estado, _, cuerpo = _pedir(con_precios, 'POST', '/auditar?solo_desvios=1', _csv(df_ventas.head(200)))
+    assert estado == 200 and len(cuerpo['lineas']) == cuerpo['resumen']['Transacciones con Desvío']
+
+
+@pytest.mark.parametrize('cuerpo, tipo', [
+    (b'[]', 'application/json'),
+    (b'{"lineas": []}', 'application/json'),
+    (b'{"lineas": [', 'application/json'),
+    (b'[{"Codigo": "1"}]', 'application/json'),
+    (b'Codigo\n1\n', 'text/plain'),
+])
+def test_lote_mal_formado_responde_400(con_precios, cuerpo, tipo):
+    estado, _, respuesta = _pedir(con_precios, 'POST', '/auditar', cuerpo, tipo)
+    assert estado == 400 and respuesta['error']
+    assert _pedir(con_precios, 'GET', '/metricas')[2]['lotes_con_error'] == 1
+
+
+def test_lote_demasiado_grande_responde_413(con_precios, monkeypatch):
+    monkeypatch.setattr(servicio_auditoria, 'MAX_MB_LOTE', 1e-6)
+    assert _pedir(con_precios, 'POST', '/auditar', b'[{"Codigo": "1"}]', 'application/json')[0] == 413
+
+
+def test_sin_cupo_responde_503_con_reintento(con_precios, tablas_sinteticas):
+    df_ventas, _ = tablas_sinteticas
+    con_precios._cupos.acquire()
+    try:
+        estado, encabezados, _ = _pedir(con_precios, 'POST', '/auditar', _csv(df_ventas.head(20)))
+    finally:
+        con_precios._cupos.release()
+    assert estado == 503 and encabezados['Retry-After'] == '1'
+    assert _pedir(con_precios, 'GET', '/metricas')[2]['lotes_rechazados'] == 1
+
+
+def test_carga_invalida_responde_400_y_falla_inesperada_500(servicio, monkeypatch):
+    assert _pedir(servicio, 'PUT', '/precios', b'Otra\n1\n')[0] == 400
+    assert _pedir(servicio, 'PUT', '/referencia-atipicos', b'[]', 'application/json')[0] == 400
+
+    def libro_danado(*args):
+        raise zipfile.BadZipFile("File is not a zip file")
+    monkeypatch.setattr(servicio_auditoria, '_cargar_catalogo', libro_danado)
+    estado, _, respuesta = _pedir(servicio, 'PUT', '/precios', b'Codigo\n1\n')
+    assert estado == 500 and 'BadZipFile' in respuesta['error']
+    assert _pedir(servicio, 'GET', '/metricas')[2]['cargas_con_error'] == 3
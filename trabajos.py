@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from auditoria import AcumuladorAuditoria, calcular_mascaras_filtro, etapa_opcional, hojas_reporte
+from exportacion import exportar
+from ingesta import leer_archivos
+from instrumentacion import RegistroRendimiento
+from paralelo import auditar_en_paralelo
+
+# --- TRABAJOS DE LECTURA Y AUDITORÍA EN SEGUNDO PLANO ---
+# Al procesar un archivo, la lectura, la auditoría y las primeras exportaciones corren en un pool
+# de hilos del servidor, fuera del hilo del script de Streamlit. Cada trabajo tiene un id, informa
+# el avance de cada etapa (filas leídas, filas auditadas, reportes generados) y publica KPIs
+# parciales a medida que se auditan los fragmentos. Los resultados quedan en la caché compartida
+# con las mismas claves que usa el tablero, que los toma de ahí al abrirse.
+#
+# Son hilos y no procesos: los resultados tienen que quedar en la caché de este proceso. Los
+# archivos grandes igual se auditan en varios procesos (ver paralelo.auditar_en_paralelo).
+
+HILOS_TRABAJOS = int(os.environ.get('AUDITORIA_HILOS_TRABAJOS', 2))
+# Reportes (con los filtros iniciales del tablero) que se generan por adelantado al terminar la auditoría
+EXPORTACIONES_PREVIAS = [
+    tipo for tipo in os.environ.get('AUDITORIA_EXPORTACIONES_PREVIAS', 'alertas').split(',') if tipo
+]
+TRABAJOS_RETENIDOS = 64
+
+ETAPAS_TRABAJO = {
+    'lectura': 'Filas leídas',
+    'auditoria': 'Filas auditadas',
+    'exportaciones': 'Reportes generados',
+}
+# Estado de los filtros del tablero al abrirse (ningún filtro activo)
+FILTROS_INICIALES = {'controlados': None, 'ofertas': None, 'funcionarios': None}
+
+
+def auditar_con_mascaras(df_ventas, df_precios, registro=None, progreso=None):
+    # Resultado que consume el tablero: (df_audit, máscaras de filtro, valor neto numérico)
+    _, df_audit = auditar_en_paralelo(df_ventas, df_precios, registro=registro, progreso=progreso)
+    with etapa_opcional(registro, 'auditoria.mascaras', len(df_audit)):
+        mascaras = calcular_mascaras_filtro(df_audit)
+    valor_neto = df_audit['Valor neto'].to_numpy(dtype=float)
+    return df_audit, mascaras, valor_neto
+
+
+class Trabajo:
+    def __init__(self, huella, nombre):
+        self.id = uuid.uuid4().hex[:12]
+        self.huella = huella
+        self.nombre = nombre
+        self.estado = 'en_cola'
+        self.error = None
+        self.creado = time.monotonic()
+        self._lock = threading.Lock()
+        self._etapas = {etapa: {'hechas': 0, 'total': None, 'terminada': False} for etapa in ETAPAS_TRABAJO}
+        self._kpis = None
+
+    def avanzar(self, etapa, hechas, total=None, terminada=False):
+        with self._lock:
+            self._etapas[etapa].update(hechas=hechas, terminada=terminada)
+            if total is not None:
+                self._etapas[etapa]['total'] = total
+
+    def publicar_kpis(self, kpis):
+        with self._lock:
+            self._kpis = kpis
+
+    def etapa_terminada(self, etapa):
+        with self._lock:
+            return self._etapas[etapa]['terminada']
+
+    def instantanea(self):
+        # Copia consistente para mostrar en pantalla desde otro hilo
+        with self._lock:
+            return {
+                'id': self.id,
+                'nombre': self.nombre,
+                'estado': self.estado,
+                'error': self.error,
+                'segundos': round(time.monotonic() - self.creado, 1),
+                'etapas': {etapa: dict(avance) for etapa, avance in self._etapas.items()},
+                'kpis': dict(self._kpis) if self._kpis else None,
+            }
+
+
+class GestorTrabajos:
+    def __init__(self, hilos=HILOS_TRABAJOS):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='auditoria')
+        self._lock = threading.Lock()
+        self._trabajos = OrderedDict()
+
+    def enviar(self, huella, nombre, funcion):
+        # funcion(trabajo) hace el trabajo e informa el avance. Si el mismo archivo ya se está
+        # procesando (otra sesión lo subió), se devuelve ese trabajo en lugar de repetirlo.
+        with self._lock:
+            for trabajo in self._trabajos.values():
+                if trabajo.huella == huella and trabajo.estado in ('en_cola', 'ejecutando'):
+                    return trabajo
+            trabajo = Trabajo(huella, nombre)
+            self._trabajos[trabajo.id] = trabajo
+            self._descartar_antiguos()
+        self._pool.submit(self._ejecutar, trabajo, funcion)
+        return trabajo
+
+    def _descartar_antiguos(self):
+        # Requiere self._lock. Solo se descartan trabajos ya finalizados
+        finalizados = [i for i, t in self._trabajos.items() if t.estado in ('terminado', 'error')]
+        for id_trabajo in finalizados[:max(0, len(self._trabajos) - TRABAJOS_RETENIDOS)]:
+            del self._trabajos[id_trabajo]
+
+    def _ejecutar(self, trabajo, funcion):
+        with trabajo._lock:
+            trabajo.estado = 'ejecutando'
+        try:
+            funcion(trabajo)
+        except Exception as e:
+            with trabajo._lock:
+                trabajo.estado, trabajo.error = 'error', e
+        else:
+            with trabajo._lock:
+                trabajo.estado = 'terminado'
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            return self._trabajos.get(id_trabajo)
+
+
+def leer_con_historial(archivos, historial=None, vigencia_precios=None):
+    # Con historial de precios, el listado del archivo se registra con su vigencia y la auditoría
+    # usa todas las versiones registradas (cada línea con el precio vigente en su fecha)
+    df_ventas, df_precios = leer_archivos(archivos)
+    if historial is not None:
+        historial.registrar(df_precios, vigencia_precios)
+        df_precios = historial.listado()
+    return df_ventas, df_precios
+
+
+def procesar_archivos(trabajo, archivos, cache, id_sesion=None, historial=None, vigencia_precios=None):
+    # Lectura -> auditoría -> exportaciones previas, guardando cada resultado en la caché compartida.
+    # Con historial, trabajo.huella identifica el archivo junto con la versión del historial usada.
+    huella = trabajo.huella
+    registro = RegistroRendimiento(id_sesion, f'trabajo-{trabajo.id}')
+
+    with registro.etapa('trabajo.lectura') as medicion:
+        (df_ventas, df_precios), _ = cache.obtener(
+            ('libro', huella), lambda: leer_con_historial(archivos, historial, vigencia_precios)
+        )
+        medicion['Filas'] = len(df_ventas)
+    trabajo.avanzar('lectura', len(df_ventas), len(df_ventas), terminada=True)
+
+    acumulador = AcumuladorAuditoria(columnas_alertas=None)
+    trabajo.avanzar('auditoria', 0, len(df_ventas))
+
+    def informar(df_fragmento):
+        acumulador.agregar(df_fragmento)
+        trabajo.avanzar('auditoria', acumulador.total)
+        trabajo.publicar_kpis(acumulador.resumen())
+
+    with registro.etapa('trabajo.auditoria', len(df_ventas)):
+        (df_audit, mascaras, _), origen = cache.obtener(
+            ('auditoria', huella), lambda: auditar_con_mascaras(df_ventas, df_precios, registro, informar)
+        )
+    if origen != 'calculado':
+        # Ya estaba auditado (otra sesión o un trabajo anterior): los KPIs salen del resultado completo
+        acumulador = AcumuladorAuditoria(columnas_alertas=None)
+        informar(df_audit)
+    trabajo.avanzar('auditoria', len(df_audit), terminada=True)
+
+    # Exportaciones con la misma clave que usa el botón de descarga del tablero sin filtros
+    clave_filtros = tuple(sorted(FILTROS_INICIALES.items()))
+    desvios = df_audit[mascaras['desvio']]
+    trabajo.avanzar('exportaciones', 0, len(EXPORTACIONES_PREVIAS))
+    for hechas, tipo_reporte in enumerate(EXPORTACIONES_PREVIAS, start=1):
+        with registro.etapa(f'trabajo.exportacion_{tipo_reporte}_xlsx'):
+            cache.obtener(
+                ('exportacion', huella, clave_filtros, tipo_reporte, 'xlsx'),
+                lambda: exportar(hojas_reporte(tipo_reporte, desvios, df_audit), 'xlsx')
+            )
+        trabajo.avanzar('exportaciones', hechas)
+    trabajo.avanzar('exportaciones', len(EXPORTACIONES_PREVIAS), terminada=True)
+    registro.cerrar()